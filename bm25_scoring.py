@@ -0,0 +1,152 @@
+import argparse
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+'''
+    BM25 / BM25L 打分：复用项目 VSM 索引的倒排结构和代码段长度表，无需重新读取 tokens 文件
+'''
+
+BM25_VARIANTS = ("bm25", "bm25l")
+
+
+class BM25Scorer:
+    """
+    在 VSMIndex 之上按 BM25 或 BM25L 计算 错误报告 × 代码段 的得分。
+
+    每个 (代码段, 词项) 的权重在构造时对全部倒排记录一次性向量化计算，
+    与 VSMIndex 的 CSR 矩阵共用 indices/indptr，打分只需一次稀疏矩阵乘法。
+    查询侧按词频加权。
+    """
+
+    def __init__(self, index, k1=1.2, b=0.75, variant="bm25", delta=0.5):
+        if variant not in BM25_VARIANTS:
+            raise ValueError(f"未知的 BM25 变体：{variant}")
+        self.index = index
+        self.k1 = k1
+        self.b = b
+        self.variant = variant
+        self.delta = delta
+
+        matrix = index.matrix
+        n_segments = index.n_segments
+        # TF-IDF 矩阵除以 idf 即原始词频；哈希模式下的带符号计数取绝对值
+        tf = np.abs(np.rint(matrix.data / index.idf[matrix.indices]))
+        df = np.bincount(matrix.indices, minlength=index.n_terms)
+        lengths = np.repeat(index.lengths, np.diff(matrix.indptr))
+        average_length = index.lengths.mean() if n_segments else 0.0
+        length_norm = 1.0 - b + b * lengths / average_length if average_length > 0 else np.ones_like(lengths)
+
+        if variant == "bm25":
+            idf = np.log(1.0 + (n_segments - df + 0.5) / (df + 0.5))
+            weights = tf * (k1 + 1.0) / (tf + k1 * length_norm)
+        else:
+            # BM25L：对长度归一化后的词频加上偏移 delta，减轻对长代码段的过度惩罚
+            idf = np.log((n_segments + 1.0) / (df + 0.5))
+            shifted = tf / length_norm + delta
+            weights = (k1 + 1.0) * shifted / (k1 + shifted)
+
+        self.matrix = sp.csr_matrix((weights * idf[matrix.indices], matrix.indices, matrix.indptr), shape=matrix.shape)
+
+    def score(self, bug_tokens):
+        """
+        计算一个错误报告与每个代码段的 BM25 得分。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+        Returns:
+            numpy.ndarray: 长度为代码段数的得分数组。
+        """
+        query = self.index.term_counts([bug_tokens])
+        vector = np.zeros(self.index.n_terms)
+        vector[query.indices] = query.data
+        return self.matrix @ vector
+
+    def score_batch(self, queries_tokens, block_size=256):
+        """
+        分块计算一个项目全部错误报告的 BM25 得分。
+        Args:
+            queries_tokens (list): 每个错误报告的 tokens 列表。
+            block_size (int): 每块包含的错误报告数。
+        Yields:
+            tuple: (块起始下标, 该块的得分矩阵 numpy.ndarray[块大小, 代码段数])。
+        """
+        queries = self.prepare_queries(queries_tokens)
+        for start in range(0, queries.shape[0], block_size):
+            stop = min(start + block_size, queries.shape[0])
+            yield start, self.score_segments(queries[start:stop])
+
+    def prepare_queries(self, queries_tokens):
+        # 查询侧只使用词频
+        return self.index.term_counts(queries_tokens)
+
+    def score_segments(self, queries, segments=None):
+        """
+        计算一组查询与部分代码段的 BM25 得分，供 VSMIndex.score_files 分片使用。
+        Args:
+            queries (scipy.sparse.csr_matrix): prepare_queries 返回的查询矩阵（或其中若干行）。
+            segments (numpy.ndarray): 代码段下标；为 None 时对全部代码段打分。
+        Returns:
+            numpy.ndarray: 得分矩阵 [查询数, 代码段数]。
+        """
+        rows = self.matrix if segments is None else self.matrix[segments]
+        return (rows @ queries.T).T.toarray()
+
+
+def benchmark_engines(index, queries_tokens, block_size=256, k1=1.2, b=0.75, delta=0.5):
+    """
+    在同一个索引和同一批错误报告上比较 TF-IDF、BM25 和 BM25L 的批量打分吞吐量。
+    Args:
+        index (VSMIndex): 项目索引。
+        queries_tokens (list): 每个错误报告的 tokens 列表。
+        block_size (int): 每块包含的错误报告数。
+    Returns:
+        dict: 引擎名 -> {"setup": 构建打分器耗时（秒）, "seconds": 打分耗时（秒）, "reports_per_second": 吞吐量}。
+    """
+    engines = {"tfidf": lambda: index}
+    for variant in BM25_VARIANTS:
+        engines[variant] = lambda variant=variant: BM25Scorer(index, k1, b, variant, delta)
+
+    results = {}
+    for name, make_scorer in engines.items():
+        start = time.perf_counter()
+        scorer = make_scorer()
+        setup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in scorer.score_batch(queries_tokens, block_size):
+            pass
+        seconds = time.perf_counter() - start
+        results[name] = {
+            "setup": setup,
+            "seconds": seconds,
+            "reports_per_second": len(queries_tokens) / seconds if seconds > 0 else float("inf"),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    from vsm_new_construction import VSM_STOP_WORDS, get_bug_tokens, load_or_build_project_index
+
+    parser = argparse.ArgumentParser(description="比较 TF-IDF 与 BM25/BM25L 在同一语料上的打分吞吐量")
+    parser.add_argument("--projects", nargs="+",
+                        default=["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"])
+    parser.add_argument("--block-size", type=int, default=256)
+    parser.add_argument("--k1", type=float, default=1.2)
+    parser.add_argument("--b", type=float, default=0.75)
+    parser.add_argument("--delta", type=float, default=0.5)
+    parser.add_argument("--index-dir", default="../pathidea/ProcessData/vsm_index")
+    args = parser.parse_args()
+
+    bug_reports_tokens, project_names, _ = get_bug_tokens("../pathidea/ProcessData/bug_reports_tokens")
+    for project in args.projects:
+        queries_tokens = [tokens for tokens, name in zip(bug_reports_tokens, project_names) if name == project]
+        index = load_or_build_project_index("../pathidea/ProcessData/source_code_tokens", project, VSM_STOP_WORDS, args.index_dir)
+        if index is None or not queries_tokens:
+            print(f"项目 {project} 缺少源代码或错误报告tokens，跳过")
+            continue
+
+        results = benchmark_engines(index, queries_tokens, args.block_size, args.k1, args.b, args.delta)
+        print(f"项目 {project}：{index.n_segments} 个代码段，{len(queries_tokens)} 个错误报告")
+        for name, result in results.items():
+            print(f"  {name:<6}\t准备 {result['setup']:.3f}s\t打分 {result['seconds']:.3f}s\t{result['reports_per_second']:.1f} 报告/秒")
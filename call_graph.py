@@ -0,0 +1,621 @@
+import argparse
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+
+from vsm_index import decode_strings, encode_strings, read_arrays, write_arrays
+
+'''
+    编译后的调用图：{project}CallGraph.json 只解析一次，方法名映射为整数编号，
+    调用关系保存为 CSR 邻接表（offsets + targets），并附带 方法 -> 类 的编号表，
+    写成与 VSM 索引相同格式的二进制文件，之后以内存映射方式读取。
+    可达性分析按层推进前沿，逐层向量化地取出被调用的方法，结果为可达方法的位图和可达类的集合；
+    路径打分用可达类的哈希索引按类名精确匹配源代码文件；按深度打分时用稀疏矩阵乘法
+    对一个项目的全部错误报告同时逐层推进，得到每个类与日志中方法的最短调用距离。
+    缩点图把强连通分量合并为一个节点，每个分量可达的类以压缩位图缓存（LRU，限制总字节数），
+    不同错误报告中相同的入口方法直接复用缓存的结果
+'''
+
+CALL_GRAPH_MAGIC = b"CALLGR01"
+CALL_GRAPH_DIRECTORY = "../pathidea/ProcessData/call_graph"
+# 分量闭包缓存的默认字节上限
+CLOSURE_CACHE_BYTES = 256 << 20
+# 方法名中的参数列表，例如 org.apache.Foo.bar(int,java.lang.String) 中的 (int,java.lang.String)
+METHOD_ARGUMENTS_PATTERN = re.compile(r"\(.*?\)")
+
+
+class CallGraph:
+    """
+    以整数编号表示的调用图。
+
+    方法 m 调用的方法编号为 targets[offsets[m]:offsets[m + 1]]，顺序与 JSON 中的调用列表相同；
+    方法 m 所属的类为 classes[method_classes[m]]。被调用的方法名已去掉参数列表，
+    JSON 的键保持原样（与原来 reconstruct_execution_paths 按去掉参数后的方法名查找键的行为一致）。
+    同时提供只读的字典接口：method in graph、graph[method] 返回被调用的方法名列表。
+    """
+
+    def __init__(self, methods, offsets, targets, method_classes, classes):
+        self.methods = methods                    # 方法编号 -> 方法名
+        self.offsets = offsets                    # 方法编号 -> targets 起始位置（int64，长度为方法数 + 1）
+        self.targets = targets                    # 首尾相接的被调用方法编号（int32）
+        self.method_classes = method_classes      # 方法编号 -> 类编号（int32）
+        self.classes = classes                    # 类编号 -> 类全名
+        self._method_ids = None                   # 方法名 -> 编号，第一次查找时构建
+
+    @property
+    def n_methods(self):
+        return len(self.methods)
+
+    @property
+    def n_classes(self):
+        return len(self.classes)
+
+    @property
+    def n_edges(self):
+        return len(self.targets)
+
+    def method_id(self, method):
+        # 方法名 -> 编号，不在调用图中时返回 None
+        if self._method_ids is None:
+            self._method_ids = {name: i for i, name in enumerate(self.methods)}
+        return self._method_ids.get(method)
+
+    def callees(self, method_id):
+        # 方法调用的方法编号（内存映射数组上的视图，不复制）
+        return self.targets[self.offsets[method_id]:self.offsets[method_id + 1]]
+
+    def __contains__(self, method):
+        return self.method_id(method) is not None
+
+    def __getitem__(self, method):
+        method_id = self.method_id(method)
+        if method_id is None:
+            raise KeyError(method)
+        return [self.methods[callee] for callee in self.callees(method_id)]
+
+
+class Reachability:
+    """
+    从日志中的方法出发在调用图上可达的方法和类。
+
+    methods 是长度为方法数的布尔位图；不在调用图中的起始方法（原实现中它们也出现在执行路径上）
+    单独记录在 unknown_methods 中，它们所属的类同样计入可达的类。
+    由缩点图得到时只有类的位图 classes，methods 为 None，不能查询可达的方法。
+    """
+
+    def __init__(self, graph, methods, unknown_methods, classes=None):
+        self.graph = graph
+        self.methods = methods                    # 方法编号 -> 是否可达（bool）
+        self.unknown_methods = unknown_methods    # 不在调用图中的起始方法名
+        self.classes = classes                    # 类编号 -> 是否可达（bool），为 None 时由 methods 得到
+        self._class_names = None
+        self._class_index = None
+
+    def __len__(self):
+        return int(np.count_nonzero(self.methods)) + len(self.unknown_methods)
+
+    def method_ids(self):
+        return np.flatnonzero(self.methods)
+
+    def method_names(self):
+        return [self.graph.methods[method_id] for method_id in self.method_ids()] + list(self.unknown_methods)
+
+    def class_ids(self):
+        # 可达方法所属类的编号（已排序、去重）
+        if self.classes is not None:
+            return np.flatnonzero(self.classes)
+        return np.unique(self.graph.method_classes[self.methods])
+
+    def class_names(self):
+        # 可达的类全名集合（只计算一次）
+        if self._class_names is None:
+            classes = self.graph.classes
+            self._class_names = {classes[class_id] for class_id in self.class_ids()}
+            self._class_names.update(class_of_method(method) for method in self.unknown_methods)
+        return self._class_names
+
+    def class_index(self):
+        # 可达类的哈希索引（只构建一次）
+        if self._class_index is None:
+            self._class_index = ClassIndex(self.class_names())
+        return self._class_index
+
+
+class ClassIndex:
+    """
+    可达类的哈希索引：简单类名 -> {顶层类全名: 权重}。
+
+    内部类、匿名类（Outer$Inner、Outer$1）归入所在的顶层类，对应源文件 Outer.java。
+    源代码文件按简单类名精确查找，再用文件路径确认包名，
+    Client.java 不会因为可达类 ClientProtocol 包含 Client 而被误判。
+    权重默认为 1；按深度打分时为 decay ** 距离，同一顶层类取最大值。
+    """
+
+    def __init__(self, class_names, weights=None):
+        self.classes = {}                         # 简单类名 -> {顶层类全名: 权重}
+        for i, class_name in enumerate(class_names):
+            top_level = class_name.split("$", 1)[0]
+            weight = 1.0 if weights is None else float(weights[i])
+            full_names = self.classes.setdefault(top_level.rsplit(".", 1)[-1], {})
+            full_names[top_level] = max(weight, full_names.get(top_level, 0.0))
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __contains__(self, simple_name):
+        return simple_name in self.classes
+
+    def file_weight(self, file_path):
+        """
+        源代码文件中的类的权重。
+        Args:
+            file_path (str): 源代码文件的相对路径，例如 src/java/org/apache/zookeeper/ClientCnxn.java。
+        Returns:
+            float: 文件名对应的类可达，且文件路径以该类的包路径结尾（路径中没有目录时只比较类名）时为该类的权重，否则为 0。
+        """
+        path = os.path.splitext(file_path.replace("\\", "/"))[0]
+        directory, _, simple_name = path.rpartition("/")
+        full_names = self.classes.get(simple_name)
+        if not full_names:
+            return 0.0
+        if not directory:
+            return max(full_names.values())
+        dotted = "." + path.replace("/", ".")
+        return max((weight for full_name, weight in full_names.items() if dotted.endswith("." + full_name)),
+                   default=0.0)
+
+    def contains_file(self, file_path):
+        # 判断源代码文件中的类是否可达
+        return self.file_weight(file_path) > 0
+
+
+def strip_arguments(method):
+    # 去掉方法名中的参数列表
+    return METHOD_ARGUMENTS_PATTERN.sub("", method)
+
+
+def class_of_method(method):
+    # 方法全名中的类全名部分，例如 org.apache.Foo$Bar.run -> org.apache.Foo$Bar
+    return strip_arguments(method).rsplit(".", 1)[0]
+
+
+def compile_call_graph(callgraph_json):
+    """
+    将 JSON 形式的调用图编译为整数编号的 CSR 邻接表。
+    Args:
+        callgraph_json (dict): 方法名 -> 被调用的方法名列表。
+    Returns:
+        CallGraph: 编译后的调用图（数组在内存中）。
+    """
+    method_ids = {}
+    methods = []
+
+    def intern(method):
+        method_id = method_ids.get(method)
+        if method_id is None:
+            method_id = method_ids[method] = len(methods)
+            methods.append(method)
+        return method_id
+
+    # JSON 的键依次占用前面的编号，只有它们有出边
+    for method in callgraph_json:
+        intern(method)
+    targets = []
+    offsets = [0]
+    for called_methods in callgraph_json.values():
+        targets.extend(intern(strip_arguments(called)) for called in called_methods)
+        offsets.append(len(targets))
+    offsets.extend([len(targets)] * (len(methods) - len(offsets) + 1))
+
+    class_ids = {}
+    method_classes = np.fromiter((class_ids.setdefault(class_of_method(method), len(class_ids)) for method in methods),
+                                 dtype=np.int32, count=len(methods))
+    return CallGraph(methods, np.asarray(offsets, dtype=np.int64), np.asarray(targets, dtype=np.int32),
+                     method_classes, list(class_ids))
+
+
+def callees_of(graph, method_ids):
+    """
+    一次取出一组方法调用的全部方法编号（按方法拼接 CSR 区间，不逐个方法循环）。
+    Args:
+        graph (CallGraph): 编译后的调用图。
+        method_ids (numpy.ndarray): 方法编号数组。
+    Returns:
+        numpy.ndarray: 被调用的方法编号（可能重复）。
+    """
+    return _gather(graph.offsets, graph.targets, method_ids)
+
+
+def _gather(offsets, values, rows):
+    # 拼接 CSR 结构中若干行的 values[offsets[r]:offsets[r + 1]]
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=values.dtype)
+    # 每个位置相对所在区间起点的偏移 = 全局序号 - 区间在输出中的起点
+    positions = np.arange(total, dtype=np.int64) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return values[positions]
+
+
+def reachable_methods(graph, seed_ids):
+    """
+    从一组方法出发按层推进前沿，求可达方法的位图（迭代实现，调用链深度不受递归层数限制）。
+    Args:
+        graph (CallGraph): 编译后的调用图。
+        seed_ids (iterable): 起始方法编号。
+    Returns:
+        numpy.ndarray: 长度为方法数的 bool 位图，包含起始方法本身。
+    """
+    visited = np.zeros(graph.n_methods, dtype=bool)
+    frontier = np.unique(np.fromiter(seed_ids, dtype=np.int64))
+    visited[frontier] = True
+    while frontier.size:
+        callees = callees_of(graph, frontier)
+        frontier = np.unique(callees[~visited[callees]]).astype(np.int64)
+        visited[frontier] = True
+    return visited
+
+
+def seed_method_ids(graph, methods):
+    """
+    将日志中的方法名（去掉参数列表后）映射为方法编号。
+    Args:
+        graph (CallGraph): 编译后的调用图。
+        methods (list): 方法名列表。
+    Returns:
+        tuple: (方法编号列表, 不在调用图中的方法名列表)，均保持首次出现的顺序、去重。
+    """
+    seed_ids = []
+    unknown = []
+    for method in dict.fromkeys(strip_arguments(method) for method in methods):
+        method_id = graph.method_id(method)
+        if method_id is None:
+            unknown.append(method)
+        else:
+            seed_ids.append(method_id)
+    return seed_ids, unknown
+
+
+def trace_reachable(graph, methods):
+    """
+    求从日志中的方法出发可达的方法和类。
+    Args:
+        graph (CallGraph): 编译后的调用图。
+        methods (list): 日志中的方法名。
+    Returns:
+        Reachability: 可达方法位图和可达的类。
+    """
+    seed_ids, unknown = seed_method_ids(graph, methods)
+    return Reachability(graph, reachable_methods(graph, seed_ids), unknown)
+
+
+class CondensedCallGraph:
+    """
+    按强连通分量缩点后的调用图，以及每个分量可达的类的记忆化结果。
+
+    同一强连通分量中的方法相互可达，可达的类相同，缩点后得到分量之间的有向无环图。
+    求一个分量可达的类时在缩点图上按层推进，遇到已缓存的分量直接并上其结果、不再展开，
+    结果以 zlib 压缩的类位图缓存，按最近使用顺序淘汰，总字节数不超过 cache_bytes。
+    错误报告的可达类是其起始方法所在分量的结果之并。
+    """
+
+    def __init__(self, graph, cache_bytes=CLOSURE_CACHE_BYTES):
+        from scipy.sparse.csgraph import connected_components
+
+        self.graph = graph
+        n_components, labels = connected_components(adjacency_matrix(graph), directed=True, connection="strong")
+        self.n_components = n_components
+        self.components = labels.astype(np.int32)     # 方法编号 -> 分量编号
+
+        # 分量之间的边（去掉分量内部的边和重复的边）
+        callers = labels[np.repeat(np.arange(graph.n_methods), np.diff(graph.offsets))]
+        callees = labels[np.asarray(graph.targets)]
+        cross = callers != callees
+        dag = sp.csr_matrix((np.ones(int(cross.sum()), dtype=np.int8), (callers[cross], callees[cross])),
+                            shape=(n_components, n_components))
+        dag.sum_duplicates()
+        self.dag_offsets = dag.indptr.astype(np.int64)
+        self.dag_targets = dag.indices
+
+        # 分量 -> 分量内方法所属的类（去重）
+        pairs = np.unique(labels.astype(np.int64) * graph.n_classes + np.asarray(graph.method_classes))
+        self.class_offsets = np.searchsorted(pairs // graph.n_classes, np.arange(n_components + 1)).astype(np.int64)
+        self.class_targets = (pairs % graph.n_classes).astype(np.int32)
+
+        self.cache_bytes = cache_bytes
+        self._closures = OrderedDict()            # 分量编号 -> 压缩的类位图，按最近使用排序
+        self._cached = np.zeros(n_components, dtype=bool)
+        self._closure_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cached_bytes(self):
+        return self._closure_bytes
+
+    def component_closure(self, component):
+        """
+        求一个分量可达的类（包括分量本身的类），结果加入缓存。
+        Args:
+            component (int): 分量编号。
+        Returns:
+            numpy.ndarray: 长度为类数的 bool 位图。
+        """
+        if self._cached[component]:
+            return self._lookup(component)
+        self.misses += 1
+        classes = np.zeros(self.graph.n_classes, dtype=bool)
+        visited = np.zeros(self.n_components, dtype=bool)
+        visited[component] = True
+        frontier = np.array([component], dtype=np.int64)
+        while frontier.size:
+            cached = self._cached[frontier]
+            for reached in frontier[cached]:
+                classes |= self._lookup(reached)
+            expand = frontier[~cached]
+            classes[_gather(self.class_offsets, self.class_targets, expand)] = True
+            successors = _gather(self.dag_offsets, self.dag_targets, expand)
+            frontier = np.unique(successors[~visited[successors]]).astype(np.int64)
+            visited[frontier] = True
+        self._store(component, classes)
+        return classes
+
+    def reachable_classes(self, seed_ids):
+        # 一组起始方法可达的类：所在分量的结果之并
+        classes = np.zeros(self.graph.n_classes, dtype=bool)
+        for component in np.unique(self.components[np.asarray(seed_ids, dtype=np.int64)]):
+            classes |= self.component_closure(component)
+        return classes
+
+    def trace_reachable(self, methods):
+        """
+        求从日志中的方法出发可达的类（与 trace_reachable 的可达类相同，不保留可达方法的位图）。
+        Args:
+            methods (list): 日志中的方法名。
+        Returns:
+            Reachability: 可达的类。
+        """
+        seed_ids, unknown = seed_method_ids(self.graph, methods)
+        return Reachability(self.graph, None, unknown, self.reachable_classes(seed_ids))
+
+    def _lookup(self, component):
+        self.hits += 1
+        self._closures.move_to_end(component)
+        packed = np.frombuffer(zlib.decompress(self._closures[component]), dtype=np.uint8)
+        return np.unpackbits(packed, count=self.graph.n_classes).astype(bool)
+
+    def _store(self, component, classes):
+        compressed = zlib.compress(np.packbits(classes).tobytes(), 1)
+        if len(compressed) > self.cache_bytes:
+            return
+        self._closures[component] = compressed
+        self._cached[component] = True
+        self._closure_bytes += len(compressed)
+        # 超出字节上限时淘汰最久未使用的结果
+        while self._closure_bytes > self.cache_bytes:
+            evicted, data = self._closures.popitem(last=False)
+            self._cached[evicted] = False
+            self._closure_bytes -= len(data)
+
+
+def adjacency_matrix(graph):
+    # 方法 × 方法 的稀疏邻接矩阵，第 i 行为方法 i 调用的方法
+    n = graph.n_methods
+    return sp.csr_matrix((np.ones(graph.n_edges, dtype=np.float32), np.asarray(graph.targets),
+                          np.asarray(graph.offsets)), shape=(n, n))
+
+
+def depth_weights(graph, seed_lists, max_depth=None, decay=1.0, block_size=64):
+    """
+    对多个错误报告同时求每个可达类与日志中方法的最短调用距离 d，并换算为权重 decay ** d。
+    每层推进是一次稀疏矩阵乘法：前沿（报告 × 方法）乘以邻接矩阵，再用已访问方法的位图（报告 × 方法）
+    去掉已访问的方法；新到达的方法所属的类若是第一次到达，记录本层的权重。
+    报告按 block_size 分块，位图大小为 block_size × 方法数。
+    Args:
+        graph (CallGraph): 编译后的调用图。
+        seed_lists (list): 每个错误报告的起始方法编号列表。
+        max_depth (int): 最大调用距离，为 None 时不限制。
+        decay (float): 每多一层调用的衰减系数，为 1 时所有可达类的权重都为 1。
+        block_size (int): 每次同时推进的错误报告数。
+    Returns:
+        scipy.sparse.csr_matrix: 报告 × 类 的权重矩阵，不可达的类为 0。
+    """
+    adjacency = adjacency_matrix(graph)
+    method_classes = np.asarray(graph.method_classes)
+    blocks = []
+    for start in range(0, len(seed_lists), block_size):
+        block = seed_lists[start:start + block_size]
+        rows = np.repeat(np.arange(len(block)), [len(seeds) for seeds in block])
+        cols = np.fromiter((seed for seeds in block for seed in seeds), dtype=np.int64, count=len(rows))
+        visited = np.zeros((len(block), graph.n_methods), dtype=bool)
+        reached = np.zeros((len(block), graph.n_classes), dtype=bool)
+        weights = np.zeros((len(block), graph.n_classes))
+        depth = 0
+        while True:
+            visited[rows, cols] = True
+            classes = method_classes[cols]
+            first = ~reached[rows, classes]
+            reached[rows[first], classes[first]] = True
+            weights[rows[first], classes[first]] = decay ** depth
+            if not rows.size or (max_depth is not None and depth >= max_depth):
+                break
+            depth += 1
+            frontier = sp.csr_matrix((np.ones(rows.size, dtype=np.float32), (rows, cols)),
+                                     shape=(len(block), graph.n_methods))
+            product = frontier @ adjacency
+            # 直接按行展开 CSR 结构，不排序、不检查零元（所有元素均为正）
+            rows = np.repeat(np.arange(len(block)), np.diff(product.indptr))
+            cols = product.indices
+            unvisited = ~visited[rows, cols]
+            rows, cols = rows[unvisited], cols[unvisited]
+        blocks.append(sp.csr_matrix(weights))
+    if not blocks:
+        return sp.csr_matrix((0, graph.n_classes))
+    return sp.vstack(blocks).tocsr()
+
+
+def depth_class_indexes(graph, method_lists, max_depth=None, decay=1.0, block_size=64):
+    """
+    对一个项目的全部错误报告按调用距离构建带权重的可达类索引。
+    不在调用图中的起始方法（距离为 0）所属的类权重为 1。
+    Args:
+        graph (CallGraph): 编译后的调用图。
+        method_lists (list): 每个错误报告日志中的方法名列表。
+        max_depth (int): 最大调用距离，为 None 时不限制。
+        decay (float): 每多一层调用的衰减系数。
+        block_size (int): 每次同时推进的错误报告数。
+    Returns:
+        list: 每个错误报告的 ClassIndex。
+    """
+    seeds = [seed_method_ids(graph, methods) for methods in method_lists]
+    weights = depth_weights(graph, [seed_ids for seed_ids, _ in seeds], max_depth, decay, block_size)
+    classes = graph.classes
+    indexes = []
+    for row, (_, unknown) in enumerate(seeds):
+        start, stop = weights.indptr[row], weights.indptr[row + 1]
+        class_names = [classes[class_id] for class_id in weights.indices[start:stop]]
+        class_names.extend(class_of_method(method) for method in unknown)
+        indexes.append(ClassIndex(class_names, np.concatenate([weights.data[start:stop], np.ones(len(unknown))])))
+    return indexes
+
+
+def execution_tree(graph, methods):
+    """
+    构建与原递归 DFS 相同的嵌套执行路径 {方法: [子路径, ...]}，仅用于调试查看。
+    用显式栈代替递归，节点的访问顺序和树的形状与原实现一致。
+    Args:
+        graph (CallGraph): 编译后的调用图。
+        methods (list): 日志中的方法名。
+    Returns:
+        dict: 以日志中的方法为根的执行路径。
+    """
+    execution_paths = {}
+    visited = set()
+    for root in methods:
+        root = strip_arguments(root)
+        if root in visited:
+            continue
+        visited.add(root)
+        children = execution_paths[root] = []
+        stack = [(children, iter(_callee_names(graph, root)))]
+        while stack:
+            children, pending = stack[-1]
+            method = next(pending, None)
+            if method is None:
+                stack.pop()
+                continue
+            method = strip_arguments(method)
+            if method in visited:
+                continue
+            visited.add(method)
+            sub_children = []
+            children.append({method: sub_children})
+            stack.append((sub_children, iter(_callee_names(graph, method))))
+    return execution_paths
+
+
+def _callee_names(graph, method):
+    method_id = graph.method_id(method)
+    if method_id is None:
+        return []
+    return [graph.methods[callee] for callee in graph.callees(method_id)]
+
+
+def save_call_graph(graph, path, fingerprint):
+    """
+    保存编译后的调用图（格式与 VSM 索引文件相同：魔数 + JSON 头 + 按 64 字节对齐的数组）。
+    Args:
+        graph (CallGraph): 编译后的调用图。
+        path (str): 输出文件路径。
+        fingerprint (str): JSON 调用图的指纹。
+    """
+    write_arrays(path, CALL_GRAPH_MAGIC, {"fingerprint": fingerprint, "n_methods": graph.n_methods}, {
+        "methods": encode_strings(graph.methods),
+        "offsets": np.asarray(graph.offsets, dtype=np.int64),
+        "targets": np.asarray(graph.targets, dtype=np.int32),
+        "method_classes": np.asarray(graph.method_classes, dtype=np.int32),
+        "classes": encode_strings(graph.classes),
+    })
+
+
+def load_compiled_call_graph(path, fingerprint=None):
+    """
+    以内存映射方式读取编译后的调用图，邻接表和类编号表不复制。
+    Args:
+        path (str): 文件路径。
+        fingerprint (str): 期望的 JSON 调用图指纹，为 None 时不检查。
+    Returns:
+        CallGraph: 调用图；文件不存在、格式不符或指纹不符时返回 None。
+    """
+    loaded = read_arrays(path, CALL_GRAPH_MAGIC)
+    if loaded is None:
+        return None
+    header, arrays = loaded
+    if fingerprint is not None and header["fingerprint"] != fingerprint:
+        return None
+    return CallGraph(decode_strings(arrays["methods"]), arrays["offsets"], arrays["targets"],
+                     arrays["method_classes"], decode_strings(arrays["classes"]))
+
+
+def call_graph_paths(project_name, directory=CALL_GRAPH_DIRECTORY):
+    # 项目的 JSON 调用图路径和编译结果路径（放在同一目录）
+    project_dir = os.path.join(directory, project_name)
+    return (os.path.join(project_dir, f"{project_name}CallGraph.json"),
+            os.path.join(project_dir, f"{project_name}CallGraph.graph"))
+
+
+def call_graph_fingerprint(json_path):
+    # 根据 JSON 调用图的大小和修改时间判断编译结果是否过期
+    stat = os.stat(json_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_or_compile_call_graph(project_name, directory=CALL_GRAPH_DIRECTORY, rebuild=False):
+    """
+    读取项目编译后的调用图；不存在或 JSON 调用图有变化时重新编译并保存。
+    Args:
+        project_name (str): 项目名称。
+        directory (str): call_graph 目录。
+        rebuild (bool): 是否忽略已有的编译结果。
+    Returns:
+        CallGraph: 编译后的调用图。
+    """
+    json_path, compiled_path = call_graph_paths(project_name, directory)
+    fingerprint = call_graph_fingerprint(json_path)
+    if not rebuild:
+        graph = load_compiled_call_graph(compiled_path, fingerprint)
+        if graph is not None:
+            return graph
+
+    import json
+
+    with open(json_path, 'r', encoding='utf-8') as file:
+        graph = compile_call_graph(json.load(file))
+    save_call_graph(graph, compiled_path, fingerprint)
+    print(f"已编译项目 {project_name} 的调用图：{graph.n_methods} 个方法，{graph.n_edges} 条调用边，"
+          f"{graph.n_classes} 个类")
+    return load_compiled_call_graph(compiled_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="将项目的 JSON 调用图编译为内存映射的二进制 CSR 邻接表")
+    parser.add_argument("--projects", nargs="+",
+                        default=["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"])
+    parser.add_argument("--directory", default=CALL_GRAPH_DIRECTORY)
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有的编译结果，重新编译")
+    args = parser.parse_args()
+
+    for project in args.projects:
+        if not os.path.exists(call_graph_paths(project, args.directory)[0]):
+            print(f"项目 {project} 没有调用图，跳过")
+            continue
+        start = time.perf_counter()
+        graph = load_or_compile_call_graph(project, args.directory, args.rebuild)
+        print(f"项目 {project}：{graph.n_methods} 个方法，{graph.n_edges} 条调用边，"
+              f"用时 {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,332 @@
+import argparse
+import re
+import time
+
+from tokenizer import (ENGLISH_STOP_WORDS, IDENTIFIER_CACHE_LIMIT, JAVA_KEYWORDS, LANGUAGE_KEYWORDS,
+                       TRAILING_WORD_PATTERN, get_tokenizer)
+
+'''
+    单遍 Java 词法分析器：一个组合正则在文本上线性扫描一遍，直接产生按下划线和驼峰拆分的子词，
+    不再先切出单词、再逐个单词按下划线拆分和驼峰匹配。整个单词是语言关键字时在扫描中整体匹配并丢弃；
+    子词 -> 词干（停用词为空）的结果按原始大小写缓存，每个不同的子词只转小写、查停用词和提取词干一次。
+    可选跳过注释、字符串/字符字面量以及 import/package 语句，跳过模式同样逐块流式处理。
+    不跳过任何内容时（一致模式）输出与原 preprocess_code 的 token 流逐个相同。
+    一致模式比原多正则流程快得多，但比按标识符缓存结果的 Tokenizer 慢（见 benchmark_lexer），
+    所以 process_source_code 只在跳过模式下使用本分析器
+'''
+
+# 可跳过的词法单元
+LEXER_SKIPS = ("comments", "strings", "imports")
+
+# 驼峰子词（与原流程的驼峰正则相同）。子词只由 ASCII 字母组成，不会跨过下划线、数字或单词边界，
+# 所以直接在整段文本上匹配与先切单词、再按下划线拆分后逐段匹配的结果相同
+SUBWORD_PATTERN = r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])'
+
+# 注释、字符串（含文本块）、字符字面量和 import/package 语句；未闭合的注释或字符串延续到文本或行末尾
+JAVA_LEXEME_PATTERNS = (
+    ("comments", r'//[^\n]*|/\*.*?(?:\*/|\Z)'),
+    ("strings", r'"""(?:\\.|.)*?(?:"""|\Z)|"(?:\\.|[^"\\\n])*"?|\'(?:\\.|[^\'\\\n])*\'?'),
+    ("imports", r'^[ \t]*(?:import|package)\b[^;\n]*;?'),
+)
+
+
+def keyword_pattern(keywords):
+    """
+    匹配小写后是关键字的整个单词，与 word.lower() in keywords 的判断一致
+    （开尔文符号 U+212A 是唯一小写后为 ASCII 字母的非 ASCII 字符）。
+    先用前瞻排除长度不在关键字范围内或含非字母字符的单词，其余单词才逐个尝试关键字。
+    Args:
+        keywords (iterable): 小写关键字。
+    Returns:
+        str: 正则表达式；没有关键字时为 None。
+    """
+    def letter(c):
+        return f"[{c}{c.upper()}\u212a]" if c == 'k' else f"[{c}{c.upper()}]"
+    keywords = sorted(keywords)
+    if not keywords:
+        return None
+    shortest, longest = min(map(len, keywords)), max(map(len, keywords))
+    alternatives = '|'.join(''.join(letter(c) for c in keyword) for keyword in keywords)
+    return rf'\b(?=[a-zA-Z\u212a]{{{shortest},{longest}}}\b)(?:{alternatives})\b'
+
+
+_patterns = {}
+
+
+def scanner_pattern(language, with_lexemes):
+    """
+    按语言构建（并缓存）扫描用的组合正则：关键字单词不带分组，子词在 word 分组中；
+    with_lexemes 为 True 时在前面加上注释、字符串和 import/package 语句的分组。
+    Args:
+        language (str): 编程语言。
+        with_lexemes (bool): 是否识别 Java 词法单元。
+    Returns:
+        re.Pattern: 编译后的正则。
+    """
+    key = (language, with_lexemes)
+    pattern = _patterns.get(key)
+    if pattern is None:
+        alternatives = [f"(?P<{kind}>{lexeme})" for kind, lexeme in JAVA_LEXEME_PATTERNS] if with_lexemes else []
+        keywords = keyword_pattern(LANGUAGE_KEYWORDS.get(language, ()))
+        if keywords:
+            alternatives.append(keywords)
+        alternatives.append(f"(?P<word>{SUBWORD_PATTERN})")
+        pattern = _patterns[key] = re.compile('|'.join(alternatives), re.MULTILINE | re.DOTALL)
+    return pattern
+
+
+class JavaLexer:
+    """
+    单遍扫描的分词器，与 Tokenizer 共用停用词表和词干表（新词干同样经 take_new_stems 交回主进程）。
+
+    skip 为空时只扫描关键字和子词，结果与 Tokenizer.tokenize 相同；
+    skip 非空时同时按 Java 词法识别注释、字符串和 import/package 语句（始终完整识别，
+    保证注释中的引号或字符串中的 // 不会被误判），丢弃 skip 中列出的种类，其余种类中的子词照常输出。
+    """
+
+    def __init__(self, skip=(), tokenizer=None):
+        unknown = set(skip) - set(LEXER_SKIPS)
+        if unknown:
+            raise ValueError(f"未知的跳过类型：{sorted(unknown)}")
+        self.skip = frozenset(skip)
+        self.tokenizer = tokenizer if tokenizer is not None else get_tokenizer()
+        self._stems = {}                      # 原始大小写的子词 -> 词干，停用词和关键字为 ''
+
+    def tokenize(self, text, language='java'):
+        """
+        对源代码进行分词。
+        Args:
+            text (str): 源代码字符串。
+            language (str): 编程语言，决定去除的关键字。
+        Returns:
+            list: 处理后的 tokens 列表。
+        """
+        if not self.skip:
+            return self._stem_all(scanner_pattern(language, False).findall(text))
+        subwords, _, _ = self._scan(text, 0, True, language)
+        return self._stem_all(subwords)
+
+    def iter_tokens(self, chunks, language='java'):
+        """
+        流式分词，逐块扫描，内存只与块大小有关（单个超长的单词、块注释或文本块除外）。
+        Args:
+            chunks (iterable): 文本块，例如 tokenizer.read_chunks(f)。
+            language (str): 编程语言。
+        Yields:
+            str: 处理后的 token。
+        """
+        if self.skip:
+            yield from self._iter_lexemes(chunks, language)
+            return
+        # 块末尾可能被截断的单词留到下一块；切分点前是非单词字符，子词和关键字都不会跨过切分点
+        pattern = scanner_pattern(language, False)
+        carry = []
+        for chunk in chunks:
+            cut = TRAILING_WORD_PATTERN.search(chunk).start()
+            if cut == 0:
+                carry.append(chunk)
+                continue
+            text = ''.join(carry) + chunk
+            carry = [chunk[cut:]]
+            yield from self._stem_all(pattern.findall(text, 0, len(text) - len(chunk) + cut))
+        yield from self._stem_all(pattern.findall(''.join(carry)))
+
+    def iter_segments(self, chunks, language, segment_size):
+        # 每凑满 segment_size 个 token 产生一段，与按 segment_size 切分 tokenize 的结果一致
+        segment = []
+        for token in self.iter_tokens(chunks, language):
+            segment.append(token)
+            if len(segment) == segment_size:
+                yield segment
+                segment = []
+        if segment:
+            yield segment
+
+    def _iter_lexemes(self, chunks, language):
+        # 跳过模式的流式扫描：可能被后续文本延长的匹配留到下一块重新扫描，
+        # 保留续扫位置前的一个字符，使行首（^）和单词边界的判断与整段扫描一致
+        text = ''
+        start = 0
+        for chunk in chunks:
+            text += chunk
+            subwords, resume, complete = self._scan(text, start, False, language)
+            yield from self._stem_all(subwords)
+            if complete:
+                # 没有未完成的匹配时，最后一个换行之前的内容不会再产生匹配（跨行的块注释和文本块总会匹配到文本末尾）
+                resume = max(resume, text.rfind('\n', resume) + 1)
+            keep = max(resume - 1, 0)
+            text, start = text[keep:], resume - keep
+        subwords, _, _ = self._scan(text, start, True, language)
+        yield from self._stem_all(subwords)
+
+    def _scan(self, text, start, final, language):
+        """
+        从 start 开始扫描子词，丢弃关键字单词和 skip 中列出的词法单元。
+        Args:
+            text (str): 文本。
+            start (int): 扫描起始位置。
+            final (bool): 是否是文本末尾；为 False 时在第一个可能被后续文本改变的匹配处停止：
+                匹配之后不足两个字符时（转义的反斜杠和前瞻最多需要匹配之后的两个字符）。
+            language (str): 编程语言。
+        Returns:
+            tuple: (子词列表, 续扫位置, 是否扫描到了文本末尾)。
+        """
+        pattern = scanner_pattern(language, True)
+        end = len(text)
+        skip = self.skip
+        subwords = []
+        resume = start
+        for match in pattern.finditer(text, start):
+            if not final and match.end() + 2 > end:
+                # 匹配前只有行首缩进时从行首续扫，后续文本可能使这一行成为 import/package 语句
+                line_start = text.rfind('\n', 0, match.start()) + 1
+                indented = not text[line_start:match.start()].strip(' \t')
+                return subwords, max(start, line_start) if indented else match.start(), False
+            kind = match.lastgroup
+            if kind == 'word':
+                subwords.append(match.group())
+            elif kind is not None and kind not in skip:
+                # 保留的注释、字符串或 import 语句：其中的关键字和子词按一致模式扫描
+                subwords.extend(scanner_pattern(language, False).findall(match.group()))
+            resume = match.end()
+        return subwords, resume, True
+
+    def _stem_all(self, subwords):
+        # 子词转小写、去停用词并提取词干；一致模式下关键字单词在 findall 结果中为 ''，按缓存中的 '' 丢弃
+        stems = self._stems
+        tokens = []
+        for subword in subwords:
+            stem = stems.get(subword)
+            if stem is None:
+                stem = self._stem(subword)
+            if stem:
+                tokens.append(stem)
+        return tokens
+
+    def _stem(self, subword):
+        if len(self._stems) >= IDENTIFIER_CACHE_LIMIT:
+            self._stems.clear()
+        word = subword.lower()
+        stem = self._stems[subword] = (self.tokenizer.stem(word)
+                                       if word and word not in self.tokenizer.stop_words else '')
+        return stem
+
+
+_lexers = {}
+
+
+def get_lexer(skip=()):
+    # 进程内按跳过类型共享的词法分析器
+    skip = frozenset(skip)
+    lexer = _lexers.get(skip)
+    if lexer is None:
+        lexer = _lexers[skip] = JavaLexer(skip)
+    return lexer
+
+
+def reference_preprocess_code(code_str, language, segment_size):
+    """
+    基准：原 process_source_code.preprocess_code 的多正则流程（先用正则切出单词，再逐个按下划线 re.split、
+    逐段驼峰 findall，以及逐步的列表推导），每次调用重新构建关键字列表、停用词集合和 PorterStemmer，词干不缓存。
+    停用词使用随代码附带的同一份 NLTK 英文停用词表，不依赖下载的 NLTK 数据。
+    Args:
+        code_str (str): 源代码字符串。
+        language (str): 编程语言，只有 java 去除关键字。
+        segment_size (int): 每段的 token 数。
+    Returns:
+        list: 分段后的 tokens。
+    """
+    from nltk.stem import PorterStemmer
+
+    tokens = re.findall(r'\b\w+\b', code_str)
+    programming_java_keywords = sorted(JAVA_KEYWORDS)
+    if language == 'java':
+        tokens = [token for token in tokens if token.lower() not in programming_java_keywords]
+    split_tokens = []
+    for token in tokens:
+        for subtoken in re.split(r'_', token):
+            split_tokens.extend(re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])', subtoken))
+    split_tokens = [token.lower() for token in split_tokens]
+    stop_words = set(ENGLISH_STOP_WORDS)
+    tokens_no_stopwords = [token for token in split_tokens if token not in stop_words]
+    porter = PorterStemmer()
+    stemmed_tokens = [porter.stem(token) for token in tokens_no_stopwords]
+    return [stemmed_tokens[i:i + segment_size] for i in range(0, len(stemmed_tokens), segment_size)]
+
+
+def benchmark_lexer(file_paths, language='java', skip=(), segment_size=800):
+    """
+    在同一批源代码文件上比较原多正则流程（reference_preprocess_code）、共享的 Tokenizer
+    （process_source_code.preprocess_code）与 JavaLexer 的分词耗时。
+    后两者都使用新建的分词器（冷缓存），各自包含分段；nltk 在计时前导入，不计入任何一方。
+    Args:
+        file_paths (list): 源代码文件路径。
+        language (str): 编程语言。
+        skip (iterable): JavaLexer 跳过的词法单元。
+        segment_size (int): 每段的 token 数。
+    Returns:
+        dict: {"baseline": 原流程秒数, "tokenizer": Tokenizer 秒数, "lexer": 词法分析器秒数,
+               "speedup": 相对原流程的倍数, "tokenizer_speedup": 相对 Tokenizer 的倍数, "tokens": 原流程 token 数,
+               "lexer_tokens": 词法分析器 token 数, "identical": 词法分析器与原流程的输出是否完全相同}。
+    """
+    import process_source_code
+    import tokenizer
+    # 计时前导入 nltk，三者都不计入导入耗时
+    import nltk.stem.porter
+
+    texts = []
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8', errors="replace") as f:
+            texts.append(f.read())
+
+    start = time.perf_counter()
+    baseline = [reference_preprocess_code(text, language, segment_size) for text in texts]
+    baseline_seconds = time.perf_counter() - start
+
+    default_tokenizer = tokenizer._default_tokenizer
+    tokenizer._default_tokenizer = tokenizer.Tokenizer()
+    try:
+        start = time.perf_counter()
+        for text in texts:
+            process_source_code.preprocess_code(text, language, segment_size)
+        tokenizer_seconds = time.perf_counter() - start
+    finally:
+        tokenizer._default_tokenizer = default_tokenizer
+
+    lexer = JavaLexer(skip, tokenizer.Tokenizer())
+    start = time.perf_counter()
+    lexed = [process_source_code.segment_tokens(lexer.tokenize(text, language), segment_size) for text in texts]
+    lexer_seconds = time.perf_counter() - start
+
+    return {
+        "baseline": baseline_seconds,
+        "tokenizer": tokenizer_seconds,
+        "lexer": lexer_seconds,
+        "speedup": baseline_seconds / lexer_seconds if lexer_seconds > 0 else float("inf"),
+        "tokenizer_speedup": tokenizer_seconds / lexer_seconds if lexer_seconds > 0 else float("inf"),
+        "tokens": sum(len(segment) for segments in baseline for segment in segments),
+        "lexer_tokens": sum(len(segment) for segments in lexed for segment in segments),
+        "identical": baseline == lexed,
+    }
+
+
+if __name__ == '__main__':
+    from process_source_code import get_source_code_directory, iter_source_files
+
+    parser = argparse.ArgumentParser(description="比较单遍词法分析器与原多正则分词流程的耗时，并检查一致模式的输出")
+    parser.add_argument("--projects", nargs="+",
+                        default=["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"])
+    parser.add_argument("--skip", nargs="*", choices=LEXER_SKIPS, default=[],
+                        help="跳过的词法单元；不指定时为一致模式")
+    args = parser.parse_args()
+
+    for project in args.projects:
+        file_paths = [file_path for file_path, _, _ in iter_source_files(get_source_code_directory(project), 'java')]
+        if not file_paths:
+            print(f"项目 {project} 没有源代码文件，跳过")
+            continue
+        result = benchmark_lexer(file_paths, 'java', args.skip)
+        print(f"项目 {project}：{len(file_paths)} 个文件，{result['tokens']} 个token")
+        print(f"  原流程 {result['baseline']:.3f}s\tTokenizer {result['tokenizer']:.3f}s\t词法分析器 {result['lexer']:.3f}s\t"
+              f"加速 {result['speedup']:.2f}x（相对 Tokenizer {result['tokenizer_speedup']:.2f}x）\t"
+              f"输出{'一致' if result['identical'] else '不同'}（{result['lexer_tokens']} 个token）")
@@ -0,0 +1,201 @@
+import argparse
+import time
+
+import numpy as np
+
+from vsm_index import read_arrays, write_arrays
+
+'''
+    LSA 稠密索引：对项目的 TF-IDF 代码段矩阵做截断 SVD，
+    用潜在语义空间中的一次稠密矩阵-向量乘法生成候选，再用 VSM 索引做精确余弦重排序
+'''
+
+LSA_MAGIC = b"LSAIDX01"
+
+
+class LSAIndex:
+    """
+    VSMIndex 之上的潜在语义索引。
+
+    对按行 L2 归一化的 TF-IDF 矩阵 X 做截断 SVD：X ≈ U S Vᵀ。
+    代码段向量为 U S 的行（归一化后以 float32 存放），查询向量为 q Vᵀ 的转置投影，
+    二者的点积即潜在空间中的余弦相似度。候选只取潜在空间中得分最高的 n_candidates 个代码段，
+    因此结果是近似的；候选内部的排序与 VSM 的精确余弦一致。
+    """
+
+    def __init__(self, index, components, embeddings, n_candidates=300):
+        self.index = index                    # 提供词表、idf 和精确重排序的 VSMIndex
+        self.components = components          # 词项 × 潜在维度 的投影矩阵 V（float32）
+        self.embeddings = embeddings          # 代码段 × 潜在维度 的归一化向量（float32）
+        self.n_candidates = n_candidates      # 每个查询参与精确重排序的代码段数
+
+    @property
+    def n_components(self):
+        return self.embeddings.shape[1]
+
+    @classmethod
+    def fit(cls, index, n_components=200, n_candidates=300, random_state=0):
+        """
+        在项目索引上拟合截断 SVD。
+        Args:
+            index (VSMIndex): 项目索引。
+            n_components (int): 潜在维度数，超过矩阵秩的上限时自动截断。
+            n_candidates (int): 每个查询参与精确重排序的代码段数。
+            random_state (int): 随机 SVD 的随机种子，保证结果可复现。
+        Returns:
+            LSAIndex: 拟合好的索引。
+        """
+        # scikit-learn 只在拟合时需要，延迟导入以免拖慢只加载已保存索引的脚本启动
+        from sklearn.preprocessing import normalize
+        from sklearn.utils.extmath import randomized_svd
+
+        n_components = max(1, min(n_components, min(index.matrix.shape) - 1))
+        normalized = normalize(index.matrix)
+        u, s, vt = randomized_svd(normalized, n_components, random_state=random_state)
+        embeddings = normalize(u * s).astype(np.float32)
+        return cls(index, np.ascontiguousarray(vt.T, dtype=np.float32), embeddings, n_candidates)
+
+    def project(self, bug_tokens):
+        """
+        将一个错误报告投影到潜在空间。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+        Returns:
+            numpy.ndarray: 归一化的潜在向量（float32）；没有已知词项时全为 0。
+        """
+        query = self.index.transform([bug_tokens])
+        # 只取查询中出现的词项对应的投影行，避免构造稠密的查询向量
+        vector = query.data.astype(np.float32) @ self.components[query.indices]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def candidates(self, bug_tokens):
+        """
+        用一次稠密矩阵-向量乘法在潜在空间中为错误报告生成候选代码段。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+        Returns:
+            numpy.ndarray: 候选代码段下标（无序），最多 n_candidates 个。
+        """
+        scores = self.embeddings @ self.project(bug_tokens)
+        if len(scores) <= self.n_candidates:
+            return np.arange(len(scores))
+        return np.argpartition(-scores, self.n_candidates - 1)[:self.n_candidates]
+
+    def top_k(self, bug_tokens, k, group_ids=None):
+        """
+        近似 top-k 检索：潜在空间生成候选，VSM 精确余弦重排序，返回格式与 VSMIndex.top_k 相同。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+            k (int): 返回的结果数。
+            group_ids (numpy.ndarray): 代码段 -> 文件分组号；给定时按组取最大值，返回 k 个不同的组。
+        Returns:
+            list: [(代码段下标, 相似度)]，按相似度从高到低排列，最多 k 项。
+        """
+        return self.index.rerank(bug_tokens, self.candidates(bug_tokens), k, group_ids)
+
+
+def save_lsa_index(lsa, path, fingerprint):
+    """
+    保存 LSA 索引的投影矩阵和代码段向量（格式与 VSM 索引文件相同）。
+    Args:
+        lsa (LSAIndex): 需要保存的索引。
+        path (str): 输出文件路径。
+        fingerprint (str): 输入数据的指纹。
+    """
+    write_arrays(path, LSA_MAGIC, {"fingerprint": fingerprint}, {
+        "components": np.asarray(lsa.components, dtype=np.float32),
+        "embeddings": np.asarray(lsa.embeddings, dtype=np.float32),
+    })
+
+
+def load_lsa_index(path, index, fingerprint=None, n_candidates=300):
+    """
+    以内存映射方式打开 LSA 索引文件。
+    Args:
+        path (str): 索引文件路径。
+        index (VSMIndex): 对应的项目索引。
+        fingerprint (str): 期望的输入指纹；不一致时视为过期。
+        n_candidates (int): 每个查询参与精确重排序的代码段数。
+    Returns:
+        LSAIndex: 加载的索引；文件不存在、格式不符、已过期或与项目索引的形状不一致时返回 None。
+    """
+    loaded = read_arrays(path, LSA_MAGIC)
+    if loaded is None:
+        return None
+    header, arrays = loaded
+    if fingerprint is not None and header["fingerprint"] != fingerprint:
+        return None
+    components, embeddings = arrays["components"], arrays["embeddings"]
+    if components.shape[0] != index.n_terms or embeddings.shape[0] != index.n_segments:
+        return None
+    return LSAIndex(index, components, embeddings, n_candidates)
+
+
+def benchmark_lsa(index, lsa, queries_tokens, k):
+    """
+    比较 LSA 近似检索与 VSM 精确 top-k 检索（按文件取最大值）的耗时和召回率。
+    Args:
+        index (VSMIndex): 项目索引。
+        lsa (LSAIndex): 该索引上的 LSA 索引。
+        queries_tokens (list): 每个错误报告的 tokens 列表。
+        k (int): 每个报告保留的文件数。
+    Returns:
+        dict: {"candidate_ms": 每个报告生成候选的平均耗时（毫秒）, "lsa_ms": LSA 检索的平均耗时,
+               "exact_ms": 精确检索的平均耗时, "recall": LSA 结果中的文件占精确前 k 个文件的比例}。
+    """
+    candidate_seconds = lsa_seconds = exact_seconds = 0.0
+    hits = total = 0
+    for bug_tokens in queries_tokens:
+        start = time.perf_counter()
+        lsa.candidates(bug_tokens)
+        candidate_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approximate = lsa.top_k(bug_tokens, k, index.file_ids)
+        lsa_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact = index.top_k(bug_tokens, k, index.file_ids)
+        exact_seconds += time.perf_counter() - start
+
+        exact_files = {index.file_ids[segment] for segment, _ in exact}
+        hits += len(exact_files & {index.file_ids[segment] for segment, _ in approximate})
+        total += len(exact_files)
+
+    n_queries = max(len(queries_tokens), 1)
+    return {
+        "candidate_ms": 1000 * candidate_seconds / n_queries,
+        "lsa_ms": 1000 * lsa_seconds / n_queries,
+        "exact_ms": 1000 * exact_seconds / n_queries,
+        "recall": hits / total if total else 1.0,
+    }
+
+
+if __name__ == '__main__':
+    from vsm_new_construction import VSM_STOP_WORDS, get_bug_tokens, load_or_build_lsa_index, load_or_build_project_index
+
+    parser = argparse.ArgumentParser(description="比较 LSA 近似检索与 VSM 精确检索的耗时和召回率")
+    parser.add_argument("--projects", nargs="+",
+                        default=["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"])
+    parser.add_argument("--components", type=int, default=200, help="潜在维度数")
+    parser.add_argument("--candidates", type=int, default=300, help="每个报告参与精确重排序的代码段数")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--index-dir", default="../pathidea/ProcessData/vsm_index")
+    args = parser.parse_args()
+
+    source_base_path = "../pathidea/ProcessData/source_code_tokens"
+    bug_reports_tokens, project_names, _ = get_bug_tokens("../pathidea/ProcessData/bug_reports_tokens")
+    for project in args.projects:
+        queries_tokens = [tokens for tokens, name in zip(bug_reports_tokens, project_names) if name == project]
+        index = load_or_build_project_index(source_base_path, project, VSM_STOP_WORDS, args.index_dir)
+        if index is None or not queries_tokens:
+            print(f"项目 {project} 缺少源代码或错误报告tokens，跳过")
+            continue
+
+        lsa = load_or_build_lsa_index(source_base_path, project, index, VSM_STOP_WORDS, args.index_dir,
+                                      args.components, args.candidates)
+        result = benchmark_lsa(index, lsa, queries_tokens, args.top_k)
+        print(f"项目 {project}：{index.n_segments} 个代码段，{lsa.n_components} 维，{len(queries_tokens)} 个错误报告")
+        print(f"  候选生成 {result['candidate_ms']:.3f}ms\tLSA 检索 {result['lsa_ms']:.3f}ms\t"
+              f"精确检索 {result['exact_ms']:.3f}ms\ttop-{args.top_k} 召回率 {result['recall']:.3f}")
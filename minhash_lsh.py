@@ -0,0 +1,241 @@
+import argparse
+import time
+
+import numpy as np
+
+from vsm_index import read_arrays, write_arrays
+
+'''
+    MinHash/LSH 候选生成：为每个代码段的词项集合计算 MinHash 签名并分带建立哈希表，
+    错误报告只与至少一个带完全相同的代码段做精确的 TF-IDF 打分
+'''
+
+LSH_MAGIC = b"LSHIDX01"
+# 哈希函数 h(x) = (a * x + b) mod p，p 为梅森素数 2^31 - 1，签名可以用 uint32 存放
+MERSENNE_PRIME = (1 << 31) - 1
+# 将一个带内的若干签名值合并为一个 64 位键（FNV 乘子，溢出时自然回绕）
+BAND_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+class MinHashLSH:
+    """
+    VSMIndex 之上的 MinHash/LSH 候选生成器。
+
+    每个代码段的签名由 bands × rows 个哈希函数在其词项集合上的最小值组成，
+    签名按 bands 个带分组，每带的 rows 个值合并为一个键，各带分别排序作为哈希表。
+    两个集合的 Jaccard 相似度为 J 时，至少一个带相同的概率为 1 - (1 - J^rows)^bands：
+    增大 bands 或减小 rows 提高召回率、增加候选数，反之更快但可能漏掉相关代码段。
+    """
+
+    def __init__(self, index, coefficients, offsets, signatures, band_keys, band_segments, rows):
+        self.index = index                    # 提供词表和精确打分的 VSMIndex
+        self.coefficients = coefficients      # 每个哈希函数的 a
+        self.offsets = offsets                # 每个哈希函数的 b
+        self.signatures = signatures          # 代码段 × 哈希函数 的 MinHash 签名（uint32，空代码段为 p）
+        self.band_keys = band_keys            # 带 × 非空代码段，每带排好序的键
+        self.band_segments = band_segments    # 与 band_keys 对应的代码段下标
+        self.rows = rows                      # 每带的哈希函数数
+
+    @property
+    def bands(self):
+        return self.band_keys.shape[0]
+
+    @classmethod
+    def fit(cls, index, bands=32, rows=2, seed=0):
+        """
+        为项目的全部代码段计算 MinHash 签名并建立分带哈希表。
+        Args:
+            index (VSMIndex): 项目索引。
+            bands (int): 带数。
+            rows (int): 每带的哈希函数数。
+            seed (int): 哈希函数参数的随机种子。
+        Returns:
+            MinHashLSH: 建好的候选生成器。
+        """
+        rng = np.random.default_rng(seed)
+        n_hashes = bands * rows
+        coefficients = rng.integers(1, MERSENNE_PRIME, size=n_hashes, dtype=np.uint64)
+        offsets = rng.integers(0, MERSENNE_PRIME, size=n_hashes, dtype=np.uint64)
+
+        matrix = index.matrix
+        nonempty = np.diff(matrix.indptr) > 0
+        starts = matrix.indptr[:-1][nonempty]
+        terms = np.asarray(matrix.indices, dtype=np.uint64)
+        signatures = np.full((index.n_segments, n_hashes), MERSENNE_PRIME, dtype=np.uint32)
+        if len(starts):
+            # 每次只对一个哈希函数计算全部倒排记录的哈希值，内存与非零元数成正比
+            for i in range(n_hashes):
+                hashes = (coefficients[i] * terms + offsets[i]) % np.uint64(MERSENNE_PRIME)
+                signatures[nonempty, i] = np.minimum.reduceat(hashes, starts)
+
+        # 空代码段不与任何查询相同，不放入哈希表
+        segments = np.flatnonzero(nonempty).astype(np.int32)
+        keys = _band_keys(signatures[segments], rows)
+        order = np.argsort(keys, axis=0, kind="stable")
+        band_keys = np.ascontiguousarray(np.take_along_axis(keys, order, axis=0).T)
+        band_segments = np.ascontiguousarray(segments[order].T)
+        return cls(index, coefficients, offsets, signatures, band_keys, band_segments, rows)
+
+    def signature(self, bug_tokens):
+        """
+        计算错误报告词项集合的 MinHash 签名。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+        Returns:
+            numpy.ndarray: 签名；没有已知词项时返回 None。
+        """
+        terms = self.index.term_counts([bug_tokens]).indices
+        if len(terms) == 0:
+            return None
+        hashes = (self.coefficients[:, None] * terms.astype(np.uint64) + self.offsets[:, None]) % np.uint64(MERSENNE_PRIME)
+        return hashes.min(axis=1).astype(np.uint32)
+
+    def candidates(self, bug_tokens):
+        """
+        在各带的哈希表中查找与错误报告至少一个带相同的代码段。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+        Returns:
+            numpy.ndarray: 候选代码段下标（升序）。
+        """
+        signature = self.signature(bug_tokens)
+        if signature is None:
+            return np.zeros(0, dtype=np.int32)
+
+        keys = _band_keys(signature[None, :], self.rows)[0]
+        found = []
+        for band, key in enumerate(keys):
+            band_keys = self.band_keys[band]
+            low = np.searchsorted(band_keys, key, side="left")
+            high = np.searchsorted(band_keys, key, side="right")
+            if high > low:
+                found.append(self.band_segments[band, low:high])
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int32)
+
+    def top_k(self, bug_tokens, k, group_ids=None):
+        """
+        近似 top-k 检索：LSH 生成候选，只对候选做精确的 TF-IDF 余弦打分，返回格式与 VSMIndex.top_k 相同。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+            k (int): 返回的结果数。
+            group_ids (numpy.ndarray): 代码段 -> 文件分组号；给定时按组取最大值，返回 k 个不同的组。
+        Returns:
+            list: [(代码段下标, 相似度)]，按相似度从高到低排列，最多 k 项。
+        """
+        return self.index.rerank(bug_tokens, self.candidates(bug_tokens), k, group_ids)
+
+
+def save_lsh_index(lsh, path, fingerprint):
+    """
+    保存 MinHash 签名和分带哈希表（格式与 VSM 索引文件相同）。
+    Args:
+        lsh (MinHashLSH): 需要保存的候选生成器。
+        path (str): 输出文件路径。
+        fingerprint (str): 输入数据的指纹。
+    """
+    write_arrays(path, LSH_MAGIC, {"fingerprint": fingerprint, "rows": lsh.rows}, {
+        "coefficients": np.asarray(lsh.coefficients, dtype=np.uint64),
+        "offsets": np.asarray(lsh.offsets, dtype=np.uint64),
+        "signatures": np.asarray(lsh.signatures, dtype=np.uint32),
+        "band_keys": np.asarray(lsh.band_keys, dtype=np.uint64),
+        "band_segments": np.asarray(lsh.band_segments, dtype=np.int32),
+    })
+
+
+def load_lsh_index(path, index, fingerprint=None):
+    """
+    以内存映射方式打开 MinHash/LSH 索引文件。
+    Args:
+        path (str): 索引文件路径。
+        index (VSMIndex): 对应的项目索引。
+        fingerprint (str): 期望的输入指纹；不一致时视为过期。
+    Returns:
+        MinHashLSH: 加载的候选生成器；文件不存在、格式不符、已过期或与项目索引不一致时返回 None。
+    """
+    loaded = read_arrays(path, LSH_MAGIC)
+    if loaded is None:
+        return None
+    header, arrays = loaded
+    if fingerprint is not None and header["fingerprint"] != fingerprint:
+        return None
+    if arrays["signatures"].shape[0] != index.n_segments:
+        return None
+    return MinHashLSH(index, arrays["coefficients"], arrays["offsets"], arrays["signatures"],
+                      arrays["band_keys"], arrays["band_segments"], header["rows"])
+
+
+def benchmark_lsh(index, lsh, queries_tokens, k):
+    """
+    比较 LSH 候选检索与 VSM 精确 top-k 检索（按文件取最大值）的耗时、候选比例和召回率。
+    Args:
+        index (VSMIndex): 项目索引。
+        lsh (MinHashLSH): 该索引上的候选生成器。
+        queries_tokens (list): 每个错误报告的 tokens 列表。
+        k (int): 每个报告保留的文件数。
+    Returns:
+        dict: {"candidate_ratio": 候选代码段占全部代码段的平均比例, "lsh_ms": LSH 检索的平均耗时（毫秒）,
+               "exact_ms": 精确检索的平均耗时, "recall": LSH 结果中的文件占精确前 k 个文件的比例}。
+    """
+    candidate_ratio = lsh_seconds = exact_seconds = 0.0
+    hits = total = 0
+    for bug_tokens in queries_tokens:
+        candidate_ratio += len(lsh.candidates(bug_tokens)) / max(index.n_segments, 1)
+
+        start = time.perf_counter()
+        approximate = lsh.top_k(bug_tokens, k, index.file_ids)
+        lsh_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact = index.top_k(bug_tokens, k, index.file_ids)
+        exact_seconds += time.perf_counter() - start
+
+        exact_files = {index.file_ids[segment] for segment, _ in exact}
+        hits += len(exact_files & {index.file_ids[segment] for segment, _ in approximate})
+        total += len(exact_files)
+
+    n_queries = max(len(queries_tokens), 1)
+    return {
+        "candidate_ratio": candidate_ratio / n_queries,
+        "lsh_ms": 1000 * lsh_seconds / n_queries,
+        "exact_ms": 1000 * exact_seconds / n_queries,
+        "recall": hits / total if total else 1.0,
+    }
+
+
+def _band_keys(signatures, rows):
+    # 每带的 rows 个签名值按多项式合并为一个 64 位键，形状为 [签名数, 带数]
+    values = signatures.astype(np.uint64).reshape(signatures.shape[0], -1, rows)
+    keys = np.zeros(values.shape[:2], dtype=np.uint64)
+    for row in range(rows):
+        keys = keys * BAND_MULTIPLIER + values[:, :, row]
+    return keys
+
+
+if __name__ == '__main__':
+    from vsm_new_construction import VSM_STOP_WORDS, get_bug_tokens, load_or_build_lsh_index, load_or_build_project_index
+
+    parser = argparse.ArgumentParser(description="在不同的带数/行数下比较 LSH 候选检索的速度和召回率")
+    parser.add_argument("--projects", nargs="+",
+                        default=["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"])
+    parser.add_argument("--settings", nargs="+", default=["16x1", "32x2", "64x2", "32x3"],
+                        help="带数x行数，例如 32x2")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--index-dir", default="../pathidea/ProcessData/vsm_index")
+    args = parser.parse_args()
+
+    source_base_path = "../pathidea/ProcessData/source_code_tokens"
+    bug_reports_tokens, project_names, _ = get_bug_tokens("../pathidea/ProcessData/bug_reports_tokens")
+    for project in args.projects:
+        queries_tokens = [tokens for tokens, name in zip(bug_reports_tokens, project_names) if name == project]
+        index = load_or_build_project_index(source_base_path, project, VSM_STOP_WORDS, args.index_dir)
+        if index is None or not queries_tokens:
+            print(f"项目 {project} 缺少源代码或错误报告tokens，跳过")
+            continue
+
+        print(f"项目 {project}：{index.n_segments} 个代码段，{len(queries_tokens)} 个错误报告")
+        for setting in args.settings:
+            bands, rows = (int(value) for value in setting.split("x"))
+            lsh = load_or_build_lsh_index(source_base_path, project, index, VSM_STOP_WORDS, args.index_dir, bands, rows)
+            result = benchmark_lsh(index, lsh, queries_tokens, args.top_k)
+            print(f"  {bands:>3} 带 × {rows} 行\t候选比例 {result['candidate_ratio']:.3f}\tLSH 检索 {result['lsh_ms']:.3f}ms\t"
+                  f"精确检索 {result['exact_ms']:.3f}ms\ttop-{args.top_k} 召回率 {result['recall']:.3f}")
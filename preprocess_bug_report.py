@@ -1,13 +1,9 @@
 import json
 import os
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
+from itertools import chain
 
-# Download necessary NLTK data files
-nltk.download('stopwords')
-nltk.download('punkt')
+from tokenizer import get_tokenizer, split_text
 
 
 def preprocess_code(code_str, language):
@@ -15,6 +11,8 @@ def preprocess_code(code_str, language):
     Analyzes source code files and error reports by tokenizing the code,
     removing programming language-specific keywords, splitting concatenated words,
     removing stop words, and performing Porter stemming.
+    Uses the shared Tokenizer, so patterns, keyword and stop word sets are built once
+    and stems are memoized across calls.
 
     Parameters:
     code_str (str): The source code or error report as a string.
@@ -22,65 +20,7 @@ def preprocess_code(code_str, language):
     Returns:
     list: A list of processed tokens.
     """
-    # Step 1: Tokenize the code into a sequence of lexical tokens
-    tokens = re.findall(r'\b\w+\b', code_str)
-
-    # Step 2: Remove programming language-specific keywords
-
-    programming_java_keywords = [
-        # Java keywords (add more keywords for other languages if needed)
-        'abstract', 'assert', 'boolean', 'break', 'byte', 'case', 'catch', 'char',
-        'class', 'const', 'continue', 'default', 'do', 'double', 'else', 'enum',
-        'extends', 'final', 'finally', 'float', 'for', 'goto', 'if', 'implements',
-        'import', 'instanceof', 'int', 'interface', 'long', 'native', 'new',
-        'package', 'private', 'protected', 'public', 'return', 'short', 'static',
-        'strictfp', 'super', 'switch', 'synchronized', 'this', 'throw', 'throws',
-        'transient', 'try', 'void', 'volatile', 'while'
-    ]
-
-    go_keywords = [
-        'break', 'default', 'func', 'interface', 'select', 'case', 'defer', 'go',
-        'map', 'struct', 'chan', 'else', 'goto', 'package', 'switch', 'const',
-        'fallthrough', 'if', 'range', 'type', 'continue', 'for', 'import',
-        'return', 'var'
-    ]
-
-    javascript_keywords = [
-        'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default',
-        'delete', 'do', 'else', 'export', 'extends', 'finally', 'for', 'function',
-        'if', 'import', 'in', 'instanceof', 'let', 'new', 'return', 'super',
-        'switch', 'this', 'throw', 'try', 'typeof', 'var', 'void', 'while', 'with',
-        'yield'
-    ]
-    if language == 'java':
-        tokens = [token for token in tokens if token.lower() not in programming_java_keywords]
-    elif language == "go":
-        tokens = [token for token in tokens if token.lower() not in go_keywords]
-    elif language == 'js':
-        tokens = [token for token in tokens if token.lower() not in javascript_keywords]
-
-    # Step 3: Split concatenated words based on camelCase and underscores
-    split_tokens = []
-    for token in tokens:
-        # Split by underscores (snake_case)
-        subtokens = re.split(r'_', token)
-        for subtoken in subtokens:
-            # Split camelCase words
-            camel_case_tokens = re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])', subtoken)
-            split_tokens.extend(camel_case_tokens)
-
-    # Convert all tokens to lowercase
-    split_tokens = [token.lower() for token in split_tokens]
-
-    # Step 4: Remove stop words using NLTK's stop words list
-    stop_words = set(stopwords.words('english'))
-    tokens_no_stopwords = [token for token in split_tokens if token not in stop_words]
-
-    # Step 5: Perform Porter stemming to derive the common base form
-    porter = PorterStemmer()
-    stemmed_tokens = [porter.stem(token) for token in tokens_no_stopwords]
-
-    return stemmed_tokens
+    return get_tokenizer().tokenize(code_str, language)
 
 
 def process_json(bug_report, language):
@@ -92,7 +32,8 @@ def process_json(bug_report, language):
     summary = summary if isinstance(summary, str) else ''
     description = description if isinstance(description, str) else ''
 
-    text_to_process = summary + ' ' + description
+    # 按 summary + ' ' + description 的顺序流式分词，不拼接出完整文本（description 可能包含数 MB 的日志）
+    text_chunks = chain(split_text(summary), (' ',), split_text(description))
 
     # 检查 description 是否包含日志或堆栈跟踪的格式
     # log_pattern = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} \[.*?\] (DEBUG|ERROR|INFO|WARN) .*'
@@ -100,7 +41,7 @@ def process_json(bug_report, language):
     log_pattern = r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) (\w+) ([\w\.]+): (.+)'
     stack_trace_pattern = r'at ([\w\.]+)\(([\w]+\.java):\d+\)'
     if re.search(log_pattern, description) or re.search(stack_trace_pattern, description, re.MULTILINE):
-        processed_tokens = preprocess_code(text_to_process, language)
+        processed_tokens = list(get_tokenizer().iter_tokens(text_chunks, language))
         return processed_tokens
 
     return None
@@ -108,9 +49,18 @@ def process_json(bug_report, language):
 
 if __name__ == "__main__":
     '''
-        处理bug_reports并保存为bug_reports_tokens
+        处理bug_reports并保存为bug_reports_tokens，同时写入全局词表并保存编号形式的错误报告
     '''
+    # 全局词表依赖 numpy，只在处理错误报告时导入
+    from vocabulary import Vocabulary, load_vocabulary, shared_vocabulary_path
+    from vsm_new_construction import save_bug_report_ids
+
     projects = ["ActiveMQ", "Hadoop", "HDFS", "MAPREDUCE", "Hive", "Storm", "YARN", "Zookeeper"]
+    tokens_base_path = '../ProcessData/bug_reports_tokens'
+    stem_cache_path = '../ProcessData/stem_cache.json'
+    get_tokenizer().load_stem_cache(stem_cache_path)
+    # (项目名, tokens 文件名, tokens)，写入词表前按 get_bug_tokens 的顺序排序
+    bug_reports = []
     for project in projects:
         directory = '../ProcessData/bug_reports/'+ project + '/details'
 
@@ -120,12 +70,26 @@ if __name__ == "__main__":
         files = [item.strip('.json') for item in items if os.path.isfile(os.path.join(directory, item))]
         print(files)
 
+        # 每个项目一个目录（与 get_bug_tokens 读取的布局一致），先删除上一次的 tokens 文件，编号文件只对应本次的结果
+        project_tokens_path = os.path.join(tokens_base_path, project)
+        os.makedirs(project_tokens_path, exist_ok=True)
+        for item in os.listdir(project_tokens_path):
+            if item.endswith('_token.txt'):
+                os.remove(os.path.join(project_tokens_path, item))
+
         for name in files:
             with open('../ProcessData/bug_reports/' + project + '/' + name + '.json', 'r') as f:
                 data = json.load(f)
 
             processed_tokens = process_json(data, 'java')
             if processed_tokens is not None and len(processed_tokens) > 0:
-                with open('../ProcessData/bug_reports_tokens/'+ project + name + '_token.txt', 'w') as f:
+                with open(os.path.join(project_tokens_path, name + '_token.txt'), 'w', encoding='utf-8') as f:
                     f.write('\n'.join(processed_tokens))
-
+                bug_reports.append((project, name + '_token.txt', processed_tokens))
+    get_tokenizer().save_stem_cache(stem_cache_path)
+
+    bug_reports.sort(key=lambda report: report[:2])
+    vocabulary_path = shared_vocabulary_path(tokens_base_path)
+    save_bug_report_ids(tokens_base_path, load_vocabulary(vocabulary_path) or Vocabulary(), vocabulary_path,
+                        [tokens for _, _, tokens in bug_reports], [project for project, _, _ in bug_reports],
+                        [file_name.replace('.txt', '') for _, file_name, _ in bug_reports])
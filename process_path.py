@@ -1,6 +1,7 @@
-import json
+import argparse
 import re
 import os
+import time
 
 import evaluation
 
@@ -52,49 +53,59 @@ def process_vsm_scores(vsm_result):
             vsm_process_result[vsm_class_name]= vsm_score
     return vsm_process_result
 
-# 加载调用图
-def load_call_graph(callgraph_json):
-    call_graph = {}
+# 每个项目编译后的调用图在进程内只读取一次
+_call_graphs = {}
 
-    # 遍历 JSON 中的键值对
-    for method, called_methods in callgraph_json.items():
-        call_graph[method] = called_methods
-    
+def get_call_graph(project_name):
+    """
+    读取项目编译后的调用图（首次使用时编译 JSON 调用图），同一进程内的错误报告共用。
+    Args:
+        project_name (str): 项目名称。
+    Returns:
+        CallGraph: 编译后的调用图，支持 method in graph 和 graph[method]。
+    """
+    call_graph = _call_graphs.get(project_name)
+    if call_graph is None:
+        from call_graph import load_or_compile_call_graph
+        call_graph = _call_graphs[project_name] = load_or_compile_call_graph(project_name)
     return call_graph
 
+# 每个项目缩点后的调用图及其分量闭包缓存，同一进程内的错误报告共用
+_condensed_call_graphs = {}
+# 分量闭包缓存的字节上限，为 None 时使用 call_graph.CLOSURE_CACHE_BYTES
+closure_cache_bytes = None
+
+def get_condensed_call_graph(project_name):
+    """
+    读取项目按强连通分量缩点后的调用图，错误报告之间共享每个分量可达的类的缓存。
+    Args:
+        project_name (str): 项目名称。
+    Returns:
+        CondensedCallGraph: 缩点后的调用图。
+    """
+    condensed = _condensed_call_graphs.get(project_name)
+    if condensed is None:
+        from call_graph import CLOSURE_CACHE_BYTES, CondensedCallGraph
+        cache_bytes = CLOSURE_CACHE_BYTES if closure_cache_bytes is None else closure_cache_bytes
+        condensed = _condensed_call_graphs[project_name] = CondensedCallGraph(get_call_graph(project_name), cache_bytes)
+    return condensed
+
 # 重构执行路径
-def reconstruct_execution_paths(log_methods, call_graph):
-    def dfs(method, call_graph, visited):
-        """
-        深度优先搜索，递归构建执行路径。
-        Args:
-            method (str): 当前方法。
-            call_graph (dict): 调用图。
-            visited (set): 已访问方法集合，防止循环。
-        Returns:
-            dict: 以当前方法为根的执行路径。
-        """
-        method = re.sub(r"\(.*?\)", "", method)
-        if method in visited:  # 防止循环调用
-            return None
-        visited.add(method)
-
-        path = {method: []}  # 当前方法为根节点
-        if method in call_graph:  # 如果该方法存在于调用图中
-            for next_method in call_graph[method]:
-                sub_path = dfs(next_method, call_graph, visited)  # 递归构建子路径
-                if sub_path:
-                    path[method].append(sub_path)  # 添加子路径
-        return path
-
-    execution_paths = {}
-    visited = set()
-    for method in log_methods:
-        if method not in visited:
-            path = dfs(method, call_graph, visited)
-            if path:
-                execution_paths.update(path)
-    return execution_paths
+def reconstruct_execution_paths(log_methods, call_graph, as_tree=False):
+    """
+    从日志中的方法出发在编译后的调用图上按层推进，求可达的方法和类（迭代实现，不受递归层数限制）。
+    Args:
+        log_methods (list): 日志中的方法名。
+        call_graph (CallGraph): 编译后的调用图。
+        as_tree (bool): 是否构建嵌套的执行路径树 {方法: [子路径, ...]}，仅用于调试查看。
+    Returns:
+        Reachability: 可达方法的位图和可达的类；as_tree 为 True 时返回执行路径树（dict）。
+    """
+    from call_graph import execution_tree, trace_reachable
+
+    if as_tree:
+        return execution_tree(call_graph, log_methods)
+    return trace_reachable(call_graph, log_methods)
 
 # 去除重复路径
 def remove_duplicate_paths(execution_paths):
@@ -112,33 +123,52 @@ def find_class_in_execution_paths(execution_paths, target_class):
     在 execution_paths 中查找某个类是否出现过。
 
     Args:
-        execution_paths (dict): 执行路径的树状结构。
-        target_class (str): 需要查找的类名。
+        execution_paths (Reachability | dict): 可达的方法和类，或调试用的执行路径树。
+        target_class (str): 需要查找的类名（在可达类中按简单类名精确查找，在执行路径树中按子串查找）。
 
     Returns:
         bool: 如果找到目标类，返回 True；否则返回 False。
     """
-    for method, sub_paths in execution_paths.items():
-        # 检查当前方法是否包含目标类名
-        if target_class in method:
-            return True
-        # 递归检查子路径
-        for sub_path in sub_paths:
-            if find_class_in_execution_paths(sub_path, target_class):
+    if not isinstance(execution_paths, dict):
+        return target_class in execution_paths.class_index()
+    # 执行路径树：用显式栈遍历，避免深层路径超出递归层数
+    stack = [execution_paths]
+    while stack:
+        for method, sub_paths in stack.pop().items():
+            # 检查当前方法是否包含目标类名
+            if target_class in method:
                 return True
+            stack.extend(sub_paths)
     return False
 
 # 计算路径分数（path_score）
-def calculate_path_score(execution_paths, vsm_result_key, vsm_result_value, beta=0.2):
-    vsm_class_name = re.sub("\.java", "", vsm_result_key.split("/")[-1])
-    vsm_score = float(vsm_result_value)
-    # print(vsm_class_name)
+def calculate_path_scores(class_index, vsm_result, beta=0.2):
+    """
+    对整个 VSM 结果计算路径分数，可达类的索引每个错误报告只构建一次，每个文件一次哈希查找。
+    Args:
+        class_index (ClassIndex): 可达类的索引，例如 Reachability.class_index() 或按深度加权的索引。
+        vsm_result (dict): 文件路径 -> 归一化的 VSM 得分。
+        beta (float): 路径分数的权重。
+    Returns:
+        list: "文件路径: 路径分数" 形式的结果（路径分数 = beta * VSM 得分 * 类的权重），顺序与 vsm_result 相同。
+    """
+    scores = []
+    for key, value in vsm_result.items():
+        weight = class_index.file_weight(key)
+        if weight > 0:
+            scores.append(key + ": " + str(beta * float(value) * weight))
+    return scores
 
-    if find_class_in_execution_paths(execution_paths, vsm_class_name):
-        path_score = beta * vsm_score
-        return vsm_result_key + ": " + str(path_score)
+# 保存一个错误报告的路径得分
+def save_path_scores(report_name, scores):
+    output_directory = f"../pathidea/ProcessData/path_results"
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
 
-    return None
+    output_file_path = f"{output_directory}/{report_name}_paths_score.txt"
+    with open(output_file_path, "w", encoding="utf-8") as output_file:
+        for score in scores:
+            output_file.write(f"{score}\n")
 
 
 # 分析路径（包括重构路径和计算分数）
@@ -147,46 +177,73 @@ def analyze_paths(project_name, log_text, vsm_result, report_name):
         if log_text:
             # 获得日志中方法
             log_methods = extract_methods_from_log(log_text)
-            callgraph_path = f"../pathidea/ProcessData/call_graph/{project_name}/{project_name}CallGraph.json"
+            # 加载缩点后的调用图（同一项目只读取一次，入口方法的可达类在错误报告之间复用）
+            call_graph = get_condensed_call_graph(project_name)
 
-            with open(callgraph_path, 'r', encoding='utf-8') as file:
-                call_graph_json = json.load(file)
-                # 加载调用图
-                call_graph = load_call_graph(call_graph_json)
-            
-            # 获取执行路径
-            execution_paths = reconstruct_execution_paths(log_methods, call_graph)
+            # 获取执行路径上可达的类
+            execution_paths = call_graph.trace_reachable(log_methods)
 
             # 去除重复路径
             # unique_paths = remove_duplicate_paths(execution_paths)
 
-            # 保存路径和得分到单独的文件
-            output_directory = f"../pathidea/ProcessData/path_results"
-            if not os.path.exists(output_directory):
-                os.makedirs(output_directory)
-
-            output_file_path = f"{output_directory}/{report_name}_paths_score.txt"
-            # 计算路径得分
-            with open(output_file_path, "w", encoding="utf-8") as output_file:
-                for k,v in vsm_result.items():
-                    score = calculate_path_score(execution_paths, k, v, beta=0.2)
-                    if score:
-                        output_file.write(f"{score}\n")
+            # 计算路径得分，保存到单独的文件
+            save_path_scores(report_name, calculate_path_scores(execution_paths.class_index(), vsm_result, beta=0.2))
 
     except Exception as e:
         print(f"Error processing bug report {report_name}: {e}")
 
+def analyze_project_paths(project_name, reports, max_depth=None, decay=1.0, block_size=64):
+    """
+    按调用距离对一个项目的全部错误报告同时计算路径分数：类与日志中方法的最短调用距离为 d 时，
+    路径分数为 beta * VSM 得分 * decay ** d，超过 max_depth 的类不计分。
+    decay 为 1 且不限制 max_depth 时与 analyze_paths 的结果相同。
+    Args:
+        project_name (str): 项目名称。
+        reports (list): [(错误报告名, 日志文本, 归一化的 VSM 得分)]。
+        max_depth (int): 最大调用距离，为 None 时不限制。
+        decay (float): 每多一层调用的衰减系数。
+        block_size (int): 每次同时推进的错误报告数。
+    Returns:
+        int: 写出结果的错误报告数；出错（如缺少调用图）时打印错误并返回 None，不影响其他项目。
+    """
+    from call_graph import depth_class_indexes
+
+    try:
+        # 与 analyze_paths 一致，没有日志文本的错误报告不输出结果
+        reports = [report for report in reports if report[1]]
+        call_graph = get_call_graph(project_name)
+        log_methods = [extract_methods_from_log(log_text) for _, log_text, _ in reports]
+        class_indexes = depth_class_indexes(call_graph, log_methods, max_depth, decay, block_size)
+        for (report_name, _, vsm_result), class_index in zip(reports, class_indexes):
+            save_path_scores(report_name, calculate_path_scores(class_index, vsm_result, beta=0.2))
+        return len(reports)
+    except Exception as e:
+        print(f"Error processing project {project_name}: {e}")
+        return None
+
 if __name__ == "__main__":
-    # Example for analyzing paths for a specific project
-    # project_name = "Zookeeper"
+    parser = argparse.ArgumentParser(description="根据日志中的方法和调用图计算路径得分")
+    parser.add_argument("--projects", nargs="+", default=project_names)
+    parser.add_argument("--mode", choices=["reach", "depth"], default="reach",
+                        help="reach：可达的类统一计分；depth：按与日志中方法的调用距离衰减，一个项目的错误报告批量计算")
+    parser.add_argument("--max-depth", type=int, default=None, help="depth 模式下的最大调用距离，默认不限制")
+    parser.add_argument("--decay", type=float, default=0.5, help="depth 模式下每多一层调用的衰减系数")
+    parser.add_argument("--block-size", type=int, default=64, help="depth 模式下每次同时推进的错误报告数")
+    parser.add_argument("--closure-cache-mb", type=float, default=256,
+                        help="reach 模式下各强连通分量可达类缓存的内存上限（MB）")
+    args = parser.parse_args()
+    if not 0 < args.decay <= 1:
+        parser.error("--decay 须在 (0, 1] 范围内")
+    closure_cache_bytes = int(args.closure_cache_mb * (1 << 20))
 
-    for project_name in project_names:
+    for project_name in args.projects:
         log_directory = f'../pathidea/ProcessData/log_texts/{project_name}'
         vsm_directory = f'../pathidea/ProcessData/vsm_result'
         if not os.path.exists(log_directory):
             print(f"Directory for {project_name} not found.")
         else:
             files = [item for item in os.listdir(log_directory) if os.path.isfile(os.path.join(log_directory, item))]
+            reports = []
             for name in files:
                 try:
                     # 读取日志内容
@@ -197,8 +254,22 @@ if __name__ == "__main__":
                     with open(f"{vsm_directory}/{vsm_name}", "r") as f:
                         vsm_result = f.read().split("\n")
                     process_vsm_score = evaluation.normalize_vsm_scores(process_vsm_scores(vsm_result))
+                    if args.mode == "depth":
+                        reports.append((name.replace("_report_text.txt", ""), log_text, process_vsm_score))
+                        continue
                     # Analyze the execution paths and compute scores
                     analyze_paths(project_name, log_text, process_vsm_score, name.replace("_report_text.txt", ""))
                     print(f"Success processing file {name}")
                 except Exception as e:
                     print(f"Error processing file {name}: {e}")
+            if project_name in _condensed_call_graphs:
+                condensed = _condensed_call_graphs.pop(project_name)
+                print(f"项目 {project_name}：{condensed.graph.n_methods} 个方法缩为 {condensed.n_components} 个强连通分量，"
+                      f"闭包缓存命中 {condensed.hits} 次，未命中 {condensed.misses} 次，"
+                      f"占用 {condensed.cached_bytes / 1024:.1f} KB")
+            if reports:
+                start = time.perf_counter()
+                count = analyze_project_paths(project_name, reports, args.max_depth, args.decay, args.block_size)
+                if count is not None:
+                    print(f"项目 {project_name}：按调用距离计算了 {count} 个错误报告的路径得分，"
+                          f"用时 {time.perf_counter() - start:.3f}s")
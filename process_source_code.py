@@ -1,132 +1,563 @@
+import argparse
+import hashlib
 import json
 import os
-import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
+from collections import Counter
+from contextlib import nullcontext
+from multiprocessing import Pool
 
-# Download necessary NLTK data files
-nltk.download('stopwords')
-nltk.download('punkt')
+from java_lexer import LEXER_SKIPS, get_lexer
+from tokenizer import get_tokenizer, read_chunks
 
+# 词干表缓存，多次运行之间复用
+STEM_CACHE_PATH = '../pathidea/ProcessData/stem_cache.json'
+# 并行分词时每个工作单元的目标字节数
+DEFAULT_CHUNK_BYTES = 4 << 20
+# 项目 tokens 目录中的分词清单和最近一次的变更摘要（以 . 开头，不会被当作 tokens 文件读取）
+MANIFEST_NAME = '.manifest.json'
+CHANGES_NAME = '.changes.json'
 
-def preprocess_code(code_str, language, segment_size):
+
+def preprocess_tokens(code_str, language):
     """
     对源代码进行预处理，进行标记化、去除特定语言关键词、分割拼接单词、去除停用词以及Porter词干提取。
+    使用进程内共享的分词器，正则、关键词表和停用词表只构建一次，词干提取结果被缓存。
 
     参数:
     code_str (str): 源代码字符串或错误报告字符串。
     language (str): 编程语言（如 'java'、'go'、'js'）。
 
     返回:
-    list: 处理后的tokens列表。
+    list: 处理后的tokens列表（未分段）。
     """
-    # Step 1: Tokenize the code into a sequence of lexical tokens
-    tokens = re.findall(r'\b\w+\b', code_str)
+    return get_tokenizer().tokenize(code_str, language)
 
-    # Step 2: Remove programming language-specific keywords
-    programming_java_keywords = [
-        'abstract', 'assert', 'boolean', 'break', 'byte', 'case', 'catch', 'char',
-        'class', 'const', 'continue', 'default', 'do', 'double', 'else', 'enum',
-        'extends', 'final', 'finally', 'float', 'for', 'goto', 'if', 'implements',
-        'import', 'instanceof', 'int', 'interface', 'long', 'native', 'new',
-        'package', 'private', 'protected', 'public', 'return', 'short', 'static',
-        'strictfp', 'super', 'switch', 'synchronized', 'this', 'throw', 'throws',
-        'transient', 'try', 'void', 'volatile', 'while'
-    ]
 
-    if language == 'java':
-        tokens = [token for token in tokens if token.lower() not in programming_java_keywords]
+def segment_tokens(tokens, segment_size):
+    # 将tokens按segment_size切分为若干段
+    return [tokens[i:i + segment_size] for i in range(0, len(tokens), segment_size)]
 
-    # Step 3: Split concatenated words based on camelCase and underscores
-    split_tokens = []
-    for token in tokens:
-        # Split by underscores (snake_case)
-        subtokens = re.split(r'_', token)
-        for subtoken in subtokens:
-            # Split camelCase words
-            camel_case_tokens = re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])', subtoken)
-            split_tokens.extend(camel_case_tokens)
 
-    # Convert all tokens to lowercase
-    split_tokens = [token.lower() for token in split_tokens]
+def preprocess_code(code_str, language, segment_size):
+    """
+    对源代码进行预处理并按segment_size分段。
 
-    # Step 4: Remove stop words using NLTK's stop words list
-    stop_words = set(stopwords.words('english'))
-    tokens_no_stopwords = [token for token in split_tokens if token not in stop_words]
+    参数:
+    code_str (str): 源代码字符串或错误报告字符串。
+    language (str): 编程语言（如 'java'、'go'、'js'）。
+    segment_size (int): 每段的token数。
 
-    # Step 5: Perform Porter stemming to derive the common base form
-    porter = PorterStemmer()
-    stemmed_tokens = [porter.stem(token) for token in tokens_no_stopwords]
+    返回:
+    list: 分段后的tokens列表。
+    """
+    return segment_tokens(preprocess_tokens(code_str, language), segment_size)
 
-    # Split the stemmed_tokens into segments
-    segmented_tokens = [stemmed_tokens[i:i + segment_size] for i in range(0, len(stemmed_tokens), segment_size)]
 
-    return segmented_tokens
+def stream_segments(file_path, language, segment_size, skip=()):
+    """
+    流式读取源代码文件并分段：逐块读取、逐个处理 token，每凑满 segment_size 个 token 立即产生一段，
+    内存占用只与读取块和分段大小有关。skip 为空时由共享的 Tokenizer 分词（带标识符缓存，比单遍词法分析器快），
+    结果与 preprocess_code 对整个文件内容的结果相同；否则由 Java 词法分析器跳过相应的注释、字符串或
+    import/package 语句（见 java_lexer.JavaLexer）。
 
+    参数:
+    file_path (str): 源代码文件路径。
+    language (str): 编程语言（如 'java'、'go'、'js'）。
+    segment_size (int): 每段的token数。
+    skip (iterable): 跳过的词法单元（java_lexer.LEXER_SKIPS 的子集）。
+
+    返回:
+    generator: 逐段产生 tokens 列表。
+    """
+    with open(file_path, 'r', encoding='utf-8', errors="replace") as f:
+        if skip:
+            yield from get_lexer(skip).iter_segments(read_chunks(f), language, segment_size)
+        else:
+            yield from get_tokenizer().iter_segments(read_chunks(f), language, segment_size)
+
+
+def scan_source_files(source_code_directory, language):
+    """
+    用 os.scandir 递归查找源代码文件，顺序与 os.walk 自顶向下遍历一致，测试目录整体跳过。
+
+    参数：
+    source_code_directory (str): 源代码目录的路径。
+    language (str): 编程语言（如 'java'）。
+
+    返回：
+    generator: (文件路径, 文件字节数, 修改时间（纳秒）)。
+    """
+    # 与 os.walk 相同：不跟随符号链接进入子目录，无法读取的目录直接跳过
+    try:
+        with os.scandir(source_code_directory) as it:
+            entries = list(it)
+    except OSError:
+        return
+
+    subdirectories = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            try:
+                if not entry.is_symlink():
+                    subdirectories.append(entry.path)
+            except OSError:
+                pass
+        elif entry.name.endswith('.' + language):
+            try:
+                stat = entry.stat()
+                size, mtime_ns = stat.st_size, stat.st_mtime_ns
+            except OSError:
+                size, mtime_ns = 0, 0
+            yield entry.path, size, mtime_ns
+
+    for subdirectory in subdirectories:
+        # 不考虑源代码测试用例
+        if 'test' not in subdirectory.split(os.path.sep):
+            yield from scan_source_files(subdirectory, language)
+
+
+def iter_source_files(source_code_directory, language):
+    """
+    遍历源代码目录，跳过测试目录，逐个返回源代码文件。
+
+    参数：
+    source_code_directory (str): 源代码目录的路径。
+    language (str): 编程语言（如 'java'）。
+
+    返回：
+    generator: (文件路径, 相对路径, 类名)。
+    """
+    if 'test' in source_code_directory.split(os.path.sep):
+        return
+    for file_path, _, _ in scan_source_files(source_code_directory, language):
+        file = os.path.basename(file_path)
+        yield file_path, os.path.relpath(file_path, source_code_directory), os.path.splitext(file)[0]
+
+
+def get_source_code_directory(project):
+    # 项目源代码所在目录
+    if project == 'Hadoop':
+        return '../pathidea/project_version_in_paper/' + project + "hadoop-common-project"
+    return '../pathidea/project_version_in_paper/' + project
+
+
+def write_segment_files(project_dir, relative_path, class_name, segments):
+    # 每段写入一个 类名_序号_tokens.txt 文件，第一行为 Java 文件的相对路径；segments 可以是生成器，逐段写出，返回段数
+    n_segments = 0
+    for segment in segments:
+        n_segments += 1
+        output_file = os.path.join(project_dir, f"{class_name}_{n_segments}_tokens.txt")
+        with open(output_file, 'w', encoding='utf-8') as f:
+            # 写入相对路径作为第一行
+            f.write(relative_path + '\n')
+            # 写入处理后的tokens
+            f.write('\n'.join(segment))
+    return n_segments
+
+
+def chunk_by_bytes(source_files, chunk_bytes):
+    """
+    按文件字节数把源代码文件依次分成若干工作单元，超过 chunk_bytes 的大文件单独成块。
+
+    参数：
+    source_files (list): [(文件路径, 文件字节数, ...)]，按遍历顺序排列。
+    chunk_bytes (int): 每个工作单元的目标字节数。
 
-def analyze_project_source_code(source_code_directory, language):
+    返回：
+    list: 工作单元列表，每个单元为连续的若干文件。
+    """
+    chunks = []
+    chunk = []
+    total = 0
+    for source_file in source_files:
+        size = source_file[1]
+        if chunk and total + size > chunk_bytes:
+            chunks.append(chunk)
+            chunk, total = [], 0
+        chunk.append(source_file)
+        total += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def tokenize_source_chunk(args):
+    """
+    处理一个工作单元：逐个文件流式分词、分段。写出文本布局时，类名在项目中唯一的文件每凑满一段即写出 tokens 文件，
+    类名重复的文件把分段结果交回主进程，按遍历顺序写出，保证同名文件的覆盖顺序与串行处理一致；
+    构建打包存储时全部分段结果都交回主进程。
+
+    参数：
+    args (tuple): (工作单元, 源代码目录, 输出目录, 编程语言, 分段大小, 是否写出文本布局, 是否交回全部分段结果,
+                   跳过的词法单元)。
+
+    返回：
+    tuple: ([(相对路径, 类名, 分段结果或 None, 段数)], 本工作单元新计算的词干)，
+           新词干由主进程合并到词干表中保存。
+    """
+    chunk, source_code_directory, project_dir, language, segment_size, write_text, keep_segments, skip = args
+    results = []
+    for file_path, _, class_name, unique in chunk:
+        relative_path = os.path.relpath(file_path, source_code_directory)
+        segments = stream_segments(file_path, language, segment_size, skip)
+        returned = keep_segments or (write_text and not unique)
+        if not returned:
+            # 不需要交回的分段结果边生成边写出，不在内存中保留整个文件的 tokens
+            n_segments = write_segment_files(project_dir, relative_path, class_name, segments)
+            results.append((relative_path, class_name, None, n_segments))
+            continue
+        segments = list(segments)
+        if write_text and unique:
+            write_segment_files(project_dir, relative_path, class_name, segments)
+        results.append((relative_path, class_name, segments, len(segments)))
+    return results, get_tokenizer().take_new_stems()
+
+
+def load_manifest(project_dir):
+    # 读取项目的分词清单，不存在时返回 None
+    manifest_path = os.path.join(project_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(project_dir, manifest):
+    # 先写临时文件再替换，避免中断时留下不完整的清单
+    manifest_path = os.path.join(project_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def hash_source_file(file_path):
+    # 源代码文件内容的 SHA-1
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def diff_manifest(previous, current):
+    """
+    比较新旧清单，得到新增、修改和删除的源代码文件。
+
+    参数：
+    previous (dict): 上一次的清单条目，相对路径 -> {"hash", "class_name", "segments", ...}。
+    current (dict): 本次扫描得到的清单条目。
+
+    返回：
+    tuple: (新增的相对路径, 修改的相对路径, 删除的相对路径)，均按路径排序。
+    """
+    added = sorted(path for path in current if path not in previous)
+    changed = sorted(path for path in current if path in previous and previous[path]["hash"] != current[path]["hash"])
+    deleted = sorted(path for path in previous if path not in current)
+    return added, changed, deleted
+
+
+def segment_file_names(class_name, n_segments):
+    return [f"{class_name}_{i+1}_tokens.txt" for i in range(n_segments)]
+
+
+def referenced_hashes(output_base_dir):
+    # source_code_tokens 下全部项目清单引用的源代码内容哈希
+    hashes = set()
+    for project in os.listdir(output_base_dir):
+        project_dir = os.path.join(output_base_dir, project)
+        if project.startswith('.') or not os.path.isdir(project_dir):
+            continue
+        manifest = load_manifest(project_dir)
+        if manifest is not None:
+            hashes.update(entry["hash"] for entry in manifest["files"].values())
+    return hashes
+
+
+def _init_worker(stem_cache_path):
+    # 工作进程启动时预加载词干表
+    get_tokenizer().load_stem_cache(stem_cache_path)
+
+
+def analyze_project_source_code(source_code_directory, language, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES,
+                                incremental=False, output_format="text", skip=(), dedup=False):
     """
     遍历指定目录中的所有源代码文件，将每个文件的token单独保存到对应的txt文件中。
+    workers 大于 1 时由进程池并行分词，输出的文件名和内容与串行处理完全一致。
+
+    每次处理后在项目目录中写入清单（相对路径 -> 内容哈希、类名、段数）和变更摘要。
+    incremental 为 True 时只重新分词新增或修改的文件，并删除已删除文件的 tokens 文件；
+    由于同名类写入相同的 tokens 文件，涉及变更的类名下的全部文件都会按遍历顺序重新处理，
+    结果与完整处理一致。
+
+    output_format 为 packed 或 both 时另外写出项目的打包 token 存储（token_store.TOKEN_STORE_NAME），
+    packed 时不再写出每段一个的 tokens 文件，需要时可用 TokenStore.export_text 导出。
+
+    skip 列出分词时跳过的注释、字符串或 import/package 语句；为空时输出与原分词流程一致。
+
+    dedup 为 True 时使用 source_code_tokens 下所有项目共享的内容寻址存储（token_store.content_store_path）：
+    内容哈希已在存储中的文件不再分词，直接复用；新分词的文件加入存储，不再被任何项目清单引用的内容被删除。
+    output_format 为 ref 时（隐含 dedup）项目目录中只写出对内容寻址存储的引用文件（token_store.TOKEN_REFS_NAME）。
+    打包存储和内容寻址存储的 token 编号都写入与错误报告共用的全局词表（vocabulary.shared_vocabulary_path），
+    多个项目可以同时处理：词表和共享存储在词表锁内合并后写出。
 
     参数：
     source_code_directory (str): 源代码目录的路径。
     language (str): 编程语言（如 'java'）。
+    workers (int): 工作进程数，默认为 CPU 核数；为 1 时在当前进程中串行处理。
+    chunk_bytes (int): 每个工作单元的目标字节数。
+    incremental (bool): 是否根据上一次的清单增量处理。
+    output_format (str): text（每段一个 tokens 文件）、packed（打包存储）、both 或 ref（只保存引用）。
+    skip (iterable): 跳过的词法单元（java_lexer.LEXER_SKIPS 的子集）。
+    dedup (bool): 是否通过内容寻址存储在项目之间复用内容相同的文件的分词结果。
+
+    返回：
+    dict: 变更摘要 {"added", "changed", "deleted", "unchanged", "reused", "written_segments", "removed_segments"}。
     """
+    # 打包存储依赖 numpy/scipy，只在主进程处理项目时导入，工作进程不需要
+    from token_store import (TOKEN_REFS_NAME, TOKEN_STORE_NAME, TokenStoreWriter, content_store_path,
+                             load_content_store, load_token_store, save_token_refs, save_token_store,
+                             update_content_store)
+    from vocabulary import Vocabulary, load_vocabulary, locked_vocabulary, merge_vocabulary, shared_vocabulary_path
+
     segment_size = 800
     # 创建 source_code_tokens 目录（如果不存在）
     output_base_dir = '../pathidea/ProcessData/source_code_tokens'
-    if not os.path.exists(output_base_dir):
-        os.makedirs(output_base_dir)
+    # 获取项目名称并创建项目目录
+    project_name = os.path.basename(source_code_directory)
+    project_dir = os.path.join(output_base_dir, project_name)
+    if not os.path.exists(project_dir):
+        os.makedirs(project_dir)
+
+    if 'test' in source_code_directory.split(os.path.sep):
+        source_files = []
+    else:
+        source_files = list(scan_source_files(source_code_directory, language))
+    class_names = [os.path.splitext(os.path.basename(file_path))[0] for file_path, _, _ in source_files]
+
+    # 语言、分段大小或跳过的词法单元不同的旧清单不能用于比较哈希
+    skip = sorted(set(skip))
+    manifest = load_manifest(project_dir)
+    compatible = (manifest is not None and manifest["language"] == language and manifest["segment_size"] == segment_size
+                  and manifest.get("skip", []) == skip)
+    previous = manifest["files"] if compatible else {}
+    write_text = output_format in ("text", "both")
+    write_store = output_format in ("packed", "both")
+    write_refs = output_format == "ref"
+    dedup = dedup or write_refs
+    vocabulary_path = shared_vocabulary_path(output_base_dir)
+    vocabulary = (load_vocabulary(vocabulary_path) or Vocabulary()) if write_store or dedup else None
+
+    # 大小和修改时间都没有变化的文件沿用旧哈希，不再读取内容
+    current = {}
+    for (file_path, size, mtime_ns), class_name in zip(source_files, class_names):
+        relative_path = os.path.relpath(file_path, source_code_directory)
+        entry = previous.get(relative_path)
+        if entry is not None and entry["size"] == size and entry["mtime_ns"] == mtime_ns:
+            digest = entry["hash"]
+        else:
+            digest = hash_source_file(file_path)
+        current[relative_path] = {"hash": digest, "class_name": class_name, "size": size, "mtime_ns": mtime_ns,
+                                  "segments": 0}
+    added, changed, deleted = diff_manifest(previous, current)
 
-    # 遍历目录及其子目录
-    for root, dirs, files in os.walk(source_code_directory):
-        for file in files:
-            # 不考虑源代码测试用例
-            if 'test' in root.split(os.path.sep):
-                continue
+    # 只有上一次写出了本次需要的全部输出格式时才能增量处理；打包存储还需要能读取旧存储
+    store_path = os.path.join(project_dir, TOKEN_STORE_NAME)
+    previous_formats = {"text": {"text"}, "packed": {"packed"}, "both": {"text", "packed"}, "ref": set()}[
+        manifest.get("output_format", "text") if compatible else "text"]
+    previous_store = None
+    if incremental and compatible and write_store and "packed" in previous_formats:
+        previous_store = load_token_store(store_path, vocabulary)
+    can_update = (incremental and compatible and (not write_text or "text" in previous_formats)
+                  and (not write_store or previous_store is not None))
 
-            if file.endswith('.' + language):
-                file_path = os.path.join(root, file)
+    removed_segments = set()
+    if can_update:
+        affected = {current[path]["class_name"] for path in added + changed}
+        affected |= {previous[path]["class_name"] for path in changed + deleted}
+        # 先删除涉及变更的类名的全部旧 tokens 文件，其余文件沿用旧的段数
+        for path, entry in previous.items():
+            if entry["class_name"] in affected:
+                removed_segments.update(segment_file_names(entry["class_name"], entry["segments"]))
+            elif path in current:
+                current[path]["segments"] = entry["segments"]
+        for name in removed_segments:
+            output_file = os.path.join(project_dir, name)
+            if os.path.exists(output_file):
+                os.remove(output_file)
+        selected = [class_name in affected for class_name in class_names]
+    else:
+        selected = [True] * len(source_files)
 
-                # 相对路径
-                relative_path = os.path.relpath(file_path, source_code_directory)
+    relative_paths = list(current)
+    hashes = [current[relative_path]["hash"] for relative_path in relative_paths]
+    content_path = content_store_path(output_base_dir, language, segment_size, skip)
+    content, content_lookup = load_content_store(content_path, vocabulary) if dedup else (None, {})
+    if write_refs:
+        # 只保存引用时，每个文件的内容都必须在内容寻址存储中
+        selected = [keep or digest not in content_lookup for keep, digest in zip(selected, hashes)]
+    # 需要处理且内容已在存储中的文件直接复用，不交给工作进程
+    cached = [keep and digest in content_lookup for keep, digest in zip(selected, hashes)]
 
-                # 处理代码
-                with open(file_path, 'r', encoding='utf-8', errors="replace") as f:
-                    code_str = f.read()
-                    tokens = preprocess_code(code_str, language, segment_size)
+    name_counts = Counter(class_names)
+    # 工作单元中的每个文件：(文件路径, 字节数, 类名, 类名是否唯一)
+    chunks = chunk_by_bytes([(file_path, size, class_name, name_counts[class_name] == 1)
+                             for (file_path, size, _), class_name, keep, hit
+                             in zip(source_files, class_names, selected, cached) if keep and not hit], chunk_bytes)
+    tasks = [(chunk, source_code_directory, project_dir, language, segment_size, write_text, write_store or dedup,
+              skip) for chunk in chunks]
 
-                # 获取项目名称和类名
-                project_name = os.path.basename(source_code_directory)
-                class_name = os.path.splitext(file)[0]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        results = map(tokenize_source_chunk, tasks)
+        pool = None
+    else:
+        pool = Pool(workers, initializer=_init_worker, initargs=(STEM_CACHE_PATH,))
+        # imap 按提交顺序返回结果，主进程据此按遍历顺序写出类名重复的文件
+        results = pool.imap(tokenize_source_chunk, tasks)
 
-                # 创建项目目录
-                project_dir = os.path.join(output_base_dir, project_name)
-                if not os.path.exists(project_dir):
-                    os.makedirs(project_dir)
+    writer = TokenStoreWriter(language, segment_size, vocabulary) if write_store else None
+    if previous_store is not None:
+        previous_files = {path: i for i, path in enumerate(previous_store.file_paths)}
+        previous_remap = writer.intern_terms(previous_store.terms)
+    if writer is not None and content is not None:
+        content_remap = writer.intern_terms(content.terms)
+    next_file = 0
+    new_content = {}    # 新分词的内容：内容哈希 -> (token 编号数组, 每段的 token 数)
+    written_segments = set()
 
-                # 创建类名_tokens.txt 文件
-                for i in range(len(tokens)):
-                    output_file = os.path.join(project_dir, f"{class_name}_{i+1}_tokens.txt")
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        # 写入相对路径作为第一行
-                        f.write(relative_path + '\n')
-                        # 写入处理后的tokens
-                        f.write('\n'.join(tokens[i]))
+    # 按遍历顺序处理工作进程结果之间的文件：未重新处理的文件从旧存储复制到打包存储，
+    # 复用内容寻址存储的文件由主进程写出，同名类的覆盖顺序与串行处理一致
+    def carry_until(stop):
+        nonlocal next_file
+        while next_file < stop:
+            relative_path, class_name = relative_paths[next_file], class_names[next_file]
+            if not selected[next_file]:
+                if writer is not None:
+                    token_ids, segment_lengths = previous_store.file_segment_ids(previous_files[relative_path])
+                    writer.add_file_ids(relative_path, class_name, token_ids, segment_lengths, previous_remap)
+            elif cached[next_file]:
+                file_id = content_lookup[hashes[next_file]]
+                segments = range(content.file_segments[file_id], content.file_segments[file_id + 1])
+                if write_text:
+                    write_segment_files(project_dir, relative_path, class_name,
+                                        (content.segment_tokens(segment) for segment in segments))
+                    written_segments.update(segment_file_names(class_name, len(segments)))
+                if writer is not None:
+                    token_ids, segment_lengths = content.file_segment_ids(file_id)
+                    writer.add_file_ids(relative_path, class_name, token_ids, segment_lengths, content_remap)
+                current[relative_path]["segments"] = len(segments)
+                print(f"已复用内容相同文件的分词结果：{relative_path}（{len(segments)} 段）")
+            next_file += 1
 
-                print(f"已处理并保存：{output_file}")
+    try:
+        for chunk_results, new_stems in results:
+            # 工作进程新计算的词干合并到主进程的词干表，保存后下次运行的工作进程可以直接复用
+            get_tokenizer().add_stems(new_stems)
+            for relative_path, class_name, segments, n_segments in chunk_results:
+                carry_until(relative_paths.index(relative_path, next_file))
+                if write_text and name_counts[class_name] > 1:
+                    write_segment_files(project_dir, relative_path, class_name, segments)
+                if dedup:
+                    # 新内容到达时即写入全局词表，只保留编号数组和每段的 token 数，不保留字符串形式的分段结果
+                    digest = hashes[next_file]
+                    if digest not in new_content:
+                        new_content[digest] = (vocabulary.intern([token for tokens in segments for token in tokens]),
+                                               [len(tokens) for tokens in segments])
+                    if writer is not None:
+                        writer.add_file_ids(relative_path, class_name, *new_content[digest])
+                elif writer is not None:
+                    writer.add_file(relative_path, class_name, segments)
+                next_file += 1
+                current[relative_path]["segments"] = n_segments
+                if write_text:
+                    written_segments.update(segment_file_names(class_name, n_segments))
+                print(f"已处理并保存：{relative_path}（{n_segments} 段）")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    carry_until(len(relative_paths))
+    store = writer.build() if writer is not None else None
+
+    # 其他进程可能同时扩充全局词表、改写共享的内容寻址存储：在词表锁内合并保存词表，
+    # 本进程新增 token 的编号按合并结果映射后，再写出使用全局编号的存储
+    with locked_vocabulary(vocabulary_path) if vocabulary is not None else nullcontext():
+        remap = merge_vocabulary(vocabulary, vocabulary_path) if vocabulary is not None else None
+        if store is not None:
+            if remap is not None:
+                store.token_ids, store.lineage = remap[store.token_ids], vocabulary.lineage
+            save_token_store(store, store_path)
+        elif os.path.exists(store_path):
+            # 不写出打包存储时旧的打包存储已经过期，删除以免被优先读取
+            os.remove(store_path)
+        refs_path = os.path.join(project_dir, TOKEN_REFS_NAME)
+        if write_refs:
+            save_token_refs(project_dir, os.path.basename(content_path), language, segment_size,
+                            [(relative_path, class_name, digest)
+                             for relative_path, class_name, digest in zip(relative_paths, class_names, hashes)])
+        elif os.path.exists(refs_path):
+            os.remove(refs_path)
+
+        changes = {
+            "added": added,
+            "changed": changed,
+            "deleted": deleted,
+            "unchanged": len(current) - len(added) - len(changed),
+            "reused": sum(cached),
+            "written_segments": sorted(written_segments),
+            "removed_segments": sorted(removed_segments - written_segments),
+        }
+        save_manifest(project_dir, {"language": language, "segment_size": segment_size,
+                                    "output_format": output_format, "skip": skip, "files": current})
+        if dedup:
+            # 清单保存后再统计全部项目仍引用的内容，没有新内容且没有失效内容时不重写共享存储；
+            # 共享存储可能已被其他进程更新，在锁内重新读取
+            content, content_lookup = load_content_store(content_path, vocabulary)
+            if remap is not None:
+                new_content = {digest: (remap[token_ids], segment_lengths)
+                               for digest, (token_ids, segment_lengths) in new_content.items()}
+            live_hashes = referenced_hashes(output_base_dir)
+            if new_content or any(digest not in live_hashes for digest in content_lookup):
+                n_content, n_removed = update_content_store(content_path, content, content_lookup, new_content,
+                                                            live_hashes, language, segment_size, vocabulary)
+                print(f"内容寻址存储：{n_content} 个文件（新增 {len(new_content)}，删除 {n_removed}）")
+    with open(os.path.join(project_dir, CHANGES_NAME), 'w', encoding='utf-8') as f:
+        json.dump(changes, f, ensure_ascii=False, indent=1)
+    print(f"项目 {project_name}：新增 {len(added)}，修改 {len(changed)}，删除 {len(deleted)}，"
+          f"未变 {changes['unchanged']} 个文件，复用 {changes['reused']} 个；写入 {len(written_segments)} 个、删除 {len(changes['removed_segments'])} 个tokens文件")
+    return changes
 
 
 if __name__ == "__main__":
-    # 指定源代码的目录路径
-    projects = ["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"]
-    for project in projects:
-        if project == 'Hadoop':
-            source_code_directory = '../pathidea/project_version_in_paper/' + project + "hadoop-common-project"
-        else:
-            source_code_directory = '../pathidea/project_version_in_paper/' + project
+    parser = argparse.ArgumentParser(description="对项目源代码分词并按800个token分段保存")
+    parser.add_argument("--projects", nargs="+",
+                        default=["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="工作进程数，默认为全部CPU核数")
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / (1 << 20),
+                        help="每个工作单元的目标大小（MB）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="根据上一次的清单只重新分词新增或修改的文件，并删除已删除文件的tokens文件")
+    parser.add_argument("--format", choices=["text", "packed", "both", "ref"], default="text",
+                        help="text：每段一个tokens文件；packed：每个项目一个打包的token存储；both：两者都写出；"
+                             "ref：只保存对共享内容寻址存储的引用")
+    parser.add_argument("--dedup", action="store_true",
+                        help="通过共享的内容寻址存储在项目之间复用内容相同的文件的分词结果（如 Hadoop、HDFS、MAPREDUCE、YARN）")
+    parser.add_argument("--skip", nargs="*", choices=LEXER_SKIPS, default=[],
+                        help="分词时跳过的注释（comments）、字符串（strings）或import/package语句（imports）")
+    args = parser.parse_args()
+
+    get_tokenizer().load_stem_cache(STEM_CACHE_PATH)
+    for project in args.projects:
+        # 指定源代码的目录路径
+        source_code_directory = get_source_code_directory(project)
         language = 'java'
 
         # 分析并处理源代码
-        analyze_project_source_code(source_code_directory, language)
+        analyze_project_source_code(source_code_directory, language, args.workers, int(args.chunk_mb * (1 << 20)),
+                                    args.incremental, args.format, args.skip, args.dedup)
+    get_tokenizer().save_stem_cache(STEM_CACHE_PATH)
@@ -0,0 +1,145 @@
+import argparse
+import os
+
+import numpy as np
+
+from process_source_code import get_source_code_directory, iter_source_files
+from token_store import TokenStore
+from tokenizer import get_tokenizer, read_chunks
+from vsm_index import POOLING_METHODS
+from vsm_new_construction import VSM_STOP_WORDS, get_bug_tokens
+
+'''
+    分段大小扫描：每个Java文件只做一次词法分析和词干提取，
+    在同一份token流上为多个分段大小构建VSM索引并输出并排的排序结果
+'''
+
+
+class ProjectTokenStream:
+    """
+    一个项目全部源代码文件的 token 流：所有文件的 token 编号首尾相接存放在一个数组中，
+    file_offsets[i]:file_offsets[i + 1] 为第 i 个文件的 token。
+    """
+
+    def __init__(self, relative_paths, class_names, token_ids, file_offsets, terms, language='java'):
+        self.relative_paths = relative_paths
+        self.class_names = class_names
+        self.token_ids = token_ids
+        self.file_offsets = file_offsets
+        self.terms = terms
+        self.language = language
+
+    @classmethod
+    def from_source(cls, source_code_directory, language):
+        # 逐个文件分词并把 token 映射为整数编号，空文件不产生代码段，直接跳过
+        tokenizer = get_tokenizer()
+        vocabulary = {}
+        relative_paths, class_names, chunks = [], [], []
+        for file_path, relative_path, class_name in iter_source_files(source_code_directory, language):
+            # 流式分词，token 直接映射为编号，不保留整个文件的 token 列表
+            with open(file_path, 'r', encoding='utf-8', errors="replace") as f:
+                token_ids = np.fromiter((vocabulary.setdefault(token, len(vocabulary))
+                                         for token in tokenizer.iter_tokens(read_chunks(f), language)), dtype=np.int32)
+            if not len(token_ids):
+                continue
+            relative_paths.append(relative_path)
+            class_names.append(class_name)
+            chunks.append(token_ids)
+            print(f"已分词：{relative_path}")
+
+        lengths = [len(chunk) for chunk in chunks]
+        token_ids = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int32)
+        file_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        return cls(relative_paths, class_names, token_ids, file_offsets, list(vocabulary), language)
+
+    def build_index(self, segment_size, stop_words=()):
+        """
+        按给定分段大小构建 VSM 索引，与 process_source_code 写出 tokens 文件后再构建的索引一致：
+        分段交给 TokenStore.build_index，同名类的代码段按 tokens 文件的覆盖规则（TokenStore.text_layout）处理。
+        Args:
+            segment_size (int): 每段的 token 数。
+            stop_words (iterable): VSM 停用词。
+        Returns:
+            VSMIndex: 该分段大小下的索引；没有代码段时返回 None。
+        """
+        # 分段按完整的 token 流进行，VSM 过滤掉的 token 只在构建词频时去除
+        segment_starts = [np.arange(self.file_offsets[i], self.file_offsets[i + 1], segment_size, dtype=np.int64)
+                          for i in range(len(self.class_names))]
+        segment_offsets = np.concatenate(segment_starts + [[len(self.token_ids)]]).astype(np.int64)
+        file_segments = np.concatenate([[0], np.cumsum([len(starts) for starts in segment_starts])]).astype(np.int64)
+        store = TokenStore(self.terms, self.token_ids, segment_offsets, file_segments, self.relative_paths,
+                           self.class_names, self.language, segment_size)
+        return store.build_index(stop_words)
+
+
+def sweep_project(stream, reports, segment_sizes, pooling, top_m, block_size):
+    """
+    对每个分段大小构建索引并批量打分。
+    Args:
+        stream (ProjectTokenStream): 项目的 token 流。
+        reports (list): [(错误报告名, tokens)]。
+        segment_sizes (list): 分段大小列表。
+        pooling (str): 代码段到文件的池化方式。
+        top_m (int): topm 池化的代码段数。
+        block_size (int): 每块的错误报告数。
+    Returns:
+        dict: 错误报告名 -> {分段大小: [(文件相对路径, 得分)]，按得分从高到低排列}。
+    """
+    rankings = {name: {} for name, _ in reports}
+    queries_tokens = [tokens for _, tokens in reports]
+    for segment_size in segment_sizes:
+        index = stream.build_index(segment_size, VSM_STOP_WORDS)
+        if index is None:
+            continue
+        for start, block in index.score_batch(queries_tokens, block_size):
+            for offset, file_scores in enumerate(index.pool(block, pooling, top_m)):
+                order = np.argsort(-file_scores, kind="stable")
+                rankings[reports[start + offset][0]][segment_size] = [(index.file_paths[i], file_scores[i]) for i in order]
+        print(f"分段大小 {segment_size}：{index.n_segments} 个代码段")
+    return rankings
+
+
+def save_sweep_result(output_dir, bug_report_name, ranking_by_size):
+    # 每行一个名次，各分段大小的结果按列并排
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    sizes = sorted(ranking_by_size)
+    output_file = os.path.join(output_dir, f"{bug_report_name}_vsm_sweep.txt")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(['rank'] + [f"size={size}" for size in sizes]) + '\n')
+        for rank in range(max(len(ranking) for ranking in ranking_by_size.values())):
+            cells = [str(rank + 1)]
+            for size in sizes:
+                ranking = ranking_by_size[size]
+                cells.append(f"{ranking[rank][0]}: {ranking[rank][1]:.4f}" if rank < len(ranking) else '')
+            f.write('\t'.join(cells) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="在同一份token流上比较多个分段大小的VSM排序结果")
+    parser.add_argument("--projects", nargs="+",
+                        default=["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 400, 800, 1600], help="分段大小列表")
+    parser.add_argument("--pooling", choices=POOLING_METHODS, default="max", help="代码段得分到文件得分的池化方式")
+    parser.add_argument("--top-m", type=int, default=3, help="topm 池化时每个文件参与平均的代码段数")
+    parser.add_argument("--block-size", type=int, default=256, help="每块的错误报告数")
+    parser.add_argument("--output-dir", default="../pathidea/ProcessData/vsm_segmentation_result")
+    args = parser.parse_args()
+
+    bug_reports_tokens, project_names, bug_report_names = get_bug_tokens("../pathidea/ProcessData/bug_reports_tokens")
+    language = 'java'
+
+    for project in args.projects:
+        reports = [(name, tokens) for tokens, project_name, name in zip(bug_reports_tokens, project_names, bug_report_names)
+                   if project_name == project]
+        if not reports:
+            print(f"未找到项目 {project} 的错误报告tokens文件")
+            continue
+
+        stream = ProjectTokenStream.from_source(get_source_code_directory(project), language)
+        rankings = sweep_project(stream, reports, args.sizes, args.pooling, args.top_m, args.block_size)
+        for name, ranking_by_size in rankings.items():
+            if ranking_by_size:
+                save_sweep_result(args.output_dir, name, ranking_by_size)
+        print(f"项目 {project} 的 {len(reports)} 个错误报告已完成分段大小扫描")
@@ -0,0 +1,80 @@
+import argparse
+import re
+import subprocess
+import sys
+
+'''
+    各入口脚本的导入耗时预算：在新的解释器中用 -X importtime 测量导入模块的累计耗时，
+    超出预算时以非零状态退出，防止再次在模块加载时引入 nltk 下载或 scikit-learn 等重型依赖
+'''
+
+# 入口模块 -> 导入耗时预算（秒）。纯 Python 的分词入口不应导入 nltk，数值入口只允许 numpy/scipy
+IMPORT_BUDGETS = {
+    "tokenizer": 0.15,
+    "java_lexer": 0.15,
+    "process_source_code": 0.2,
+    "preprocess_bug_report": 0.15,
+    "token_store": 0.8,
+    "vsm_index": 0.8,
+    "bm25_scoring": 0.8,
+    "lsa_index": 0.8,
+    "minhash_lsh": 0.8,
+    "vsm_new_construction": 1.0,
+    "segment_sweep": 1.0,
+    "cal_final_score": 0.15,
+    "process_path": 0.15,
+    "call_graph": 0.8,
+}
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)\s*$')
+
+
+def measure_import_time(module, repeat=3):
+    """
+    在新的解释器中测量导入模块的累计耗时，取多次测量的最小值。
+    Args:
+        module (str): 模块名。
+        repeat (int): 测量次数。
+    Returns:
+        float: 导入耗时（秒）。
+    """
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                   capture_output=True, text=True, check=True)
+        for line in completed.stderr.splitlines():
+            match = IMPORT_TIME_PATTERN.match(line)
+            if match and match.group(2) == module:
+                seconds = int(match.group(1)) / 1e6
+                best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def check_import_budgets(budgets=None, repeat=3):
+    """
+    测量每个入口模块的导入耗时并与预算比较。
+    Args:
+        budgets (dict): 模块名 -> 预算（秒），默认为 IMPORT_BUDGETS。
+        repeat (int): 每个模块的测量次数。
+    Returns:
+        dict: 模块名 -> {"seconds": 导入耗时, "budget": 预算, "ok": 是否在预算内}。
+    """
+    budgets = budgets or IMPORT_BUDGETS
+    results = {}
+    for module, budget in budgets.items():
+        seconds = measure_import_time(module, repeat)
+        results[module] = {"seconds": seconds, "budget": budget, "ok": seconds is not None and seconds <= budget}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="测量各入口脚本的导入耗时并检查是否超出预算")
+    parser.add_argument("--modules", nargs="+", default=list(IMPORT_BUDGETS), choices=list(IMPORT_BUDGETS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = check_import_budgets({module: IMPORT_BUDGETS[module] for module in args.modules}, args.repeat)
+    for module, result in results.items():
+        print(f"{module:<24}\t{result['seconds']:.3f}s\t预算 {result['budget']:.2f}s\t{'通过' if result['ok'] else '超出预算'}")
+    if not all(result["ok"] for result in results.values()):
+        sys.exit(1)
@@ -0,0 +1,392 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from vocabulary import load_vocabulary, shared_vocabulary_path
+from vsm_index import VSMIndex, decode_strings, encode_strings, hash_feature, read_arrays, write_arrays
+
+'''
+    打包的项目 token 存储：一个项目的全部代码段保存为一个文件，
+    包含首尾相接的 token 编号数组以及文件和代码段的偏移表，以内存映射方式零拷贝读取。
+    编号来自与错误报告共用的全局词表（vocabulary.Vocabulary）时，文件中只记录词表的 lineage 和大小，
+    读取时须给出同一份词表；未使用全局词表写出的存储自带去重后的词表。
+    原来每段一个 类名_序号_tokens.txt 的文本布局仍可由 export_text 导出。
+
+    内容寻址存储是同样格式的共享存储，以源代码文件内容的哈希代替相对路径，
+    多个项目（如同出自 apache/hadoop 的 Hadoop、HDFS、MAPREDUCE、YARN）中内容相同的文件只分词、保存一次，
+    项目目录中只保留 相对路径 -> 内容哈希 的引用文件
+'''
+
+TOKEN_STORE_MAGIC = b"TOKSTR01"
+# 打包存储在项目 tokens 目录中的文件名（不以 _tokens.txt 结尾，不会被当作代码段读取）
+TOKEN_STORE_NAME = "tokens.store"
+# 只保存对内容寻址存储的引用时，项目 tokens 目录中的引用文件名
+TOKEN_REFS_NAME = "tokens.refs"
+
+
+class TokenStore:
+    """
+    一个项目按遍历顺序排列的全部源代码文件及其代码段。
+
+    第 f 个文件的代码段为 file_segments[f]:file_segments[f + 1]，
+    第 s 个代码段的 token 编号为 token_ids[segment_offsets[s]:segment_offsets[s + 1]]，
+    编号是 terms 中的下标，lineage 不为 None 时 terms 就是该全局词表的 terms。
+    同名类的文件全部保留；文本布局中同名文件按遍历顺序相互覆盖，
+    由 text_layout 给出与之一致的代码段视图。
+    """
+
+    def __init__(self, terms, token_ids, segment_offsets, file_segments, file_paths, class_names, language, segment_size,
+                 lineage=None):
+        self.terms = terms                        # 词表：token 编号 -> token
+        self.token_ids = token_ids                # 全部代码段首尾相接的 token 编号（int32）
+        self.segment_offsets = segment_offsets    # 代码段 -> token 起始位置（int64，长度为代码段数 + 1）
+        self.file_segments = file_segments        # 文件 -> 代码段起始位置（int64，长度为文件数 + 1）
+        self.file_paths = file_paths              # 文件 -> 相对路径
+        self.class_names = class_names            # 文件 -> 类名
+        self.language = language
+        self.segment_size = segment_size
+        self.lineage = lineage                    # 全局词表的 lineage，None 表示编号只在本存储内有效
+
+    @property
+    def n_files(self):
+        return len(self.file_paths)
+
+    @property
+    def n_segments(self):
+        return len(self.segment_offsets) - 1
+
+    def segment_token_ids(self, segment):
+        # 代码段的 token 编号（内存映射数组上的视图，不复制）
+        return self.token_ids[self.segment_offsets[segment]:self.segment_offsets[segment + 1]]
+
+    def segment_tokens(self, segment):
+        return [self.terms[token_id] for token_id in self.segment_token_ids(segment)]
+
+    def file_segment_ids(self, file_id):
+        # 文件的全部代码段的 token 编号以及每段的长度
+        first, last = self.file_segments[file_id], self.file_segments[file_id + 1]
+        start, stop = self.segment_offsets[first], self.segment_offsets[last]
+        return self.token_ids[start:stop], np.diff(self.segment_offsets[first:last + 1])
+
+    def text_layout(self):
+        """
+        与文本布局一致的代码段视图：同名类的代码段文件按遍历顺序覆盖，结果按 tokens 文件名排序。
+        Returns:
+            list: [(tokens 文件名, 代码段下标, 文件下标)]。
+        """
+        layout = {}
+        for file_id, class_name in enumerate(self.class_names):
+            for i, segment in enumerate(range(self.file_segments[file_id], self.file_segments[file_id + 1])):
+                layout[f"{class_name}_{i + 1}_tokens.txt"] = (int(segment), file_id)
+        return [(name, segment, file_id) for name, (segment, file_id) in sorted(layout.items())]
+
+    def export_text(self, project_dir):
+        """
+        导出为每段一个 类名_序号_tokens.txt 的文本布局（第一行为相对路径，其后每行一个 token），
+        与 process_source_code 直接写出的文件逐字节一致。
+        Args:
+            project_dir (str): 输出的项目 tokens 目录。
+        """
+        if not os.path.exists(project_dir):
+            os.makedirs(project_dir)
+        for name, segment, file_id in self.text_layout():
+            with open(os.path.join(project_dir, name), 'w', encoding='utf-8') as f:
+                f.write(self.file_paths[file_id] + '\n')
+                f.write('\n'.join(self.segment_tokens(segment)))
+
+    def build_index(self, stop_words=(), n_buckets=None):
+        """
+        直接由 token 编号构建项目的 VSM 索引，结果与从导出的文本布局构建的索引相同（列顺序也相同）。
+        Args:
+            stop_words (iterable): VSM 停用词。
+            n_buckets (int): 特征哈希的桶数；为 None 时使用词表。
+        Returns:
+            VSMIndex: 项目索引；没有代码段时返回 None。
+        """
+        layout = self.text_layout()
+        if not layout:
+            return None
+        stop_words = frozenset(stop_words)
+        segment_names = [name for name, _, _ in layout]
+        segments = np.array([segment for _, segment, _ in layout], dtype=np.int64)
+
+        # 按文本布局的顺序取出各段的 token 编号
+        starts, stops = self.segment_offsets[segments], self.segment_offsets[segments + 1]
+        lengths = stops - starts
+        positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        token_ids = self.token_ids[positions]
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+
+        kept = np.array([len(term) >= 2 and term not in stop_words for term in self.terms], dtype=bool)
+        is_kept = kept[token_ids] if len(token_ids) else np.zeros(0, dtype=bool)
+        kept_before = np.concatenate([[0], np.cumsum(is_kept)])
+        token_ids = token_ids[is_kept]
+
+        if n_buckets:
+            vocabulary = None
+            hashed = [hash_feature(term, n_buckets) for term in self.terms]
+            columns = np.array([column for column, _ in hashed], dtype=np.int32)[token_ids]
+            data = np.array([sign for _, sign in hashed])[token_ids]
+        else:
+            # 列号按 token 在文本布局中首次出现的顺序分配，与 VSMIndex.build 一致
+            unique, first = np.unique(token_ids, return_index=True)
+            unique = unique[np.argsort(first)]
+            remap = np.full(len(self.terms), -1, dtype=np.int32)
+            remap[unique] = np.arange(len(unique), dtype=np.int32)
+            vocabulary = {self.terms[term_id]: i for i, term_id in enumerate(unique)}
+            columns = remap[token_ids]
+            data = np.ones(len(token_ids))
+
+        counts = sp.csr_matrix((data, columns, kept_before[indptr]),
+                               shape=(len(layout), n_buckets or len(vocabulary)))
+        file_numbers = {}
+        file_ids = np.array([file_numbers.setdefault(self.file_paths[file_id], len(file_numbers))
+                             for _, _, file_id in layout], dtype=np.int32)
+        return VSMIndex.from_counts(counts, vocabulary, file_ids, list(file_numbers), segment_names, stop_words,
+                                    n_buckets)
+
+
+class TokenStoreWriter:
+    """
+    按遍历顺序逐个文件追加代码段，最后一次性生成 TokenStore。
+    给定全局词表时 token 直接写入该词表，生成的存储使用全局编号；否则使用存储自己的词表。
+    """
+
+    def __init__(self, language, segment_size, vocabulary=None):
+        self.language = language
+        self.segment_size = segment_size
+        self.vocabulary = vocabulary
+        self._vocabulary = {}
+        self._chunks = []
+        self._segment_lengths = []
+        self._file_segment_counts = []
+        self._file_paths = []
+        self._class_names = []
+
+    def add_file(self, relative_path, class_name, segments):
+        # 追加一个文件的代码段（每段为 token 字符串列表）
+        vocabulary = self._vocabulary
+        for tokens in segments:
+            if self.vocabulary is not None:
+                self._chunks.append(self.vocabulary.intern(tokens))
+            else:
+                self._chunks.append(np.fromiter((vocabulary.setdefault(token, len(vocabulary)) for token in tokens),
+                                                dtype=np.int32, count=len(tokens)))
+            self._segment_lengths.append(len(tokens))
+        self._finish_file(relative_path, class_name, len(segments))
+
+    def intern_terms(self, terms):
+        """
+        将另一个词表中的全部 token 加入本词表。
+        Args:
+            terms (list): 另一个 TokenStore 的词表。
+        Returns:
+            numpy.ndarray: 对方的 token 编号 -> 本词表中的编号。
+        """
+        if self.vocabulary is not None:
+            # 对方已使用同一份全局词表时编号不变
+            if terms is self.vocabulary.terms:
+                return np.arange(len(terms), dtype=np.int32)
+            return self.vocabulary.intern(terms)
+        vocabulary = self._vocabulary
+        return np.array([vocabulary.setdefault(term, len(vocabulary)) for term in terms], dtype=np.int32)
+
+    def add_file_ids(self, relative_path, class_name, token_ids, segment_lengths, remap=None):
+        # 从另一个 TokenStore 复制一个文件的代码段，token 编号经 intern_terms 返回的 remap 向量化映射；
+        # remap 为 None 时编号已属于本存储的全局词表
+        self._chunks.append(token_ids if remap is None else remap[token_ids])
+        self._segment_lengths.extend(int(length) for length in segment_lengths)
+        self._finish_file(relative_path, class_name, len(segment_lengths))
+
+    def _finish_file(self, relative_path, class_name, n_segments):
+        self._file_paths.append(relative_path)
+        self._class_names.append(class_name)
+        self._file_segment_counts.append(n_segments)
+
+    def build(self):
+        token_ids = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.int32)
+        segment_offsets = np.concatenate([[0], np.cumsum(self._segment_lengths, dtype=np.int64)]).astype(np.int64)
+        file_segments = np.concatenate([[0], np.cumsum(self._file_segment_counts, dtype=np.int64)]).astype(np.int64)
+        if self.vocabulary is not None:
+            return TokenStore(self.vocabulary.terms, token_ids.astype(np.int32), segment_offsets, file_segments,
+                              self._file_paths, self._class_names, self.language, self.segment_size,
+                              self.vocabulary.lineage)
+        terms = list(self._vocabulary)
+        # intern_terms 可能带入已不再使用的 token，只保留实际出现的词项
+        used = np.zeros(len(terms), dtype=bool)
+        used[token_ids] = True
+        if not used.all():
+            remap = np.cumsum(used, dtype=np.int32) - 1
+            token_ids = remap[token_ids]
+            terms = [term for term, keep in zip(terms, used) if keep]
+        return TokenStore(terms, token_ids.astype(np.int32), segment_offsets, file_segments,
+                          self._file_paths, self._class_names, self.language, self.segment_size)
+
+
+def save_token_store(store, path):
+    """
+    保存打包的 token 存储（格式与 VSM 索引文件相同：魔数 + JSON 头 + 按 64 字节对齐的数组）。
+    使用全局词表的存储不保存词表，只记录词表的 lineage 和当前大小，全局词表须另行保存。
+    Args:
+        store (TokenStore): 需要保存的存储。
+        path (str): 输出文件路径。
+    """
+    header = {"language": store.language, "segment_size": store.segment_size}
+    arrays = {}
+    if store.lineage is None:
+        arrays["terms"] = encode_strings(store.terms)
+    else:
+        header.update(lineage=store.lineage, vocabulary_size=len(store.terms))
+    arrays.update({
+        "token_ids": np.asarray(store.token_ids, dtype=np.int32),
+        "segment_offsets": np.asarray(store.segment_offsets, dtype=np.int64),
+        "file_segments": np.asarray(store.file_segments, dtype=np.int64),
+        "file_paths": encode_strings(store.file_paths),
+        "class_names": encode_strings(store.class_names),
+    })
+    write_arrays(path, TOKEN_STORE_MAGIC, header, arrays)
+
+
+def load_token_store(path, vocabulary=None):
+    """
+    以内存映射方式打开打包的 token 存储，token 编号和偏移表不复制。
+    Args:
+        path (str): 存储文件路径。
+        vocabulary (vocabulary.Vocabulary): 全局词表，读取使用全局编号的存储时必须给出。
+    Returns:
+        TokenStore: 加载的存储；文件不存在、格式不符或与全局词表不匹配时返回 None。
+    """
+    loaded = read_arrays(path, TOKEN_STORE_MAGIC)
+    if loaded is None:
+        return None
+    header, arrays = loaded
+    if "lineage" in header:
+        # 编号须来自同一份词表，且保存存储时的词项都已保存在词表中
+        if (vocabulary is None or header["lineage"] != vocabulary.lineage
+                or header["vocabulary_size"] > len(vocabulary)):
+            return None
+        terms, lineage = vocabulary.terms, vocabulary.lineage
+    else:
+        terms, lineage = decode_strings(arrays["terms"]), None
+    return TokenStore(terms, arrays["token_ids"], arrays["segment_offsets"], arrays["file_segments"],
+                      decode_strings(arrays["file_paths"]), decode_strings(arrays["class_names"]),
+                      header["language"], header["segment_size"], lineage)
+
+
+def content_store_path(base_dir, language, segment_size, skip=()):
+    # 内容寻址存储放在 source_code_tokens 目录下，分词配置不同的结果分别存放（以 . 开头，不会被当作项目目录）
+    name = ".content." + ".".join([language, str(segment_size)] + sorted(skip)) + ".store"
+    return os.path.join(base_dir, name)
+
+
+def load_content_store(path, vocabulary=None):
+    """
+    读取内容寻址存储。
+    Args:
+        path (str): 存储文件路径。
+        vocabulary (vocabulary.Vocabulary): 全局词表。
+    Returns:
+        tuple: (TokenStore 或 None, 内容哈希 -> 文件下标)。
+    """
+    store = load_token_store(path, vocabulary)
+    if store is None:
+        return None, {}
+    return store, {digest: i for i, digest in enumerate(store.file_paths)}
+
+
+def update_content_store(path, store, lookup, new_files, live_hashes, language, segment_size, vocabulary):
+    """
+    把新分词的文件加入内容寻址存储，同时去掉不再被任何项目引用的内容，写回磁盘。
+    Args:
+        path (str): 存储文件路径。
+        store (TokenStore): 旧存储，可以为 None。
+        lookup (dict): 旧存储的 内容哈希 -> 文件下标。
+        new_files (dict): 内容哈希 -> (token 编号数组, 每段的 token 数)，编号属于 vocabulary。
+        live_hashes (set): 仍被引用的内容哈希。
+        language (str): 编程语言。
+        segment_size (int): 分段大小。
+        vocabulary (vocabulary.Vocabulary): 全局词表（须已通过 vocabulary.merge_vocabulary 保存）。
+    Returns:
+        tuple: (新存储中的文件数, 去掉的文件数)。
+    """
+    writer = TokenStoreWriter(language, segment_size, vocabulary)
+    removed = 0
+    if store is not None:
+        remap = writer.intern_terms(store.terms)
+        for digest, file_id in lookup.items():
+            if digest in live_hashes:
+                token_ids, segment_lengths = store.file_segment_ids(file_id)
+                writer.add_file_ids(digest, "", token_ids, segment_lengths, remap)
+            else:
+                removed += 1
+    for digest, (token_ids, segment_lengths) in new_files.items():
+        if digest not in lookup and digest in live_hashes:
+            writer.add_file_ids(digest, "", token_ids, segment_lengths)
+    updated = writer.build()
+    save_token_store(updated, path)
+    return updated.n_files, removed
+
+
+def save_token_refs(project_dir, content_name, language, segment_size, files):
+    """
+    保存项目对内容寻址存储的引用。
+    Args:
+        project_dir (str): 项目 tokens 目录。
+        content_name (str): 内容寻址存储的文件名（与项目目录的父目录相对）。
+        language (str): 编程语言。
+        segment_size (int): 分段大小。
+        files (list): 按遍历顺序排列的 [(相对路径, 类名, 内容哈希)]。
+    """
+    refs_path = os.path.join(project_dir, TOKEN_REFS_NAME)
+    with open(refs_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({"content_store": content_name, "language": language, "segment_size": segment_size,
+                   "files": files}, f, ensure_ascii=False)
+    os.replace(refs_path + '.tmp', refs_path)
+
+
+def load_referenced_store(project_dir, vocabulary=None):
+    """
+    由项目的引用文件和内容寻址存储组装出项目的 TokenStore（token 编号向量化复制，不重新分词）。
+    Args:
+        project_dir (str): 项目 tokens 目录。
+        vocabulary (vocabulary.Vocabulary): 全局词表。
+    Returns:
+        TokenStore: 项目存储；没有引用文件、内容寻址存储缺失或缺少被引用的内容时返回 None。
+    """
+    refs_path = os.path.join(project_dir, TOKEN_REFS_NAME)
+    if not os.path.exists(refs_path):
+        return None
+    with open(refs_path, 'r', encoding='utf-8') as f:
+        refs = json.load(f)
+    content, lookup = load_content_store(os.path.join(os.path.dirname(os.path.normpath(project_dir)),
+                                                      refs["content_store"]), vocabulary)
+    if content is None or any(digest not in lookup for _, _, digest in refs["files"]):
+        return None
+    writer = TokenStoreWriter(refs["language"], refs["segment_size"], vocabulary)
+    remap = writer.intern_terms(content.terms)
+    for relative_path, class_name, digest in refs["files"]:
+        token_ids, segment_lengths = content.file_segment_ids(lookup[digest])
+        writer.add_file_ids(relative_path, class_name, token_ids, segment_lengths, remap)
+    return writer.build()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="将打包的 token 存储导出为每段一个 tokens 文件的文本布局")
+    parser.add_argument("--projects", nargs="+",
+                        default=["ActiveMQ", "Hadoop", "HDFS", "Hive", "MAPREDUCE", "Storm", "YARN", "Zookeeper"])
+    parser.add_argument("--base-path", default="../pathidea/ProcessData/source_code_tokens")
+    args = parser.parse_args()
+
+    vocabulary = load_vocabulary(shared_vocabulary_path(args.base_path))
+    for project in args.projects:
+        project_dir = os.path.join(args.base_path, project)
+        store = (load_token_store(os.path.join(project_dir, TOKEN_STORE_NAME), vocabulary)
+                 or load_referenced_store(project_dir, vocabulary))
+        if store is None:
+            print(f"未找到项目 {project} 的打包 token 存储")
+            continue
+        store.export_text(project_dir)
+        print(f"项目 {project}：已导出 {store.n_files} 个文件的 {store.n_segments} 个代码段")
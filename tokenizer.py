@@ -0,0 +1,247 @@
+import json
+import os
+import re
+
+'''
+    源代码与错误报告共用的分词流程：词法切分、去除语言关键字、按下划线和驼峰拆分、
+    去除停用词以及 Porter 词干提取。正则、关键字表和停用词表只构建一次，词干提取结果被缓存；
+    停用词表随代码附带，nltk 只在词干表未命中、第一次需要 PorterStemmer 时才导入
+'''
+
+JAVA_KEYWORDS = frozenset([
+    'abstract', 'assert', 'boolean', 'break', 'byte', 'case', 'catch', 'char',
+    'class', 'const', 'continue', 'default', 'do', 'double', 'else', 'enum',
+    'extends', 'final', 'finally', 'float', 'for', 'goto', 'if', 'implements',
+    'import', 'instanceof', 'int', 'interface', 'long', 'native', 'new',
+    'package', 'private', 'protected', 'public', 'return', 'short', 'static',
+    'strictfp', 'super', 'switch', 'synchronized', 'this', 'throw', 'throws',
+    'transient', 'try', 'void', 'volatile', 'while'
+])
+
+GO_KEYWORDS = frozenset([
+    'break', 'default', 'func', 'interface', 'select', 'case', 'defer', 'go',
+    'map', 'struct', 'chan', 'else', 'goto', 'package', 'switch', 'const',
+    'fallthrough', 'if', 'range', 'type', 'continue', 'for', 'import',
+    'return', 'var'
+])
+
+JAVASCRIPT_KEYWORDS = frozenset([
+    'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default',
+    'delete', 'do', 'else', 'export', 'extends', 'finally', 'for', 'function',
+    'if', 'import', 'in', 'instanceof', 'let', 'new', 'return', 'super',
+    'switch', 'this', 'throw', 'try', 'typeof', 'var', 'void', 'while', 'with',
+    'yield'
+])
+
+LANGUAGE_KEYWORDS = {'java': JAVA_KEYWORDS, 'go': GO_KEYWORDS, 'js': JAVASCRIPT_KEYWORDS}
+
+# NLTK 的英文停用词表（stopwords.words('english')），随代码附带，不再依赖下载的 NLTK 数据
+ENGLISH_STOP_WORDS = frozenset([
+    'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", "you've", "you'll", "you'd",
+    'your', 'yours', 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', "she's", 'her', 'hers',
+    'herself', 'it', "it's", 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves', 'what', 'which',
+    'who', 'whom', 'this', 'that', "that'll", 'these', 'those', 'am', 'is', 'are', 'was', 'were', 'be', 'been',
+    'being', 'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing', 'a', 'an', 'the', 'and', 'but',
+    'if', 'or', 'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for', 'with', 'about', 'against',
+    'between', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'to', 'from', 'up', 'down',
+    'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when',
+    'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some', 'such', 'no',
+    'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'don',
+    "don't", 'should', "should've", 'now', 'd', 'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren', "aren't",
+    'couldn', "couldn't", 'didn', "didn't", 'doesn', "doesn't", 'hadn', "hadn't", 'hasn', "hasn't", 'haven',
+    "haven't", 'isn', "isn't", 'ma', 'mightn', "mightn't", 'mustn', "mustn't", 'needn', "needn't", 'shan',
+    "shan't", 'shouldn', "shouldn't", 'wasn', "wasn't", 'weren', "weren't", 'won', "won't", 'wouldn',
+    "wouldn't"
+])
+
+# PorterStemmer 的默认模式，词干表按此模式保存和校验
+STEMMER_MODE = 'NLTK_EXTENSIONS'
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+CAMEL_CASE_PATTERN = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])')
+# 文本块末尾可能被截断的单词
+TRAILING_WORD_PATTERN = re.compile(r'\w*\Z')
+
+# 流式读取文本时每块的字符数
+CHUNK_SIZE = 1 << 16
+# 标识符缓存的条目上限，超过后清空，避免生成代码中大量一次性标识符占满内存
+IDENTIFIER_CACHE_LIMIT = 1 << 20
+
+
+class Tokenizer:
+    """
+    可复用的分词器，输出与逐次构建关键字表、停用词表和 PorterStemmer 的原实现逐字节一致。
+
+    每个小写单词只做一次词干提取（_stems，可保存到磁盘并在下次运行时预加载）；
+    每个标识符拆分、去停用词、提取词干后的结果也被缓存（_identifiers，只在内存中），
+    重复出现的标识符直接复用。iter_tokens/iter_segments 是流式版本，逐块读取、逐个产生结果。
+    """
+
+    def __init__(self, stem_cache_path=None):
+        self.stop_words = ENGLISH_STOP_WORDS
+        self._stemmer = None                  # 第一次词干表未命中时创建
+        self._stems = {}                      # 小写单词 -> 词干
+        self._new_stems = {}                  # 上次 take_new_stems 之后新计算的词干
+        self._identifiers = {}                # 标识符 -> 处理后的 tokens 元组
+        if stem_cache_path is not None:
+            self.load_stem_cache(stem_cache_path)
+
+    def tokenize(self, code_str, language):
+        """
+        对源代码或错误报告进行标记化、去除语言关键字、拆分拼接单词、去除停用词以及 Porter 词干提取。
+        Args:
+            code_str (str): 源代码字符串或错误报告字符串。
+            language (str): 编程语言（如 'java'、'go'、'js'），其他语言不去除关键字。
+        Returns:
+            list: 处理后的 tokens 列表。
+        """
+        keywords = LANGUAGE_KEYWORDS.get(language, frozenset())
+        tokens = []
+        for token in WORD_PATTERN.findall(code_str):
+            if token.lower() not in keywords:
+                tokens.extend(self.subwords(token))
+        return tokens
+
+    def iter_tokens(self, chunks, language):
+        """
+        流式分词：逐块读取文本，逐个产生处理后的 token，结果与 tokenize 对整段文本的结果相同。
+        块末尾可能被截断的单词留到下一块一起处理，内存只与块大小有关，与文本总长度无关。
+        Args:
+            chunks (iterable): 文本块，例如 read_chunks(f) 或 split_text(text)。
+            language (str): 编程语言。
+        Yields:
+            str: 处理后的 token。
+        """
+        keywords = LANGUAGE_KEYWORDS.get(language, frozenset())
+        for token in iter_words(chunks):
+            if token.lower() not in keywords:
+                yield from self.subwords(token)
+
+    def iter_segments(self, chunks, language, segment_size):
+        """
+        流式分词并分段：每凑满 segment_size 个 token 立即产生一段，最后不足一段的部分单独成段，
+        与对 tokenize 的结果按 segment_size 切分一致。
+        Args:
+            chunks (iterable): 文本块。
+            language (str): 编程语言。
+            segment_size (int): 每段的 token 数。
+        Yields:
+            list: 一段 tokens。
+        """
+        segment = []
+        for token in self.iter_tokens(chunks, language):
+            segment.append(token)
+            if len(segment) == segment_size:
+                yield segment
+                segment = []
+        if segment:
+            yield segment
+
+    def stem(self, word):
+        # 带缓存的 Porter 词干提取
+        stem = self._stems.get(word)
+        if stem is None:
+            if self._stemmer is None:
+                from nltk.stem.porter import PorterStemmer
+                self._stemmer = PorterStemmer(STEMMER_MODE)
+            stem = self._stems[word] = self._new_stems[word] = self._stemmer.stem(word)
+        return stem
+
+    def take_new_stems(self):
+        # 取出上次调用之后新计算的词干，并行分词时工作进程据此把新词干交回主进程
+        new_stems, self._new_stems = self._new_stems, {}
+        return new_stems
+
+    def add_stems(self, stems):
+        # 合并其他进程计算的词干，随 save_stem_cache 一起保存
+        self._stems.update(stems)
+
+    def subwords(self, token):
+        # 带缓存的标识符处理：拆分、去停用词、提取词干后的 tokens 元组
+        processed = self._identifiers.get(token)
+        if processed is None:
+            if len(self._identifiers) >= IDENTIFIER_CACHE_LIMIT:
+                self._identifiers.clear()
+            processed = self._identifiers[token] = self._process_identifier(token)
+        return processed
+
+    def _process_identifier(self, token):
+        # 按下划线和驼峰拆分，转为小写，去除停用词后提取词干
+        processed = []
+        for subtoken in token.split('_'):
+            for word in CAMEL_CASE_PATTERN.findall(subtoken):
+                word = word.lower()
+                if word not in self.stop_words:
+                    processed.append(self.stem(word))
+        return tuple(processed)
+
+    def load_stem_cache(self, path):
+        """
+        预加载保存的词干表；文件不存在或由不同模式的 PorterStemmer 生成时忽略。
+        Args:
+            path (str): 词干表文件路径。
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('mode') == STEMMER_MODE:
+            self._stems.update(cache['stems'])
+
+    def save_stem_cache(self, path):
+        """
+        保存词干表，先写临时文件再替换。
+        Args:
+            path (str): 词干表文件路径。
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'mode': STEMMER_MODE, 'stems': self._stems}, f, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def iter_words(chunks):
+    """
+    从逐块读取的文本中依次取出单词（与 WORD_PATTERN.findall 对整段文本的结果相同）。
+    块末尾可能被截断的单词留到下一块一起处理，超长单词跨多块时也只拼接一次。
+    Args:
+        chunks (iterable): 文本块。
+    Yields:
+        str: 单词。
+    """
+    carry = []
+    for chunk in chunks:
+        cut = TRAILING_WORD_PATTERN.search(chunk).start()
+        if cut == 0:
+            carry.append(chunk)
+            continue
+        text = ''.join(carry) + chunk
+        carry = [chunk[cut:]]
+        yield from WORD_PATTERN.findall(text, 0, len(text) - len(chunk) + cut)
+    word = ''.join(carry)
+    if word:
+        yield word
+
+
+def read_chunks(f, size=CHUNK_SIZE):
+    # 按固定字符数逐块读取已打开的文本文件
+    return iter(lambda: f.read(size), '')
+
+
+def split_text(text, size=CHUNK_SIZE):
+    # 将已在内存中的长文本按固定字符数切块，供流式分词使用
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+_default_tokenizer = None
+
+
+def get_tokenizer():
+    # 进程内共享的分词器，首次使用时构建
+    global _default_tokenizer
+    if _default_tokenizer is None:
+        _default_tokenizer = Tokenizer()
+    return _default_tokenizer
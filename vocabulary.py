@@ -0,0 +1,174 @@
+import fcntl
+import os
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from vsm_index import decode_strings, encode_strings, read_arrays, write_arrays
+
+'''
+    全局词表：错误报告和源代码的 token 统一映射为整数编号，编号只增不改，
+    保存后的编号数组在之后的运行中始终有效。源代码的打包 token 存储（token_store）和
+    错误报告的编号数组都写入同一份词表，打分时直接用编号查列号，不再逐个比较字符串。
+    多个进程可能同时扩充词表：写入方在 locked_vocabulary 锁内用 merge_vocabulary 合并保存词表，
+    再按返回的编号映射写出编号数组，已保存的编号数组始终与磁盘上的词表一致
+'''
+
+VOCABULARY_MAGIC = b"VOCABU01"
+INTERNED_MAGIC = b"INTERN01"
+# 全局词表的文件名，保存在 ProcessData 目录下
+VOCABULARY_NAME = "vocabulary.vocab"
+
+
+class Vocabulary:
+    """
+    token <-> 全局编号 的双向映射。新 token 追加到末尾，已有编号不变。
+    lineage 在新建词表时随机生成并随词表保存，用于确认编号数组来自同一份词表。
+    """
+
+    def __init__(self, terms=(), lineage=None):
+        self.terms = list(terms)              # 编号 -> token
+        self.ids = {term: i for i, term in enumerate(self.terms)}   # token -> 编号
+        self.lineage = lineage or uuid.uuid4().hex
+        self.saved_size = 0                   # 已保存在词表文件中的 token 数
+
+    def __len__(self):
+        return len(self.terms)
+
+    def intern(self, tokens):
+        """
+        将 tokens 映射为编号，未登录的 token 加入词表。
+        Args:
+            tokens (list): token 字符串列表。
+        Returns:
+            numpy.ndarray: 编号数组（int32）。
+        """
+        ids = self.ids
+        terms = self.terms
+        result = np.empty(len(tokens), dtype=np.int32)
+        for i, token in enumerate(tokens):
+            term_id = ids.get(token)
+            if term_id is None:
+                term_id = ids[token] = len(terms)
+                terms.append(token)
+            result[i] = term_id
+        return result
+
+    def lookup(self, tokens):
+        # 只查询不扩充词表，未登录的 token 为 -1
+        ids = self.ids
+        return np.fromiter((ids.get(token, -1) for token in tokens), dtype=np.int32, count=len(tokens))
+
+
+def shared_vocabulary_path(source_tokens_dir):
+    # 由 source_code_tokens 目录得到全局词表的路径（与之同级，即 ProcessData/vocabulary.vocab）
+    return os.path.join(os.path.dirname(os.path.normpath(source_tokens_dir)), VOCABULARY_NAME)
+
+
+def save_vocabulary(vocabulary, path):
+    # 保存全局词表（格式与 VSM 索引文件相同）；多个进程共用的词表应在锁内通过 merge_vocabulary 保存
+    write_arrays(path, VOCABULARY_MAGIC, {"size": len(vocabulary), "lineage": vocabulary.lineage},
+                 {"terms": encode_strings(vocabulary.terms)})
+    vocabulary.saved_size = len(vocabulary)
+
+
+def load_vocabulary(path):
+    """
+    读取全局词表。
+    Args:
+        path (str): 词表文件路径。
+    Returns:
+        Vocabulary: 词表；文件不存在或格式不符时返回 None。
+    """
+    loaded = read_arrays(path, VOCABULARY_MAGIC)
+    if loaded is None:
+        return None
+    header, arrays = loaded
+    vocabulary = Vocabulary(decode_strings(arrays["terms"]), header["lineage"])
+    vocabulary.saved_size = len(vocabulary)
+    return vocabulary
+
+
+@contextmanager
+def locked_vocabulary(path):
+    # 在词表旁的锁文件上加排他锁，同一时间只有一个进程合并词表并写出依赖它的编号数组
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def merge_vocabulary(vocabulary, path):
+    """
+    在 locked_vocabulary 锁内保存词表。本进程读取词表之后其他进程已保存过新的 token 时，
+    重新读取磁盘上的词表，把本进程新增的 token 追加到其后，并将 vocabulary 原地更新为合并结果。
+    Args:
+        vocabulary (Vocabulary): 本进程使用的词表。
+        path (str): 词表文件路径。
+    Returns:
+        numpy.ndarray: 本进程的旧编号 -> 合并后的编号，须用于尚未写出的编号数组；编号不变时为 None。
+    """
+    on_disk = load_vocabulary(path)
+    if on_disk is None or (on_disk.lineage == vocabulary.lineage and len(on_disk) == vocabulary.saved_size):
+        # 磁盘上的词表在读取之后没有变化
+        if on_disk is None or len(vocabulary) > vocabulary.saved_size:
+            save_vocabulary(vocabulary, path)
+        return None
+    # 同一份词表只追加，读取时已保存的编号不变；词表被重建（lineage 不同）时全部重新编号
+    base = vocabulary.saved_size if on_disk.lineage == vocabulary.lineage and len(on_disk) > vocabulary.saved_size else 0
+    remap = np.arange(len(vocabulary), dtype=np.int32)
+    remap[base:] = on_disk.intern(vocabulary.terms[base:])
+    if len(on_disk) > on_disk.saved_size:
+        save_vocabulary(on_disk, path)
+    # 原地更新，已引用 vocabulary.terms 的 TokenStore 随之更新
+    vocabulary.terms[:] = on_disk.terms
+    vocabulary.ids = on_disk.ids
+    vocabulary.lineage = on_disk.lineage
+    vocabulary.saved_size = on_disk.saved_size
+    return remap if base < len(remap) else None
+
+
+def save_interned(path, token_ids, names, groups, fingerprint, vocabulary):
+    """
+    将若干 token 序列（如全部错误报告）的编号数组首尾相接打包保存。
+    Args:
+        path (str): 输出文件路径。
+        token_ids (list): 每个序列的编号数组。
+        names (list): 每个序列的名称（如错误报告名）。
+        groups (list): 每个序列所属的分组（如项目名）。
+        fingerprint (str): 输入数据的指纹。
+        vocabulary (Vocabulary): 编号所属的全局词表（须已通过 merge_vocabulary 保存）。
+    """
+    offsets = np.concatenate([[0], np.cumsum([len(ids) for ids in token_ids], dtype=np.int64)]).astype(np.int64)
+    header = {"fingerprint": fingerprint, "lineage": vocabulary.lineage, "vocabulary_size": len(vocabulary)}
+    write_arrays(path, INTERNED_MAGIC, header, {
+        "token_ids": np.concatenate(token_ids).astype(np.int32) if token_ids else np.zeros(0, dtype=np.int32),
+        "offsets": offsets,
+        "names": encode_strings(names),
+        "groups": encode_strings(groups),
+    })
+
+
+def load_interned(path, fingerprint, vocabulary):
+    """
+    以内存映射方式读取打包的编号数组。
+    Args:
+        path (str): 文件路径。
+        fingerprint (str): 期望的输入数据指纹。
+        vocabulary (Vocabulary): 当前的全局词表，须与保存时为同一份词表（可已追加新 token）。
+    Returns:
+        tuple: (每个序列的编号数组视图, 名称列表, 分组列表)；文件不存在、指纹不符或词表不匹配时返回 None。
+    """
+    loaded = read_arrays(path, INTERNED_MAGIC)
+    if loaded is None:
+        return None
+    header, arrays = loaded
+    if (header["fingerprint"] != fingerprint or header["lineage"] != vocabulary.lineage
+            or header["vocabulary_size"] > len(vocabulary)):
+        return None
+    token_ids, offsets = arrays["token_ids"], arrays["offsets"]
+    sequences = [token_ids[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    return sequences, decode_strings(arrays["names"]), decode_strings(arrays["groups"])
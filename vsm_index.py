@@ -0,0 +1,749 @@
+import hashlib
+import json
+import os
+import zlib
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class VSMIndex:
+    """
+    项目级 TF-IDF 索引：每个项目只拟合一次词表和 IDF，
+    保存稀疏的源代码段矩阵以及预先计算的 L2 范数，
+    对错误报告的打分只需要一次稀疏矩阵-向量乘法。
+
+    加权方式与 TfidfVectorizer 的默认设置一致：
+    原始词频 tf、平滑 idf = ln((1 + n) / (1 + df)) + 1，
+    忽略长度小于 2 的 token（对应默认的 token_pattern）以及停用词。
+
+    给定 n_buckets 时使用带符号的特征哈希代替学习得到的词表：
+    token 经 CRC32 映射到固定数量的桶，并以哈希的最高位决定 +1/-1，
+    冲突的词项在期望上相互抵消。此时索引中没有词表字典，内存不随词表增长。
+    """
+
+    def __init__(self, vocabulary, idf, matrix, norms, lengths, file_ids, file_paths, segment_names, stop_words=(),
+                 n_buckets=None):
+        self.vocabulary = vocabulary          # token -> 列号，哈希模式下为 None
+        self.n_buckets = n_buckets            # 哈希桶数，None 表示使用词表
+        self.idf = idf                        # 每个词项的 idf
+        self.matrix = matrix                  # 代码段 × 词项 的 CSR TF-IDF 矩阵（未归一化）
+        self.norms = norms                    # 每个代码段向量的 L2 范数
+        self.lengths = lengths                # 每个代码段参与计算的 token 数（BM25 的文档长度）
+        self.file_ids = file_ids              # 代码段 -> 文件编号
+        self.file_paths = file_paths          # 文件编号 -> Java 文件相对路径
+        self.segment_names = segment_names    # 代码段 -> tokens 文件名
+        self.stop_words = frozenset(stop_words)
+        self._file_order = None               # 按文件编号排列的代码段顺序，池化时使用
+        self._file_starts = None              # 每个文件在 _file_order 中的起始位置
+        self._postings = None                 # 按词项组织的倒排表（CSC），首次 top-k 查询时构建
+        self._term_upper = None               # 每个词项在任一代码段上的最大归一化权重
+        self._term_lower = None               # 每个词项的最小归一化权重（哈希模式下可能为负）
+        self._term_columns = None             # 全局词表编号 -> 列号（-1 表示不参与计算），bind_vocabulary 时构建
+        self._term_signs = None               # 哈希模式下全局词表编号 -> 符号
+
+    @property
+    def n_segments(self):
+        return self.matrix.shape[0]
+
+    @property
+    def n_terms(self):
+        return self.matrix.shape[1]
+
+    @property
+    def n_files(self):
+        return len(self.file_paths)
+
+    def _keep(self, token):
+        return len(token) >= 2 and token not in self.stop_words
+
+    @classmethod
+    def build(cls, segments_tokens, relative_paths, segment_names, stop_words=(), n_buckets=None):
+        """
+        在一个项目的全部代码段上拟合词表和 IDF。
+        Args:
+            segments_tokens (list): 每个代码段的 tokens 列表。
+            relative_paths (list): 每个代码段对应的 Java 文件相对路径。
+            segment_names (list): 每个代码段对应的 tokens 文件名。
+            stop_words (iterable): 停用词。
+            n_buckets (int): 特征哈希的桶数；为 None 时学习词表。
+        Returns:
+            VSMIndex: 拟合好的索引。
+        """
+        # 按首次出现的顺序为每个 Java 文件分配编号
+        file_numbers = {}
+        file_ids = np.array([file_numbers.setdefault(path, len(file_numbers)) for path in relative_paths], dtype=np.int32)
+        stop_words = frozenset(stop_words)
+
+        # 构建 CSR 结构：indptr 记录每个代码段的起止位置
+        vocabulary = None if n_buckets else {}
+        indices = []
+        signs = []
+        indptr = [0]
+        for tokens in segments_tokens:
+            for token in tokens:
+                if len(token) >= 2 and token not in stop_words:
+                    if n_buckets:
+                        column, sign = hash_feature(token, n_buckets)
+                        indices.append(column)
+                        signs.append(sign)
+                    else:
+                        indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            indptr.append(len(indices))
+
+        counts = sp.csr_matrix(
+            (np.asarray(signs, dtype=np.float64) if n_buckets else np.ones(len(indices), dtype=np.float64),
+             np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, n_buckets or len(vocabulary))
+        )
+        return cls.from_counts(counts, vocabulary, file_ids, list(file_numbers), segment_names, stop_words, n_buckets)
+
+    @classmethod
+    def from_counts(cls, counts, vocabulary, file_ids, file_paths, segment_names, stop_words=(), n_buckets=None):
+        """
+        由 代码段 × 词项 的词频矩阵计算 idf、TF-IDF 矩阵和范数。
+        Args:
+            counts (scipy.sparse.csr_matrix): 词频矩阵，可以包含重复的 (行, 列) 项；哈希模式下为带符号的计数。
+            vocabulary (dict): token -> 列号，只包含参与计算的词项；哈希模式下为 None。
+            file_ids (numpy.ndarray): 代码段 -> 文件编号。
+            file_paths (list): 文件编号 -> Java 文件相对路径。
+            segment_names (list): 每个代码段的名称。
+            stop_words (iterable): 停用词。
+            n_buckets (int): 特征哈希的桶数；为 None 时使用词表。
+        Returns:
+            VSMIndex: 拟合好的索引。
+        """
+        counts = sp.csr_matrix(counts, dtype=np.float64)
+        # 合并前按绝对值求和，带符号的哈希计数也能得到真实的 token 数
+        lengths = np.asarray(abs(counts).sum(axis=1)).ravel()
+        # 合并重复词项，得到原始词频；带符号计数完全抵消的项被去掉
+        counts.sum_duplicates()
+        counts.eliminate_zeros()
+
+        # 文档频率和平滑 idf
+        n_segments = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((1.0 + n_segments) / (1.0 + df)) + 1.0
+
+        counts.data *= idf[counts.indices]
+        return cls(vocabulary, idf, counts, _row_norms(counts), lengths, file_ids, list(file_paths), list(segment_names),
+                   stop_words, n_buckets)
+
+    def transform(self, queries_tokens):
+        """
+        将若干查询（错误报告）的 tokens 映射为 TF-IDF 行向量，未登录词被忽略。
+        Args:
+            queries_tokens (list): 每个查询的 tokens 列表。
+        Returns:
+            scipy.sparse.csr_matrix: 查询 × 词项 的 TF-IDF 矩阵（未归一化）。
+        """
+        queries = self.term_counts(queries_tokens)
+        queries.data *= self.idf[queries.indices]
+        return queries
+
+    def term_counts(self, queries_tokens):
+        """
+        将若干查询的 tokens 映射为词频行向量，未登录词被忽略。
+        Args:
+            queries_tokens (list): 每个查询的 tokens 列表；也可以是全局词表编号数组的列表（需先 bind_vocabulary）。
+        Returns:
+            scipy.sparse.csr_matrix: 查询 × 词项 的词频矩阵。
+        """
+        if len(queries_tokens) and isinstance(queries_tokens[0], np.ndarray):
+            return self._term_counts_ids(queries_tokens)
+        vocabulary = self.vocabulary
+        indices = []
+        signs = []
+        indptr = [0]
+        for tokens in queries_tokens:
+            for token in tokens:
+                if self._keep(token):
+                    if self.n_buckets:
+                        column, sign = hash_feature(token, self.n_buckets)
+                        indices.append(column)
+                        signs.append(sign)
+                    else:
+                        term_id = vocabulary.get(token)
+                        if term_id is not None:
+                            indices.append(term_id)
+            indptr.append(len(indices))
+
+        queries = sp.csr_matrix(
+            (np.asarray(signs, dtype=np.float64) if self.n_buckets else np.ones(len(indices), dtype=np.float64),
+             np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, self.n_terms)
+        )
+        queries.sum_duplicates()
+        queries.eliminate_zeros()
+        return queries
+
+    def bind_vocabulary(self, vocabulary):
+        """
+        建立全局词表编号到本索引列号的映射，之后查询可以直接以编号数组给出，不再查找字符串。
+        停用词和过短的 token 映射为 -1，与字符串查询的过滤规则一致。
+        Args:
+            vocabulary (vocabulary.Vocabulary): 全局词表，查询中的编号都必须来自该词表。
+        """
+        terms = vocabulary.terms
+        columns = np.full(len(terms), -1, dtype=np.int32)
+        signs = None
+        if self.n_buckets:
+            signs = np.zeros(len(terms))
+            for term_id, term in enumerate(terms):
+                if self._keep(term):
+                    columns[term_id], signs[term_id] = hash_feature(term, self.n_buckets)
+        else:
+            # 索引词表只包含参与计算的 token，只需查找这些 token 的全局编号
+            term_ids = vocabulary.lookup(list(self.vocabulary))
+            known = term_ids >= 0
+            columns[term_ids[known]] = np.fromiter(self.vocabulary.values(), dtype=np.int32,
+                                                   count=len(self.vocabulary))[known]
+        self._term_columns = columns
+        self._term_signs = signs
+
+    def _term_counts_ids(self, queries_ids):
+        # 编号数组查询的向量化词频计算，结果与字符串查询相同
+        if self._term_columns is None:
+            raise ValueError("以编号数组查询前需要先调用 bind_vocabulary")
+        lengths = np.fromiter((len(ids) for ids in queries_ids), dtype=np.int64, count=len(queries_ids))
+        token_ids = np.concatenate(queries_ids)
+        if len(token_ids) and token_ids.max() >= len(self._term_columns):
+            raise ValueError("查询中的编号超出绑定的词表，词表扩充后需要重新调用 bind_vocabulary")
+        columns = self._term_columns[token_ids]
+        kept = columns >= 0
+        rows = np.repeat(np.arange(len(queries_ids)), lengths)[kept]
+        data = self._term_signs[token_ids][kept] if self.n_buckets else np.ones(int(kept.sum()))
+        queries = sp.csr_matrix((data, (rows, columns[kept])), shape=(len(queries_ids), self.n_terms))
+        queries.sum_duplicates()
+        queries.eliminate_zeros()
+        return queries
+
+    def score(self, bug_tokens):
+        """
+        计算一个错误报告与项目中每个代码段的余弦相似度。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+        Returns:
+            numpy.ndarray: 长度为代码段数的相似度数组。
+        """
+        query = self.transform([bug_tokens])
+        query_norm = np.sqrt(query.data @ query.data)
+        if query_norm == 0:
+            return np.zeros(self.n_segments)
+
+        # 一次稀疏矩阵-向量乘法得到全部点积
+        dots = self.matrix @ _dense_vector(query, self.n_terms)
+        return _safe_divide(dots, self.norms * query_norm)
+
+    def score_batch(self, queries_tokens, block_size=256):
+        """
+        将一个项目的全部错误报告堆叠成查询矩阵，分块计算 报告 × 代码段 的余弦相似度。
+        Args:
+            queries_tokens (list): 每个错误报告的 tokens 列表。
+            block_size (int): 每块包含的错误报告数。
+        Yields:
+            tuple: (块起始下标, 该块的相似度矩阵 numpy.ndarray[块大小, 代码段数])。
+        """
+        queries = self.prepare_queries(queries_tokens)
+        for start in range(0, queries.shape[0], block_size):
+            stop = min(start + block_size, queries.shape[0])
+            yield start, self.score_segments(queries[start:stop])
+
+    def prepare_queries(self, queries_tokens):
+        """
+        将错误报告转换为按行 L2 归一化的 TF-IDF 查询矩阵，供 score_segments 使用。
+        Args:
+            queries_tokens (list): 每个错误报告的 tokens 列表。
+        Returns:
+            scipy.sparse.csr_matrix: 查询 × 词项 的归一化 TF-IDF 矩阵。
+        """
+        queries = self.transform(queries_tokens)
+        query_norms = _row_norms(queries)
+        queries.data = _safe_divide(queries.data, np.repeat(query_norms, np.diff(queries.indptr)))
+        return queries
+
+    def score_segments(self, queries, segments=None):
+        """
+        计算一组查询与部分代码段的余弦相似度。
+        Args:
+            queries (scipy.sparse.csr_matrix): prepare_queries 返回的查询矩阵（或其中若干行）。
+            segments (numpy.ndarray): 代码段下标；为 None 时对全部代码段打分。
+        Returns:
+            numpy.ndarray: 相似度矩阵 [查询数, 代码段数]。
+        """
+        # 不转置索引矩阵，避免复制内存映射的数组；只取出本块需要的行
+        rows = self.matrix if segments is None else self.matrix[segments]
+        norms = self.norms if segments is None else self.norms[segments]
+        dots = (rows @ queries.T).T.toarray()
+        return _safe_divide(dots, norms)
+
+    def score_files(self, queries_tokens, max_memory, method="max", top_m=3, k=None, scorer=None):
+        """
+        在内存预算内计算 报告 × 文件 的得分：按错误报告块和代码段块分片计算，
+        每个分片只包含完整的文件，分片内直接完成池化（以及 top-k 合并），
+        峰值内存由预算决定，与项目的代码段数无关。
+        单个文件的代码段数超过分片大小时，该文件单独成为一个分片。
+        Args:
+            queries_tokens (list): 每个错误报告的 tokens 列表。
+            max_memory (int): 内存预算（字节），用于确定分片大小。
+            method (str): 代码段到文件的池化方式。
+            top_m (int): topm 池化时每个文件参与平均的代码段数。
+            k (int): 给定时每个报告只保留得分最高的 k 个文件。
+            scorer (object): 提供 prepare_queries/score_segments 的打分器，默认为本索引的余弦相似度。
+        Yields:
+            tuple: k 为 None 时为 (块起始下标, 文件得分 numpy.ndarray[块大小, 文件数])；
+            否则为 (块起始下标, 文件编号 numpy.ndarray[块大小, k], 得分 numpy.ndarray[块大小, k])，
+            每行按得分从高到低排列，同分时按文件编号排列。
+        """
+        if method not in POOLING_METHODS:
+            raise ValueError(f"未知的池化方式：{method}")
+        scorer = self if scorer is None else scorer
+        order, starts = self._file_layout()
+        counts = np.diff(np.append(starts, len(order)))
+
+        queries = scorer.prepare_queries(queries_tokens)
+        n_queries = queries.shape[0]
+        if n_queries == 0:
+            return
+
+        # 一半预算留给每个报告的文件级结果，另一半留给分片内的代码段得分及其临时数组
+        per_report = 16 * k if k else 8 * self.n_files
+        report_block = int(min(n_queries, max(1, max_memory // 2 // max(per_report, 1))))
+        segment_block = int(max(1, max_memory // 2 // (report_block * TILE_BYTES_PER_SCORE)))
+        tiles = _file_tiles(counts, segment_block)
+
+        for start in range(0, n_queries, report_block):
+            stop = min(start + report_block, n_queries)
+            block_queries = queries[start:stop]
+            if k:
+                best_files = np.zeros((stop - start, 0), dtype=np.int64)
+                best_scores = np.zeros((stop - start, 0))
+            else:
+                file_scores = np.zeros((stop - start, self.n_files))
+
+            for first_file, last_file in tiles:
+                segment_start, segment_stop = starts[first_file], starts[last_file - 1] + counts[last_file - 1]
+                scores = scorer.score_segments(block_queries, order[segment_start:segment_stop])
+                pooled = _pool_sorted(scores, starts[first_file:last_file] - segment_start,
+                                      counts[first_file:last_file], method, top_m)
+                del scores
+                if not k:
+                    file_scores[:, first_file:last_file] = pooled
+                    continue
+
+                # 与当前的前 k 名合并，同分时按文件编号排列，与完整排序一致
+                tile_files = np.broadcast_to(np.arange(first_file, last_file), pooled.shape)
+                merged_files = np.concatenate([best_files, tile_files], axis=1)
+                merged_scores = np.concatenate([best_scores, pooled], axis=1)
+                ranked = np.lexsort((merged_files, -merged_scores))[:, :k]
+                best_files = np.take_along_axis(merged_files, ranked, axis=1)
+                best_scores = np.take_along_axis(merged_scores, ranked, axis=1)
+
+            if k:
+                yield start, best_files, best_scores
+            else:
+                yield start, file_scores
+
+    def pool(self, scores, method="max", top_m=3):
+        """
+        将代码段得分池化为文件得分，一次 NumPy 分组归约完成，可直接作用于 报告 × 代码段 的得分块。
+        Args:
+            scores (numpy.ndarray): 代码段得分，形状为 [代码段数] 或 [报告数, 代码段数]。
+            method (str): max（取最大值）、mean（取平均值）或 topm（取最高的 top_m 个代码段的平均值）。
+            top_m (int): topm 池化时每个文件参与平均的代码段数。
+        Returns:
+            numpy.ndarray: 文件得分，形状为 [文件数] 或 [报告数, 文件数]。
+        """
+        if method not in POOLING_METHODS:
+            raise ValueError(f"未知的池化方式：{method}")
+
+        order, starts = self._file_layout()
+        counts = np.diff(np.append(starts, len(order)))
+        pooled = _pool_sorted(np.atleast_2d(scores)[:, order], starts, counts, method, top_m)
+        return pooled if np.ndim(scores) == 2 else pooled[0]
+
+    def _file_layout(self):
+        # 按文件编号排列的代码段顺序，以及每个文件在其中的起始位置
+        if self._file_order is None:
+            self._file_order = np.argsort(self.file_ids, kind="stable")
+            self._file_starts = np.searchsorted(self.file_ids[self._file_order], np.arange(self.n_files))
+        return self._file_order, self._file_starts
+
+    def _inverted_index(self):
+        # 倒排表中的权重预先除以代码段范数，词项上界即该词项对任一代码段余弦值的最大贡献
+        if self._postings is None:
+            lengths = np.diff(self.matrix.indptr)
+            safe_norms = np.where(self.norms > 0, self.norms, 1.0)
+            normalized = sp.csr_matrix(
+                (self.matrix.data / np.repeat(safe_norms, lengths), self.matrix.indices, self.matrix.indptr),
+                shape=self.matrix.shape
+            )
+            self._postings = normalized.tocsc()
+            self._postings.sort_indices()
+            self._term_upper = np.asarray(self._postings.max(axis=0).todense()).ravel()
+            self._term_lower = np.asarray(self._postings.min(axis=0).todense()).ravel()
+        return self._postings, self._term_upper, self._term_lower
+
+    def top_k(self, bug_tokens, k, group_ids=None):
+        """
+        基于倒排表的 top-k 检索，使用 MaxScore 风格的词项上界进行动态剪枝。
+
+        先对最罕见词项的倒排记录精确打分，得到第 k 名得分的下界 θ；
+        按上界从小到大累加，和仍小于 θ 的词项为“非必要词项”——只包含这些词项的代码段
+        不可能进入 top-k，因此只有“必要词项”的倒排记录产生候选，
+        较长的常见词倒排表被整体跳过。候选代码段再做精确的余弦打分，结果与完整打分一致；
+        候选超过四分之一的代码段时退回一次完整的矩阵-向量乘法。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+            k (int): 返回的结果数。
+            group_ids (numpy.ndarray): 代码段 -> 文件分组号；给定时按组取最大值，返回 k 个不同的组。
+        Returns:
+            list: [(代码段下标, 相似度)]，按相似度从高到低排列，最多 k 项，不含相似度为 0 的代码段。
+        """
+        query = self.transform([bug_tokens])
+        query_norm = np.sqrt(query.data @ query.data)
+        if query_norm == 0 or k <= 0:
+            return []
+
+        postings, term_upper, term_lower = self._inverted_index()
+        terms = query.indices
+        # 哈希模式下查询和代码段的权重都可能为负，上界取两种符号组合中较大的一个
+        weights = query.data / query_norm
+        upper = np.maximum(np.maximum(term_upper[terms] * weights, term_lower[terms] * weights), 0.0)
+        order = np.argsort(upper, kind="stable")
+
+        def term_docs(position):
+            term = terms[position]
+            return postings.indices[postings.indptr[term]:postings.indptr[term + 1]]
+
+        # 用最罕见的若干词项（倒排表最短）的倒排记录精确打分，估计 θ
+        seed = []
+        seed_size = 0
+        for position in np.argsort(np.diff(postings.indptr)[terms], kind="stable"):
+            seed.append(term_docs(position))
+            seed_size += len(seed[-1])
+            if seed_size >= 16 * k:
+                break
+        seed = np.unique(np.concatenate(seed))
+        query_vector = _dense_vector(query, self.n_terms)
+        threshold = _kth_largest(self._exact_scores(query_vector, query_norm, seed), k, group_ids, seed)
+
+        # 上界前缀和小于 θ 的词项是非必要词项，不参与候选生成
+        n_non_essential = int(np.searchsorted(np.cumsum(upper[order]), threshold, side="left"))
+        essential = order[n_non_essential:]
+        is_candidate = np.zeros(self.n_segments, dtype=bool)
+        is_candidate[seed] = True
+        for position in essential:
+            is_candidate[term_docs(position)] = True
+        candidates = np.flatnonzero(is_candidate)
+
+        if len(candidates) * 4 > self.n_segments:
+            # 剪枝效果不明显时，直接做一次完整的矩阵-向量乘法更快
+            scores = _safe_divide(self.matrix @ query_vector, self.norms * query_norm)
+        else:
+            scores = self._exact_scores(query_vector, query_norm, candidates)
+        return _select_top(candidates, scores[candidates], k, group_ids)
+
+    def rerank(self, bug_tokens, candidates, k, group_ids=None):
+        """
+        对候选代码段做精确的余弦打分并返回前 k 项，供近似检索（如 LSA）生成候选后重排序。
+        Args:
+            bug_tokens (list): 错误报告的 tokens。
+            candidates (numpy.ndarray): 候选代码段下标。
+            k (int): 返回的结果数。
+            group_ids (numpy.ndarray): 代码段 -> 文件分组号；给定时按组取最大值，返回 k 个不同的组。
+        Returns:
+            list: [(代码段下标, 相似度)]，与 top_k 的格式相同。
+        """
+        query = self.transform([bug_tokens])
+        query_norm = np.sqrt(query.data @ query.data)
+        if query_norm == 0 or k <= 0 or len(candidates) == 0:
+            return []
+
+        candidates = np.unique(candidates)
+        scores = self._exact_scores(_dense_vector(query, self.n_terms), query_norm, candidates)
+        return _select_top(candidates, scores[candidates], k, group_ids)
+
+    def _exact_scores(self, query_vector, query_norm, segments):
+        # 只对给定代码段（升序）计算精确余弦相似度，其余位置为 0；只读取这些代码段所在的行
+        matrix = self.matrix
+        starts = matrix.indptr[segments]
+        lengths = matrix.indptr[segments + 1] - starts
+        positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        products = matrix.data[positions] * query_vector[matrix.indices[positions]]
+        dots = np.bincount(np.repeat(np.arange(len(segments)), lengths), weights=products, minlength=len(segments))
+
+        scores = np.zeros(self.n_segments)
+        scores[segments] = _safe_divide(dots, self.norms[segments] * query_norm)
+        return scores
+
+
+POOLING_METHODS = ("max", "mean", "topm")
+
+# 分片内每个 报告 × 代码段 得分的内存估计（字节）：稀疏乘积、稠密得分、相除结果以及 topm 排序的临时数组
+TILE_BYTES_PER_SCORE = 48
+
+INDEX_MAGIC = b"VSMIDX03"
+INDEX_ALIGNMENT = 64
+
+
+def directory_fingerprint(directory, extra=None):
+    """
+    根据目录中 tokens 文件的文件名、大小和修改时间计算指纹，用于判断索引是否过期。
+    Args:
+        directory (str): source_code_tokens 下的项目目录。
+        extra (object): 参与指纹计算的其他参数（如停用词），需可 JSON 序列化。
+    Returns:
+        str: 十六进制指纹。
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(extra, sort_keys=True).encode("utf-8"))
+    with os.scandir(directory) as entries:
+        stats = sorted(
+            (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in entries
+            if entry.name.endswith("_tokens.txt") and not entry.name.startswith(".")
+        )
+    for name, size, mtime in stats:
+        digest.update(f"{name}\0{size}\0{mtime}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def save_index(index, path, fingerprint):
+    """
+    将索引序列化为单个文件（格式见 write_arrays）。
+    字符串表（词表、文件相对路径、tokens 文件名）以换行符连接后存为字节数组。
+    Args:
+        index (VSMIndex): 需要保存的索引。
+        path (str): 输出文件路径。
+        fingerprint (str): 输入数据的指纹。
+    """
+    matrix = index.matrix
+    # 与 scipy 的索引类型保持一致，加载时无需复制
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+    terms = sorted(index.vocabulary, key=index.vocabulary.get) if index.vocabulary is not None else []
+
+    arrays = {
+        "idf": np.asarray(index.idf, dtype=np.float64),
+        "data": np.asarray(matrix.data, dtype=np.float64),
+        "indices": np.asarray(matrix.indices, dtype=index_dtype),
+        "indptr": np.asarray(matrix.indptr, dtype=index_dtype),
+        "norms": np.asarray(index.norms, dtype=np.float64),
+        "lengths": np.asarray(index.lengths, dtype=np.float64),
+        "terms": encode_strings(terms),
+        "file_ids": np.asarray(index.file_ids, dtype=np.int32),
+        "file_paths": encode_strings(index.file_paths),
+        "segment_names": encode_strings(index.segment_names),
+    }
+
+    write_arrays(path, INDEX_MAGIC, {
+        "fingerprint": fingerprint,
+        "shape": list(matrix.shape),
+        "stop_words": sorted(index.stop_words),
+        "n_buckets": index.n_buckets,
+    }, arrays)
+
+
+def load_index(path, fingerprint=None):
+    """
+    以内存映射方式打开索引文件，多个进程可以共享同一份页缓存。
+    Args:
+        path (str): 索引文件路径。
+        fingerprint (str): 期望的输入指纹；不一致时视为过期。
+    Returns:
+        VSMIndex: 加载的索引；文件不存在、格式不符或已过期时返回 None。
+    """
+    loaded = read_arrays(path, INDEX_MAGIC)
+    if loaded is None:
+        return None
+    header, arrays = loaded
+    if fingerprint is not None and header["fingerprint"] != fingerprint:
+        return None
+
+    matrix = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(header["shape"]), copy=False)
+    terms = decode_strings(arrays["terms"])
+    n_buckets = header.get("n_buckets")
+    return VSMIndex(
+        None if n_buckets else dict(zip(terms, range(len(terms)))),
+        arrays["idf"],
+        matrix,
+        arrays["norms"],
+        arrays["lengths"],
+        arrays["file_ids"],
+        decode_strings(arrays["file_paths"]),
+        decode_strings(arrays["segment_names"]),
+        header["stop_words"],
+        n_buckets,
+    )
+
+
+def write_arrays(path, magic, header, arrays):
+    """
+    将若干数组写入单个文件：8 字节魔数 + 8 字节头长度 + JSON 头 + 按 64 字节对齐的数组。
+    Args:
+        path (str): 输出文件路径。
+        magic (bytes): 8 字节魔数，标识文件格式和版本。
+        header (dict): 写入 JSON 头的其他信息（需可 JSON 序列化）。
+        arrays (dict): 数组名 -> numpy.ndarray。
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    header = json.dumps(dict(header, arrays=layout)).encode("utf-8")
+    data_start = _align(len(magic) + 8 + len(header))
+
+    # 先写临时文件再替换，避免其他进程读到写了一半的文件
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(magic)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_arrays(path, magic):
+    """
+    以内存映射方式打开 write_arrays 写出的文件，数组只读且不复制。
+    Args:
+        path (str): 文件路径。
+        magic (bytes): 期望的魔数。
+    Returns:
+        tuple: (JSON 头 dict, 数组名 -> numpy.ndarray)；文件不存在或格式不符时返回 None。
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            return None
+        header_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(header_length).decode("utf-8"))
+
+    data_start = _align(len(magic) + 8 + header_length)
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        start = data_start + spec["offset"]
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return header, arrays
+
+
+def _pool_sorted(block, starts, counts, method, top_m):
+    # 对已按文件排列的 报告 × 代码段 得分做分组归约，starts/counts 为每个文件的起始位置和代码段数
+    if method == "max":
+        return np.maximum.reduceat(block, starts, axis=1)
+    if method == "mean":
+        return np.add.reduceat(block, starts, axis=1) / counts
+
+    # 每个文件内部按得分降序排列，只累加排名前 top_m 的代码段
+    file_of = np.repeat(np.arange(len(starts)), counts)
+    descending = np.argsort(-block, axis=1, kind="stable")
+    within_file = np.take_along_axis(descending, np.argsort(file_of[descending], axis=1, kind="stable"), axis=1)
+    ranked = np.take_along_axis(block, within_file, axis=1)
+    rank = np.arange(block.shape[1]) - np.repeat(starts, counts)
+    return np.add.reduceat(np.where(rank < top_m, ranked, 0.0), starts, axis=1) / np.minimum(counts, top_m)
+
+
+def _file_tiles(counts, max_segments):
+    # 按文件顺序贪心划分分片，每个分片由若干完整文件组成，代码段数不超过 max_segments（单个大文件除外）
+    tiles = []
+    first = 0
+    total = 0
+    for i, count in enumerate(counts):
+        if i > first and total + count > max_segments:
+            tiles.append((first, i))
+            first, total = i, 0
+        total += count
+    if len(counts):
+        tiles.append((first, len(counts)))
+    return tiles
+
+
+def hash_feature(token, n_buckets):
+    # 带符号的特征哈希：低 31 位决定桶号，最高位决定符号
+    value = zlib.crc32(token.encode("utf-8"))
+    return (value & 0x7FFFFFFF) % n_buckets, -1.0 if value & 0x80000000 else 1.0
+
+
+def _align(offset):
+    return (offset + INDEX_ALIGNMENT - 1) // INDEX_ALIGNMENT * INDEX_ALIGNMENT
+
+
+def encode_strings(strings):
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def decode_strings(array):
+    if array.size == 0:
+        return []
+    return array.tobytes().decode("utf-8").split("\n")
+
+
+def _dense_vector(query, n_terms):
+    # 单个查询的稠密 TF-IDF 向量，供 CSR 矩阵-向量乘法使用
+    vector = np.zeros(n_terms)
+    vector[query.indices] = query.data
+    return vector
+
+
+def _kth_largest(scores, k, group_ids, subset=None):
+    """
+    当前第 k 名（按组取最大值后）得分的下界，不足 k 个时为 0。
+    按组时先在前 4k 个代码段中找 k 个不同的组，找不到再对全部代码段做分组最大值。
+    """
+    matched = np.flatnonzero(scores) if subset is None else subset[scores[subset] > 0]
+    values = scores[matched]
+    if len(values) < k:
+        return 0.0
+    if group_ids is None:
+        return float(np.partition(values, len(values) - k)[len(values) - k])
+
+    head = min(len(values), 4 * k)
+    top = np.argpartition(-values, head - 1)[:head]
+    top = top[np.argsort(-values[top], kind="stable")]
+    _, first = np.unique(group_ids[matched[top]], return_index=True)
+    if len(first) >= k:
+        return float(np.sort(values[top[first]])[-k])
+
+    best = np.zeros(int(group_ids.max()) + 1)
+    np.maximum.at(best, group_ids[matched], values)
+    best = best[best > 0]
+    if len(best) < k:
+        return 0.0
+    return float(np.partition(best, len(best) - k)[len(best) - k])
+
+
+def _select_top(candidates, candidate_scores, k, group_ids):
+    # 按得分从高到低排序（同分时按代码段顺序），每组只保留得分最高的代码段；
+    # 排序前先用第 k 名得分的下界过滤，只对少量代码段排序
+    threshold = _kth_largest(candidate_scores, k, None if group_ids is None else group_ids[candidates])
+    keep = (candidate_scores > 0) & (candidate_scores >= threshold)
+    candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+    order = np.lexsort((candidates, -candidate_scores))
+    if group_ids is not None:
+        _, first = np.unique(group_ids[candidates[order]], return_index=True)
+        order = order[np.sort(first)]
+    order = order[:k]
+    return [(int(segment), float(score)) for segment, score in zip(candidates[order], candidate_scores[order])]
+
+
+def _row_norms(matrix):
+    # 逐行计算 CSR 矩阵的 L2 范数
+    squared = matrix.multiply(matrix).sum(axis=1)
+    return np.sqrt(np.asarray(squared).ravel())
+
+
+def _safe_divide(numerator, denominator):
+    # 与 cosine_similarity 一致：零向量的相似度记为 0
+    result = np.zeros_like(numerator, dtype=np.float64)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result
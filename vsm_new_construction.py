@@ -1,7 +1,25 @@
+import argparse
+import hashlib
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from multiprocessing import Pool
+from itertools import groupby
+
+import numpy as np
+
+from bm25_scoring import BM25Scorer
+from lsa_index import LSAIndex, load_lsa_index, save_lsa_index
+from minhash_lsh import MinHashLSH, load_lsh_index, save_lsh_index
+from token_store import TOKEN_REFS_NAME, TOKEN_STORE_NAME, load_referenced_store, load_token_store
+from vocabulary import (Vocabulary, load_interned, load_vocabulary, locked_vocabulary, merge_vocabulary,
+                        save_interned, shared_vocabulary_path)
+from vsm_index import POOLING_METHODS, VSMIndex, directory_fingerprint, load_index, save_index
+
+
+# 定义停用词列表
+VSM_STOP_WORDS = ['public', 'class', 'void', 'new', 'if', 'else', 'for', 'while', 'return',
+                  '{', '}', '(', ')', ';', '...']
+
+# bug_reports_tokens 目录中编号形式的错误报告（以 . 开头，不会被当作项目目录）
+BUG_REPORT_IDS_NAME = ".bug_reports.ids"
 
 
 def get_bug_tokens(base_path):
@@ -42,6 +60,73 @@ def get_bug_tokens(base_path):
     return bug_reports_tokens, project_names, bug_report_names
 
 
+def bug_tokens_fingerprint(base_path):
+    # 根据全部错误报告 tokens 文件的路径、大小和修改时间计算指纹，判断编号形式的错误报告是否过期
+    digest = hashlib.sha1()
+    for project in sorted(os.listdir(base_path)):
+        project_path = os.path.join(base_path, project)
+        if project.startswith('.') or not os.path.isdir(project_path):
+            continue
+        with os.scandir(project_path) as entries:
+            stats = sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns) for entry in entries
+                           if entry.name.endswith('.txt') and not entry.name.startswith('.'))
+        for name, size, mtime in stats:
+            digest.update(f"{project}/{name}\0{size}\0{mtime}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def save_bug_report_ids(base_path, vocabulary, vocabulary_path, bug_reports_tokens, project_names, bug_report_names):
+    """
+    将错误报告写入全局词表，并在 bug_reports_tokens 目录中保存编号形式的错误报告。
+    Args:
+        base_path (str): bug_reports_tokens 目录，tokens 文件须已写出（用于计算指纹）。
+        vocabulary (Vocabulary): 全局词表。
+        vocabulary_path (str): 全局词表路径（vocabulary.shared_vocabulary_path）。
+        bug_reports_tokens (list): 每个错误报告的 tokens 列表，顺序与 get_bug_tokens 相同。
+        project_names (list): 每个错误报告所属的项目名称。
+        bug_report_names (list): 每个错误报告的名称。
+    Returns:
+        list: 每个错误报告的编号数组。
+    """
+    ids_path = os.path.join(base_path, BUG_REPORT_IDS_NAME)
+    bug_reports_ids = [vocabulary.intern(tokens) for tokens in bug_reports_tokens]
+    # 在词表锁内先合并保存词表再保存编号，编号文件始终不超出已保存的词表
+    with locked_vocabulary(vocabulary_path):
+        remap = merge_vocabulary(vocabulary, vocabulary_path)
+        if remap is not None:
+            bug_reports_ids = [remap[ids] for ids in bug_reports_ids]
+        save_interned(ids_path, bug_reports_ids, bug_report_names, project_names, bug_tokens_fingerprint(base_path),
+                      vocabulary)
+    print(f"已将 {len(bug_reports_ids)} 个错误报告写入全局词表（{len(vocabulary)} 个token）：{ids_path}")
+    return bug_reports_ids
+
+
+def load_or_intern_bug_tokens(base_path, vocabulary_path):
+    """
+    读取全局词表和编号形式的错误报告（通常由 preprocess_bug_report 在分词时写出）；
+    错误报告 tokens 文件有变化时重新读取一次并写入全局词表，之后的运行直接以内存映射方式读取编号数组，不再解析字符串。
+    全局词表与源代码的打包 token 存储共用，错误报告和代码段的编号属于同一编号空间。
+    Args:
+        base_path (str): bug_reports_tokens 目录。
+        vocabulary_path (str): 全局词表路径（vocabulary.shared_vocabulary_path）。
+    Returns:
+        tuple: (全局词表, 每个错误报告的编号数组, 项目名称列表, 错误报告名称列表)，顺序与 get_bug_tokens 相同。
+    """
+    ids_path = os.path.join(base_path, BUG_REPORT_IDS_NAME)
+    vocabulary = load_vocabulary(vocabulary_path) or Vocabulary()
+
+    loaded = load_interned(ids_path, bug_tokens_fingerprint(base_path), vocabulary)
+    if loaded is not None:
+        bug_reports_ids, bug_report_names, project_names = loaded
+        print(f"复用编号形式的错误报告：{ids_path}")
+        return vocabulary, bug_reports_ids, project_names, bug_report_names
+
+    bug_reports_tokens, project_names, bug_report_names = get_bug_tokens(base_path)
+    bug_reports_ids = save_bug_report_ids(base_path, vocabulary, vocabulary_path, bug_reports_tokens, project_names,
+                                          bug_report_names)
+    return vocabulary, bug_reports_ids, project_names, bug_report_names
+
+
 def get_source_files(base_path, project_name):
     # 获取项目下所有的tokens文件
     project_dir = os.path.join(base_path, project_name)
@@ -74,91 +159,303 @@ def save_vsm_result(bug_report_name, vsm_results):
             f.write(f"{result[0]}: {result[1]:.4f}\n")
 
 
-def process_source_file(args):
-    bug_report_text, source_file_path, stop_words = args
-    relative_path, source_tokens = get_source_tokens(source_file_path)
+def build_project_index(base_path, project_name, stop_words, n_buckets=None):
+    # 读取项目下全部代码段，一次性拟合该项目的 TF-IDF 索引；有打包的 token 存储或对内容寻址存储的引用时直接由 token 编号构建
+    project_dir = os.path.join(base_path, project_name)
+    vocabulary = load_vocabulary(shared_vocabulary_path(base_path))
+    store = (load_token_store(os.path.join(project_dir, TOKEN_STORE_NAME), vocabulary)
+             or load_referenced_store(project_dir, vocabulary))
+    if store is not None:
+        return store.build_index(stop_words, n_buckets)
 
-    # 将源代码的 tokens 转换为字符串
-    source_code_text = ' '.join(source_tokens)
+    source_files = get_source_files(base_path, project_name)
+    if not source_files:
+        return None
 
-    # 构建文档集合：一个错误报告 + 一个源代码段
-    documents = [bug_report_text, source_code_text]
+    relative_paths = []
+    segments_tokens = []
+    for source_file in source_files:
+        relative_path, tokens = get_source_tokens(os.path.join(base_path, project_name, source_file))
+        relative_paths.append(relative_path)
+        segments_tokens.append(tokens)
 
-    # 创建 TfidfVectorizer 实例
-    vectorizer = TfidfVectorizer(stop_words=stop_words)
+    return VSMIndex.build(segments_tokens, relative_paths, source_files, stop_words, n_buckets)
 
-    # 计算 TF-IDF 矩阵
-    tfidf_matrix = vectorizer.fit_transform(documents)
 
-    # 分割错误报告和源代码段的向量
-    bug_report_vector = tfidf_matrix[0]
-    source_code_vector = tfidf_matrix[1]
+def load_or_build_project_index(base_path, project_name, stop_words, index_dir, rebuild=False, n_buckets=None):
+    # 优先以内存映射方式复用磁盘上的索引；tokens 文件变化时重新构建
+    project_dir = os.path.join(base_path, project_name)
+    if not os.path.isdir(project_dir):
+        return None
+
+    if not os.path.exists(index_dir):
+        os.makedirs(index_dir)
+    # 词表索引与不同桶数的哈希索引分别存放
+    suffix = f".hash{n_buckets}" if n_buckets else ""
+    index_path = os.path.join(index_dir, f"{project_name}{suffix}.vsmidx")
+    fingerprint = directory_fingerprint(project_dir, {"stop_words": sorted(set(stop_words)), "n_buckets": n_buckets,
+                                                      "token_store": token_store_stat(project_dir)})
+
+    if not rebuild:
+        index = load_index(index_path, fingerprint)
+        if index is not None:
+            print(f"复用项目 {project_name} 的VSM索引：{index_path}")
+            return index
+
+    index = build_project_index(base_path, project_name, stop_words, n_buckets)
+    if index is not None:
+        save_index(index, index_path, fingerprint)
+        print(f"已构建并保存项目 {project_name} 的VSM索引：{index_path}")
+        # 重新以内存映射方式打开，释放构建时的内存
+        index = load_index(index_path)
+    return index
+
+
+def token_store_stat(project_dir):
+    # 打包 token 存储和引用文件的大小与修改时间，参与索引指纹；不存在的为 None
+    stats = []
+    for name in (TOKEN_STORE_NAME, TOKEN_REFS_NAME):
+        path = os.path.join(project_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stats.append([stat.st_size, stat.st_mtime_ns])
+        else:
+            stats.append(None)
+    return stats
 
-    # 计算相似度
-    similarity = cosine_similarity(bug_report_vector, source_code_vector.reshape(1, -1)).flatten()[0]
 
-    return (relative_path, similarity)
+def load_or_build_lsa_index(base_path, project_name, index, stop_words, index_dir, n_components, n_candidates=300,
+                            rebuild=False, n_buckets=None):
+    # LSA 索引依赖项目的 VSM 索引，与其放在同一目录，指纹额外包含潜在维度数
+    project_dir = os.path.join(base_path, project_name)
+    suffix = f".hash{n_buckets}" if n_buckets else ""
+    lsa_path = os.path.join(index_dir, f"{project_name}{suffix}.lsa{n_components}.vsmidx")
+    fingerprint = directory_fingerprint(project_dir, {"stop_words": sorted(set(stop_words)), "n_buckets": n_buckets,
+                                                      "token_store": token_store_stat(project_dir),
+                                                      "n_components": n_components})
+
+    if not rebuild:
+        lsa = load_lsa_index(lsa_path, index, fingerprint, n_candidates)
+        if lsa is not None:
+            print(f"复用项目 {project_name} 的LSA索引：{lsa_path}")
+            return lsa
+
+    lsa = LSAIndex.fit(index, n_components, n_candidates)
+    save_lsa_index(lsa, lsa_path, fingerprint)
+    print(f"已构建并保存项目 {project_name} 的LSA索引：{lsa_path}")
+    return load_lsa_index(lsa_path, index, n_candidates=n_candidates)
+
+
+def load_or_build_lsh_index(base_path, project_name, index, stop_words, index_dir, bands, rows, rebuild=False,
+                            n_buckets=None):
+    # MinHash 签名和分带哈希表与项目的 VSM 索引放在同一目录，指纹额外包含带数和行数
+    project_dir = os.path.join(base_path, project_name)
+    suffix = f".hash{n_buckets}" if n_buckets else ""
+    lsh_path = os.path.join(index_dir, f"{project_name}{suffix}.lsh{bands}x{rows}.vsmidx")
+    fingerprint = directory_fingerprint(project_dir, {"stop_words": sorted(set(stop_words)), "n_buckets": n_buckets,
+                                                      "token_store": token_store_stat(project_dir),
+                                                      "bands": bands, "rows": rows})
+
+    if not rebuild:
+        lsh = load_lsh_index(lsh_path, index, fingerprint)
+        if lsh is not None:
+            print(f"复用项目 {project_name} 的LSH索引：{lsh_path}")
+            return lsh
+
+    lsh = MinHashLSH.fit(index, bands, rows)
+    save_lsh_index(lsh, lsh_path, fingerprint)
+    print(f"已构建并保存项目 {project_name} 的LSH索引：{lsh_path}")
+    return load_lsh_index(lsh_path, index)
+
+
+def parse_memory_size(text):
+    # 解析 --max-mem 参数，支持 512M、2G、1.5G 这样的写法，不带单位时按字节计
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    text = text.strip().upper().removesuffix("B")
+    try:
+        if text and text[-1] in units:
+            size = float(text[:-1]) * units[text[-1]]
+        else:
+            size = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法解析的内存大小：{text}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"内存大小必须为正数：{text}")
+    return int(size)
 
 
-def aggregate_vsm_results(vsm_results):
-    # 定义一个字典，用于聚合同一类的多个tokens文件
-    aggregated_results = {}
+def create_scorer(index, model, k1=1.2, b=0.75, delta=0.5):
+    # tfidf 直接使用索引的余弦相似度；bm25/bm25l 复用同一索引的倒排结构和代码段长度
+    if model == "tfidf":
+        return index
+    return BM25Scorer(index, k1, b, model, delta)
 
-    for relative_path, similarity in vsm_results:
-        # 提取类名（假设类名是文件名的第一部分）
-        class_name = relative_path.split('_')[0]
 
-        # 如果字典中没有该类名，直接添加
-        if class_name not in aggregated_results:
-            aggregated_results[class_name] = (relative_path, similarity)
-        else:
-            # 更新为相似度更高的文件
-            if similarity > aggregated_results[class_name][1]:
-                aggregated_results[class_name] = (relative_path, similarity)
+def save_ranking(bug_report_name, file_paths, file_scores):
+    # 按相似度从高到低排序（同分时保持文件编号顺序）
+    order = np.argsort(-file_scores, kind="stable")
 
-    # 返回聚合后的结果
-    return list(aggregated_results.values())
+    # 保存结果到vsm_result文件夹中的对应错误报告txt文件
+    save_vsm_result(bug_report_name, [(file_paths[i], file_scores[i]) for i in order])
 
 
-if __name__ == '__main__':
+def run_single(bug_reports, load_index_for, scorer_for, pooling, top_m):
+    # 逐个错误报告打分：每个项目只构建一次索引，每个报告一次矩阵-向量乘法
+    for project_name, reports in groupby(bug_reports, key=lambda x: x[1]):
+        index = load_index_for(project_name)
+        if index is None:
+            print(f"未找到项目 {project_name} 的源代码tokens文件")
+            continue
 
-    # 获取错误报告的 tokens 及对应项目名称和错误报告名称
-    bug_reports_tokens, project_names, bug_report_names = get_bug_tokens("../pathidea/ProcessData/bug_reports_tokens")
+        scorer = scorer_for(index)
+        for i, (bug_tokens, _, bug_report_name) in enumerate(reports):
+            # 代码段得分按文件池化
+            file_scores = index.pool(scorer.score(bug_tokens), pooling, top_m)
+            save_ranking(bug_report_name, index.file_paths, file_scores)
+            print(f"错误报告 {i} ({bug_report_name}) 的相似度分析已完成，并保存到 ../pathidea/ProcessData/vsm_result/{bug_report_name}_vsm.txt")
 
-    print(project_names)
-    # 定义停用词列表
-    stop_words = ['public', 'class', 'void', 'new', 'if', 'else', 'for', 'while', 'return',
-                  '{', '}', '(', ')', ';', '...']
 
-    for i, (bug_tokens, project_name, bug_report_name) in enumerate(zip(bug_reports_tokens, project_names, bug_report_names)):
-        # 将错误报告的 tokens 转换为字符串
-        bug_report_text = ' '.join(bug_tokens)
+def run_batch(bug_reports, load_index_for, scorer_for, block_size, pooling, top_m):
+    # 批量打分：一个项目的全部错误报告堆叠为查询矩阵，分块做稀疏矩阵-矩阵乘法
+    for project_name, reports in groupby(bug_reports, key=lambda x: x[1]):
+        index = load_index_for(project_name)
+        if index is None:
+            print(f"未找到项目 {project_name} 的源代码tokens文件")
+            continue
+
+        scorer = scorer_for(index)
+        reports = list(reports)
+        queries_tokens = [bug_tokens for bug_tokens, _, _ in reports]
+        for start, block in scorer.score_batch(queries_tokens, block_size):
+            # 整块 报告 × 代码段 得分一次池化为 报告 × 文件 得分
+            for offset, file_scores in enumerate(index.pool(block, pooling, top_m)):
+                save_ranking(reports[start + offset][2], index.file_paths, file_scores)
+
+        print(f"项目 {project_name} 的 {len(reports)} 个错误报告已完成批量相似度分析")
 
-        # 获取对应项目下的所有源代码tokens文件
-        source_files = get_source_files("../pathidea/ProcessData/source_code_tokens", project_name)
 
-        if not source_files:
+def run_top_k(bug_reports, load_index_for, k, retriever_for=None):
+    # 只保留前 k 个文件：倒排表 + 词项上界剪枝，跳过不可能进入 top-k 的代码段；
+    # 给定 retriever_for 时改用其返回的检索器（如 LSA、LSH 近似检索）
+    for project_name, reports in groupby(bug_reports, key=lambda x: x[1]):
+        index = load_index_for(project_name)
+        if index is None:
             print(f"未找到项目 {project_name} 的源代码tokens文件")
             continue
 
-        # 准备传递给子进程的参数列表
-        args_list = [
-            (bug_report_text, os.path.join("../pathidea/ProcessData/source_code_tokens", project_name, source_file), stop_words)
-            for source_file in source_files
-        ]
+        retriever = index if retriever_for is None else retriever_for(project_name, index)
+        count = 0
+        for bug_tokens, _, bug_report_name in reports:
+            # 按文件取最大值，与 max 池化的完整排序一致
+            top_results = retriever.top_k(bug_tokens, k, index.file_ids)
+            save_vsm_result(bug_report_name, [(index.file_paths[index.file_ids[segment]], score) for segment, score in top_results])
+            count += 1
 
-        # 使用多进程池并行处理源代码文件
-        with Pool(processes=4) as pool:  # 根据您的CPU核心数调整进程数量
-            vsm_results = pool.map(process_source_file, args_list)
+        print(f"项目 {project_name} 的 {count} 个错误报告已完成 top-{k} 检索")
 
-        # 按类名聚合结果，仅保留相似度最高的文件
-        aggregated_results = aggregate_vsm_results(vsm_results)
 
-        # 按相似度从高到低排序
-        aggregated_results.sort(key=lambda x: x[1], reverse=True)
+def run_tiled(bug_reports, load_index_for, scorer_for, max_memory, pooling, top_m, k=None):
+    # 在内存预算内分片打分：报告块 × 代码段块，分片内完成文件池化和 top-k 合并
+    for project_name, reports in groupby(bug_reports, key=lambda x: x[1]):
+        index = load_index_for(project_name)
+        if index is None:
+            print(f"未找到项目 {project_name} 的源代码tokens文件")
+            continue
+
+        scorer = scorer_for(index)
+        reports = list(reports)
+        queries_tokens = [bug_tokens for bug_tokens, _, _ in reports]
+        if k:
+            for start, file_ids, file_scores in index.score_files(queries_tokens, max_memory, pooling, top_m, k, scorer):
+                for offset in range(len(file_ids)):
+                    # 与 topk 模式一致，不输出得分为 0 的文件
+                    results = [(index.file_paths[file_id], score)
+                               for file_id, score in zip(file_ids[offset], file_scores[offset]) if score > 0]
+                    save_vsm_result(reports[start + offset][2], results)
+        else:
+            for start, file_scores in index.score_files(queries_tokens, max_memory, pooling, top_m, None, scorer):
+                for offset, row in enumerate(file_scores):
+                    save_ranking(reports[start + offset][2], index.file_paths, row)
 
-        # 保存结果到vsm_result文件夹中的对应错误报告txt文件
-        save_vsm_result(bug_report_name, aggregated_results)
+        print(f"项目 {project_name} 的 {len(reports)} 个错误报告已在内存预算内完成相似度分析")
 
-        # 输出结果
-        print(f"错误报告 {i} ({bug_report_name}) 的相似度分析已完成，并保存到 ../pathidea/ProcessData/vsm_result/{bug_report_name}_vsm.txt")
\ No newline at end of file
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="计算错误报告与源代码段的VSM相似度")
+    parser.add_argument("--mode", choices=["batch", "single", "topk"], default="batch",
+                        help="batch: 按项目批量打分；single: 逐个错误报告打分；"
+                             "topk: 剪枝检索，只输出前 --top-k 个文件（MAP/MRR 需要完整排序，请用 batch 或 single）")
+    parser.add_argument("--top-k", type=int, default=10, help="topk 模式下保留的文件数")
+    parser.add_argument("--block-size", type=int, default=256, help="批量模式下每块的错误报告数")
+    parser.add_argument("--model", choices=["tfidf", "bm25", "bm25l"], default="tfidf", help="相似度模型")
+    parser.add_argument("--k1", type=float, default=1.2, help="BM25 的 k1 参数")
+    parser.add_argument("--b", type=float, default=0.75, help="BM25 的 b 参数")
+    parser.add_argument("--delta", type=float, default=0.5, help="BM25L 的 delta 参数")
+    parser.add_argument("--pooling", choices=POOLING_METHODS, default="max",
+                        help="代码段得分到文件得分的池化方式：max、mean 或 topm（最高 --top-m 个代码段的平均值）")
+    parser.add_argument("--top-m", type=int, default=3, help="topm 池化时每个文件参与平均的代码段数")
+    parser.add_argument("--index-dir", default="../pathidea/ProcessData/vsm_index", help="持久化VSM索引的目录")
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有索引，强制重新构建")
+    parser.add_argument("--max-mem", type=parse_memory_size, default=None,
+                        help="打分的内存预算（如 2G）；给定时按 报告块 × 代码段块 分片计算，"
+                             "batch 与 topk 模式均在分片内完成池化，峰值内存不随代码段数增长")
+    parser.add_argument("--lsa-components", type=int, default=0,
+                        help="大于 0 时 topk 模式改用该维数的 LSA 索引生成候选、再精确重排序（近似结果）")
+    parser.add_argument("--lsa-candidates", type=int, default=300, help="LSA 检索时每个报告参与精确重排序的代码段数")
+    parser.add_argument("--lsh-bands", type=int, default=0,
+                        help="大于 0 时 topk 模式改用 MinHash/LSH 生成候选、再精确打分（近似结果）")
+    parser.add_argument("--lsh-rows", type=int, default=2, help="LSH 每带的哈希函数数，越大越快、召回率越低")
+    parser.add_argument("--hash-buckets", type=int, default=0,
+                        help="大于 0 时使用该桶数的带符号特征哈希代替词表，内存不随词表增长")
+    args = parser.parse_args()
+    # 分片打分是精确计算，不受剪枝条件的限制
+    if args.mode == "topk" and args.max_mem is None and args.pooling != "max":
+        parser.error("topk 模式的剪枝基于 max 池化，不能与其他池化方式同时使用（可改用 --max-mem 分片计算）")
+    if args.mode == "topk" and args.max_mem is None and args.model != "tfidf":
+        parser.error("topk 模式的剪枝基于 TF-IDF 余弦相似度，不能与 BM25 同时使用（可改用 --max-mem 分片计算）")
+    if args.lsa_components and (args.mode != "topk" or args.max_mem is not None):
+        parser.error("--lsa-components 只用于不带 --max-mem 的 topk 模式")
+    if args.lsh_bands and (args.mode != "topk" or args.max_mem is not None or args.lsa_components):
+        parser.error("--lsh-bands 只用于不带 --max-mem、--lsa-components 的 topk 模式")
+    if args.mode == "single" and args.max_mem is not None:
+        parser.error("--max-mem 只用于 batch 和 topk 模式")
+
+    source_base_path = "../pathidea/ProcessData/source_code_tokens"
+    # 获取编号形式的错误报告及对应项目名称和错误报告名称；错误报告与源代码共用全局词表，索引绑定该词表后直接按编号打分
+    vocabulary, bug_reports_tokens, project_names, bug_report_names = load_or_intern_bug_tokens(
+        "../pathidea/ProcessData/bug_reports_tokens", shared_vocabulary_path(source_base_path))
+
+    print(project_names)
+    stop_words = VSM_STOP_WORDS
+
+    # get_bug_tokens 按项目名排序返回，同一项目的错误报告相邻
+    bug_reports = list(zip(bug_reports_tokens, project_names, bug_report_names))
+
+    def load_index_for(project_name):
+        index = load_or_build_project_index(source_base_path, project_name, stop_words, args.index_dir, args.rebuild,
+                                            args.hash_buckets or None)
+        if index is not None:
+            index.bind_vocabulary(vocabulary)
+        return index
+
+    def lsa_for(project_name, index):
+        return load_or_build_lsa_index(source_base_path, project_name, index, stop_words, args.index_dir,
+                                       args.lsa_components, args.lsa_candidates, args.rebuild, args.hash_buckets or None)
+
+    def lsh_for(project_name, index):
+        return load_or_build_lsh_index(source_base_path, project_name, index, stop_words, args.index_dir,
+                                       args.lsh_bands, args.lsh_rows, args.rebuild, args.hash_buckets or None)
+
+    def scorer_for(index):
+        return create_scorer(index, args.model, args.k1, args.b, args.delta)
+
+    if args.max_mem is not None:
+        run_tiled(bug_reports, load_index_for, scorer_for, args.max_mem, args.pooling, args.top_m,
+                  args.top_k if args.mode == "topk" else None)
+    elif args.mode == "batch":
+        run_batch(bug_reports, load_index_for, scorer_for, args.block_size, args.pooling, args.top_m)
+    elif args.mode == "topk":
+        retriever_for = lsa_for if args.lsa_components else lsh_for if args.lsh_bands else None
+        run_top_k(bug_reports, load_index_for, args.top_k, retriever_for)
+    else:
+        run_single(bug_reports, load_index_for, scorer_for, args.pooling, args.top_m)